@@ -0,0 +1,153 @@
+import os
+import sys
+import logging
+import argparse
+import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("CONFIG_FILE", os.path.join(ROOT_DIR, "config.toml"))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import create_engine  # noqa: E402
+from tracer_bio_agent import cgroups  # noqa: E402
+from tracer_bio_agent.config import Config  # noqa: E402
+from tracer_bio_agent.database import Base  # noqa: E402
+from tracer_bio_agent.models import ProcessedMetrics  # noqa: E402
+from tracer_bio_agent.services import api_service  # noqa: E402
+from tracer_bio_agent.services.cgroup_metrics_service import CgroupMetricsService  # noqa: E402
+
+# A cgroup v2 tree of plain files: two batch jobs and one system service that no pattern matches.
+# job_1001 is running and has two block devices in `io.stat`; job_1002 has finished, predates
+# `memory.peak` (Linux < 5.19) and has no io controller.
+FIXTURE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "cgroupfs")
+PATTERNS = {"pipeline_1": "slurm/uid_*/job_*"}
+RUNNING = os.path.join(FIXTURE_ROOT, "slurm", "uid_1000", "job_1001")
+FINISHED = os.path.join(FIXTURE_ROOT, "slurm", "uid_1000", "job_1002")
+
+EXPECTED_STATS = {
+    RUNNING: cgroups.CgroupStats(
+        cpu_usec=7_250_000, user_usec=6_000_000, system_usec=1_250_000,
+        memory_current=314_572_800, memory_peak=524_288_000, anon=209_715_200, file=104_857_600,
+        read_bytes=1_048_576 + 2_097_152, write_bytes=4_194_304 + 1_048_576, read_ios=16 + 32, write_ios=64 + 8,
+    ),
+    FINISHED: cgroups.CgroupStats(
+        cpu_usec=1_500_000, user_usec=1_000_000, system_usec=500_000,
+        memory_current=8_192_000, memory_peak=None, anon=4_096_000, file=2_048_000,
+        read_bytes=0, write_bytes=0, read_ios=0, write_ios=0,
+    ),
+}
+
+# Columns of the `processed_metrics` row stored for each run (memory in KB, as `ps` reports it)
+EXPECTED_ROWS = {
+    "slurm/uid_1000/job_1001": {"pid": 4242, "rss": 204_800, "vsz": 307_200, "memory_peak": 512_000,
+                                "cpu_usec": 7_250_000, "read_bytes": 3_145_728, "write_bytes": 5_242_880,
+                                "time": "00:00:07", "stat": cgroups.RUN_STAT, "pipeline": "pipeline_1"},
+    "slurm/uid_1000/job_1002": {"pid": 0, "rss": 4_000, "vsz": 8_000, "memory_peak": 8_000,
+                                "cpu_usec": 1_500_000, "read_bytes": 0, "write_bytes": 0,
+                                "time": "00:00:01", "stat": cgroups.RUN_STAT, "pipeline": "pipeline_1"},
+}
+
+
+def check_stats() -> list[str]:
+    """Totals parsed by `cgroups.read_stats`, including `io.stat` summed over devices."""
+    errors = []
+    for path, expected in EXPECTED_STATS.items():
+        stats = cgroups.read_stats(path)
+        if stats != expected:
+            errors.append(f"{os.path.relpath(path, FIXTURE_ROOT)}: {stats} != {expected}")
+    if cgroups.read_stats(os.path.join(FIXTURE_ROOT, "missing")) is not None:
+        errors.append("a removed cgroup should read as None")
+    return errors
+
+
+def check_discovery() -> list[str]:
+    """Pattern matching, `cgroup.events` and `cgroup.procs`."""
+    errors = []
+    found = cgroups.discover(FIXTURE_ROOT, PATTERNS)
+    if found != {RUNNING: "pipeline_1", FINISHED: "pipeline_1"}:
+        errors.append(f"discovered {found}")
+    if not cgroups.is_populated(RUNNING) or cgroups.is_populated(FINISHED):
+        errors.append("populated flags do not match cgroup.events")
+    if cgroups.pids(RUNNING) != [4242, 4243] or cgroups.pids(FINISHED):
+        errors.append("members do not match cgroup.procs")
+    return errors
+
+
+def check_rows() -> list[str]:
+    """Rows built by `CgroupMetricsService` in discover mode; finished runs are sampled once more, then dropped."""
+    Config.configurations["cgroups"] = {"root": FIXTURE_ROOT, "mode": "discover", "discover": PATTERNS}
+    Config.configurations["spool"] = {"enabled": False}
+    service = CgroupMetricsService(session=None)
+    service.discover_runs()
+    timestamp = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+    errors = []
+    rows = {row.command: row.dict() for row in service.sample(timestamp)}
+    if set(rows) != set(EXPECTED_ROWS):
+        return [f"sampled {sorted(rows)}"]
+    for command, expected in EXPECTED_ROWS.items():
+        actual = {name: rows[command][name] for name in expected}
+        if actual != expected:
+            errors.append(f"{command}: {actual} != {expected}")
+    if [row.command for row in service.sample(timestamp)] != ["slurm/uid_1000/job_1001"]:
+        errors.append("the finished run should not be sampled again")
+    return errors
+
+
+def check_aggregates() -> list[str]:
+    """The dashboard aggregates sum process samples only, not the run totals stored next to them."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    snapshot_time = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    common = {"user": "root", "pipeline": "pipeline_1", "snapshot_time": snapshot_time}
+    with engine.begin() as conn:
+        conn.execute(ProcessedMetrics.__table__.insert(), [
+            {**common, "pid": 4242, "cpu": 50.0, "rss": 1000, "stat": "R", "command": "bwa mem"},
+            {**common, "pid": 4243, "cpu": 25.0, "rss": 500, "stat": None, "command": "samtools sort"},
+            {**common, "pid": 4242, "cpu": 75.0, "rss": 1500, "stat": cgroups.RUN_STAT,
+             "command": "slurm/uid_1000/job_1001"},
+        ])
+
+    since = snapshot_time - datetime.timedelta(minutes=1)
+    errors = []
+    with engine.connect() as conn:
+        series = conn.execute(api_service.SERIES_QUERY,
+                              {"pipeline": "pipeline_1", "since": since, "bucket": 60}).all()
+        if [(cpu, rss) for _, cpu, rss in series] != [(75.0, 1500)]:
+            errors.append(f"series {series}")
+        commands = conn.execute(api_service.PIPELINE_TOP_COMMANDS_QUERY,
+                                {"pipeline": "pipeline_1", "since": since, "limit": 10}).all()
+        if [command for command, _, _ in commands] != ["bwa mem", "samtools sort"]:
+            errors.append(f"top commands {commands}")
+    return errors
+
+
+CHECKS = [
+    ("cgroup stats", check_stats),
+    ("cgroup discovery", check_discovery),
+    ("cgroup run rows", check_rows),
+    ("per-process aggregates", check_aggregates),
+]
+
+
+def validate(verbose: bool = False) -> bool:
+    """Run every check against the fixture tree."""
+    ok = True
+    for name, check in CHECKS:
+        errors = check()
+        print(f"{'FAIL' if errors else 'OK':<5} {name}")
+        for error in errors:
+            print(f"        {error}")
+        if verbose and not errors:
+            print(f"        {check.__doc__}")
+        ok = ok and not errors
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the cgroup collector against the fixture cgroupfs tree")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Describe every check")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # One log line per discovered cgroup
+
+    sys.exit(0 if validate(args.verbose) else 1)
@@ -0,0 +1,80 @@
+import os
+import sys
+import argparse
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("CONFIG_FILE", os.path.join(ROOT_DIR, "config.toml"))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from tracer_bio_agent.database import Base  # noqa: E402
+from tracer_bio_agent import crud  # noqa: E402
+from tracer_bio_agent.services import api_service  # noqa: E402
+
+
+# Hot queries and the tables each one must reach through an index (never a full `SCAN`).
+# Buffer tables that are drained in full on every cycle (e.g. `metrics`) are allowed to be scanned.
+HOT_QUERIES = [
+    ("pipeline parents", crud.pipeline_parents_query("pipeline_1"), {"executions"}),
+    ("pipeline commands", crud.pipeline_commands_query(1), {"executions"}),
+    ("duplicate check", crud.duplicate_execution_query(1, None, "START"), {"processed_executions"}),
+    ("bulk duplicate check", crud.processed_events_query([1, 2, 3]), {"processed_executions"}),
+    ("matched metrics", crud.matched_metrics_query(), {"processed_executions", "process_metadata"}),
+    ("matched metric columns", crud.matched_metric_columns_query(), {"processed_executions", "process_metadata"}),
+    ("pipeline series", text(
+        "SELECT CAST(strftime('%s', snapshot_time) AS INTEGER) AS time_bucket, SUM(cpu), SUM(rss) "
+        "FROM processed_metrics WHERE pipeline = :pipeline AND snapshot_time >= :since "
+        "GROUP BY time_bucket ORDER BY time_bucket"
+    ), {"processed_metrics"}),
+    ("run timeline", text(
+        "SELECT command, timestamp, duration FROM processed_executions "
+        "WHERE pipeline = :pipeline AND run_id = :run_id ORDER BY timestamp"
+    ), {"processed_executions"}),
+    ("api series", api_service.SERIES_QUERY, {"processed_metrics"}),
+    ("api pipeline top commands", api_service.PIPELINE_TOP_COMMANDS_QUERY, {"processed_metrics"}),
+    ("api pipeline runs", api_service.PIPELINE_RUNS_QUERY, {"processed_executions"}),
+]
+
+
+def explain(conn, statement) -> list[str]:
+    """Return the `EXPLAIN QUERY PLAN` detail lines of a statement.
+
+    Parameters are bound to NULL: SQLite plans do not depend on bound values.
+    """
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(None for _ in (compiled.positiontup or []))
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan: list[str], tables: set[str]) -> list[str]:
+    """Plan steps that walk a whole table (or a whole index) instead of searching it."""
+    return [step for step in plan if step.startswith("SCAN") and step.split()[1] in tables]
+
+
+def validate(verbose: bool = False) -> bool:
+    """Create the schema in memory and check the plan of every hot query."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    ok = True
+    with engine.connect() as conn:
+        for name, statement, tables in HOT_QUERIES:
+            plan = explain(conn, statement)
+            scans = full_scans(plan, tables)
+            status = "FAIL" if scans else "OK"
+            print(f"{status:<5} {name}")
+            if scans or verbose:
+                for step in plan:
+                    print(f"        {step}")
+            ok = ok and not scans
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that hot queries do not regress into full table scans")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the plan of every query")
+    args = parser.parse_args()
+
+    sys.exit(0 if validate(args.verbose) else 1)
@@ -31,7 +31,7 @@ setup(
     python_requires=">=3.8",
     entry_points={
         "console_scripts": [
-            "async-ebpf-agent=main:main",
+            "tracer-bio-agent=tracer_bio_agent.cli:main",
         ],
     },
 )
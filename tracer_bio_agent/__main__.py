@@ -0,0 +1,4 @@
+import sys
+from tracer_bio_agent.cli import main
+
+sys.exit(main())
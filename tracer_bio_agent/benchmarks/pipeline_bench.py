@@ -0,0 +1,120 @@
+# pipeline_bench.py (rows/s of each pipeline stage in row mode and in Arrow mode, see `columnar.py`)
+import time
+import random
+import logging
+import asyncio
+import argparse
+import datetime
+import tempfile
+from typing import Dict, List
+from tracer_bio_agent.snapshot import SnapshotBatch
+from tracer_bio_agent.columnar import ExecutionBatch, snapshot_from_ps_lines
+from tracer_bio_agent.benchmarks.snapshot_bench import COMMANDS, make_ps_lines
+from tracer_bio_agent.benchmarks.storage_bench import BACKENDS
+
+MODES = ("rows", "arrow")
+
+
+def make_execve_lines(count: int, start: datetime.datetime, seed: int = 0) -> List[str]:
+    """Synthetic bpftrace output: one START and one END line per process."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count // 2):
+        pid, timestamp = 10_000 + i, (start + datetime.timedelta(milliseconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+        command = rng.choice(COMMANDS).split()
+        lines.append(f"START: Timestamp: {timestamp}, PID: {pid}, PPID: 1, UID: 1000, Command: {command[0]}, "
+                     f"Nsecs: {i * 1000}, Args: {','.join(command)}")
+        lines.append(f"END: Timestamp: {timestamp}, PID: {pid}, PPID: 1, UID: 1000, Command: {command[0]}, "
+                     f"Nsecs: {i * 1000 + 500}, Duration: {rng.randint(0, 600)} ms, CPU: 3 ticks, Exit: 0")
+    return lines
+
+
+def rate(count: int, began: float) -> float:
+    return count / (time.perf_counter() - began)
+
+
+async def run_mode(url: str, mode: str, processes: int, snapshots: int, executions: int,
+                   batch_rows: int) -> Dict[str, float]:
+    """Rows/s of each stage of one mode against a fresh database."""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from tracer_bio_agent.database import Base  # Also registers the duckdb:// dialect
+    from tracer_bio_agent.models import ProcessedExecutionSchema
+    from tracer_bio_agent.crud import MetricsRepository, ProcessedExecutionRepository
+    from tracer_bio_agent.services.ebpf_execve_service import ExecveLoggerService
+    from tracer_bio_agent.services.metrics_processing_service import MetricsProcessingService
+
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    arrow = mode == "arrow"
+    start = datetime.datetime(2026, 1, 1)
+    results = {}
+
+    lines = make_ps_lines(processes)
+    parse = snapshot_from_ps_lines if arrow else SnapshotBatch.from_ps_lines
+    parse(lines[:1], start)  # Imports pyarrow outside the timing
+    began = time.perf_counter()
+    batches = [parse(lines, start + datetime.timedelta(seconds=2 * i)) for i in range(snapshots)]
+    results["parse ps"] = rate(processes * snapshots, began)
+
+    async with AsyncSession(engine) as session:
+        # The execve collector end to end: read, parse, pair START and END events, store
+        service = ExecveLoggerService(session)
+        service.batch, service.batch_rows, service.flush_interval = (ExecutionBatch() if arrow else None), batch_rows, 2
+        log_lines = make_execve_lines(executions, start)
+        reader = asyncio.StreamReader()
+        reader.feed_data(("\n".join(log_lines) + "\n").encode())
+        reader.feed_eof()
+        began = time.perf_counter()
+        async for log_data in service.read_events(reader):
+            if log_data:
+                await service.process_event(log_data)
+        await service.flush_batch()
+        results["execve events"] = rate(len(log_lines), began)
+
+        # Attribution input: the snapshots, and one processed execution per sampled pid
+        await MetricsRepository(session).add_snapshots(batches)
+        async with session.begin():
+            await ProcessedExecutionRepository(session).add_processed_executions([
+                ProcessedExecutionSchema(user="root", event_type="EXEC", timestamp=start, pid=pid, ppid=1, uid=0,
+                                         command="bench", pipeline="bench", run_id="run-1")
+                for pid in sorted(set(batches[0].pid))
+            ])
+
+        service = MetricsProcessingService(session)
+        began = time.perf_counter()
+        await (service.process_metrics_arrow() if arrow else service.process_metrics())
+        results["attribute metrics"] = rate(processes * snapshots, began)
+
+    await engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare row mode and Arrow mode ([arrow] enabled) stage by stage")
+    parser.add_argument("--processes", type=int, default=500, help="Processes per snapshot")
+    parser.add_argument("--snapshots", type=int, default=40, help="Snapshots parsed and attributed")
+    parser.add_argument("--executions", type=int, default=4000, help="execve lines (one START and one END per process)")
+    parser.add_argument("--batch-rows", type=int, default=5000, help="Execution rows per batch, as [arrow] batch_rows")
+    parser.add_argument("--backend", default="sqlite", choices=list(BACKENDS))
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)  # One log line per stored execution
+
+    results = {}
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            results[mode] = asyncio.run(run_mode(BACKENDS[args.backend].format(dir=directory), mode, args.processes,
+                                                 args.snapshots, args.executions, args.batch_rows))
+
+    print(f"{args.snapshots} snapshots of {args.processes} processes, {args.executions} execve lines, "
+          f"{args.backend}\n" + "=" * 40)
+    print(f"{'Stage (rows/s)':<24}" + "".join(f"{mode:>14}" for mode in MODES) + f"{'speedup':>10}")
+    print("-" * (24 + 14 * len(MODES) + 10))
+    for stage in results[MODES[0]]:
+        speedup = results["arrow"][stage] / results["rows"][stage]
+        print(f"{stage:<24}" + "".join(f"{results[mode][stage]:>14,.0f}" for mode in MODES) + f"{speedup:>9.1f}x")
+    print("-" * (24 + 14 * len(MODES) + 10))
+
+
+if __name__ == "__main__":
+    main()
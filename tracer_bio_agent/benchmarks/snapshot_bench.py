@@ -0,0 +1,154 @@
+# snapshot_bench.py (allocations per snapshot and peak RSS of the metrics path)
+import gc
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import resource
+import tracemalloc
+from typing import Callable, List, Tuple
+from tracer_bio_agent.models import MetricsSchema
+from tracer_bio_agent.snapshot import SnapshotBatch
+
+COMMANDS = [
+    "/lib/systemd/systemd-journald",
+    "stress --cpu 2 --vm 2 --vm-bytes 64M --io 2 --timeout 20",
+    "bwa mem reference.fasta trimmed_reads.fastq",
+    "samtools sort -o aligned.sorted.bam aligned.bam",
+    ".venv/bin/python3.12 agent.py",
+]
+
+PARSER_SIZES = [50, 100, 200, 300, 500, 1000, 2000, 5000]
+
+
+def make_ps_lines(processes: int, seed: int = 0) -> List[str]:
+    """Generate the data lines of a synthetic `ps -eo ...` snapshot."""
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(['root', 'francesco-iori'])} {rng.randint(1, 4_000_000)} {rng.randint(1, 4_000_000)} "
+        f"{rng.random() * 100:.1f} {rng.random() * 10:.1f} {rng.randint(1_000, 9_999_999)} "
+        f"{rng.randint(1_000, 999_999)} ? S{rng.choice(['', 's', 'l'])} 10:{rng.randint(10, 59)} "
+        f"00:00:{rng.randint(10, 59)} {rng.choice(COMMANDS)}"
+        for _ in range(processes)
+    ]
+
+
+def parse_with_schema(lines: List[str], timestamp: str):
+    """Legacy path: one split list and one pydantic model per line."""
+    processes = []
+    for line in lines:
+        parts = line.split()
+        processes.append(MetricsSchema(
+            user=parts[0], ppid=int(parts[1]), pid=int(parts[2]), cpu=float(parts[3]), mem=float(parts[4]),
+            vsz=int(parts[5]), rss=int(parts[6]), tty=parts[7] if parts[7] != '?' else None, stat=parts[8],
+            start=parts[9], time=parts[10], command=" ".join(parts[11:]),
+            snapshot_time=datetime.datetime.fromisoformat(timestamp),
+        ))
+    return processes
+
+
+def parse_with_batch(lines: List[str], timestamp: str):
+    """Columnar path: one `SnapshotBatch` per snapshot."""
+    return SnapshotBatch.from_ps_lines(lines, datetime.datetime.fromisoformat(timestamp))
+
+
+def measure(parse: Callable, lines: List[str], timestamp: str, snapshots: int) -> dict:
+    """Allocations retained per snapshot and parse time for one parsing strategy."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = parse(lines, timestamp)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    del kept
+
+    start = time.perf_counter()
+    for _ in range(snapshots):
+        parse(lines, timestamp)
+    elapsed = (time.perf_counter() - start) / snapshots
+
+    return {"blocks": blocks, "bytes": size, "ms": elapsed * 1000}
+
+
+def compare_parsers(sizes: List[int], snapshots: int) -> List[Tuple[int, float, float]]:
+    """(processes, line parser ms, Arrow parser ms) per snapshot size, to choose `[arrow] ps_min_rows`."""
+    from tracer_bio_agent.columnar import snapshot_from_ps_lines
+
+    timestamp = datetime.datetime.now()
+    snapshot_from_ps_lines(make_ps_lines(1), timestamp, min_rows=0)  # Imports pyarrow outside the timing
+    results = []
+    for processes in sizes:
+        lines = make_ps_lines(processes)
+        timings = []
+        for parse in (SnapshotBatch.from_ps_lines, lambda lines, at: snapshot_from_ps_lines(lines, at, min_rows=0)):
+            start = time.perf_counter()
+            for _ in range(snapshots):
+                parse(lines, timestamp)
+            timings.append((time.perf_counter() - start) / snapshots * 1000)
+        results.append((processes, *timings))
+    return results
+
+
+async def measure_storage(lines: List[str], timestamp: str, snapshots: int) -> float:
+    """Average time to store one snapshot with `MetricsRepository.add_snapshot` (in-memory SQLite)."""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from tracer_bio_agent.database import Base
+    from tracer_bio_agent.crud import MetricsRepository
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        repository = MetricsRepository(session)
+        start = time.perf_counter()
+        for _ in range(snapshots):
+            await repository.add_snapshot(parse_with_batch(lines, timestamp))
+        elapsed = (time.perf_counter() - start) / snapshots
+
+    await engine.dispose()
+    return elapsed * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the metrics snapshot path")
+    parser.add_argument("--processes", type=int, default=500, help="Processes per snapshot")
+    parser.add_argument("--snapshots", type=int, default=50, help="Snapshots to time")
+    parser.add_argument("--storage", action="store_true", help="Also time storage into an in-memory SQLite")
+    parser.add_argument("--compare-parsers", action="store_true",
+                        help="Time the line and Arrow ps parsers by snapshot size, to set [arrow] ps_min_rows")
+    args = parser.parse_args(argv)
+
+    if args.compare_parsers:
+        print(f"{'Processes':>10} {'line ms':>10} {'Arrow ms':>10} {'speedup':>9}")
+        print("-" * 42)
+        for processes, line_ms, arrow_ms in compare_parsers(PARSER_SIZES, args.snapshots):
+            print(f"{processes:>10} {line_ms:>10.2f} {arrow_ms:>10.2f} {line_ms / arrow_ms:>8.2f}x")
+        print("-" * 42)
+        return
+
+    lines = make_ps_lines(args.processes)
+    timestamp = datetime.datetime.now().isoformat()
+
+    print(f"Snapshot of {args.processes} processes\n" + "=" * 40)
+    print(f"{'Path':<20} {'Alloc blocks':>14} {'Alloc KiB':>12} {'ms/snapshot':>12}")
+    print("-" * 61)
+    for label, parse in (("pydantic rows", parse_with_schema), ("SnapshotBatch", parse_with_batch)):
+        result = measure(parse, lines, timestamp, args.snapshots)
+        print(f"{label:<20} {result['blocks']:>14} {result['bytes'] / 1024:>12.1f} {result['ms']:>12.2f}")
+    print("-" * 61)
+
+    if args.storage:
+        print(f"add_snapshot: {asyncio.run(measure_storage(lines, timestamp, args.snapshots)):.2f} ms/snapshot")
+
+    # ru_maxrss is reported in KiB on Linux
+    print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
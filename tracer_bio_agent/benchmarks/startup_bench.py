@@ -0,0 +1,75 @@
+# startup_bench.py (cold-start time of the agent CLI)
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Budget for spawning the CLI and dispatching a subcommand, before any service module is imported.
+# It only covers the parse path: `run` also imports SQLAlchemy and opens the database, which is
+# timed below (`run to start`) but not held to this target.
+COLD_START_TARGET_MS = 150
+
+# `run` with `start` replaced by database setup and service construction: everything up to the
+# point where the services' `run()` coroutines would be scheduled
+RUN_TO_START = """
+import asyncio
+import tracer_bio_agent.cli as c
+
+async def ready(service_classes):
+    from tracer_bio_agent.database import init_db, AsyncSessionLocal
+    await init_db()
+    for service_class in service_classes:
+        async with AsyncSessionLocal() as session:
+            service_class(session)
+
+c.start = lambda service_classes, profiler=None: asyncio.run(ready(service_classes))
+c.main(["--log-level", "warning", "run"])
+"""
+
+COMMANDS = {
+    "cli": ["-m", "tracer_bio_agent", "--help"],
+    "collect imports": ["-c", "import tracer_bio_agent.cli as c; [c.load_service(c.COLLECTORS[n]) for n in c.DEFAULT_COLLECTORS]"],
+    "process imports": ["-c", "import tracer_bio_agent.cli as c; [c.load_service(c.PROCESSORS[n]) for n in c.DEFAULT_PROCESSORS]"],
+    "run to start": ["-c", RUN_TO_START],
+}
+
+
+def time_command(arguments, runs: int) -> list:
+    """Wall time (ms) of spawning a fresh interpreter for each run."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the agent CLI")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per command")
+    args = parser.parse_args(argv)
+
+    baseline = statistics.median(time_command(["-c", "pass"], args.runs))
+
+    print(f"Cold start (median of {args.runs} runs, interpreter baseline {baseline:.0f} ms)\n" + "=" * 40)
+    print(f"{'Command':<20} {'Median ms':>10} {'Max ms':>10}")
+    print("-" * 42)
+
+    medians = {}
+    for label, arguments in COMMANDS.items():
+        timings = time_command(arguments, args.runs)
+        medians[label] = statistics.median(timings)
+        print(f"{label:<20} {medians[label]:>10.0f} {max(timings):>10.0f}")
+    print("-" * 42)
+
+    cli_median = medians["cli"]
+    status = "OK" if cli_median <= COLD_START_TARGET_MS else "OVER TARGET"
+    print(f"CLI parse and dispatch {cli_median:.0f} ms, target {COLD_START_TARGET_MS} ms: {status}")
+    print(f"`run` until the services start {medians['run to start']:.0f} ms "
+          f"({medians['run to start'] / COLD_START_TARGET_MS:.1f}x the CLI target, which does not cover it)")
+    return 0 if cli_median <= COLD_START_TARGET_MS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
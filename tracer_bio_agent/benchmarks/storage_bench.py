@@ -0,0 +1,147 @@
+# storage_bench.py (ingest rate and query latency of the SQLite and DuckDB storage backends)
+import os
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import tempfile
+import statistics
+from typing import Dict, List
+from tracer_bio_agent.models import ProcessedExecutionSchema, ProcessedMetricsSchema
+from tracer_bio_agent.snapshot import SnapshotBatch, SHARED_USER, SHARED_COMMAND
+from tracer_bio_agent.proc_meta import metadata_id
+from tracer_bio_agent.benchmarks.snapshot_bench import COMMANDS, make_ps_lines
+
+BACKENDS = {
+    "sqlite": "sqlite+aiosqlite:///{dir}/bench.db",
+    "duckdb": "duckdb:///{dir}/bench.duckdb",
+}
+
+# Same SQL on both backends, the shapes the processing services and `sql` queries run
+QUERIES = {
+    "top commands by cpu": "SELECT command, SUM(cpu) AS cpu FROM metrics GROUP BY command ORDER BY cpu DESC LIMIT 10",
+    "pid series": "SELECT snapshot_time, cpu, rss FROM metrics WHERE pid = {pid} ORDER BY snapshot_time",
+    "pipeline cpu per minute": ("SELECT pipeline, substr(CAST(snapshot_time AS VARCHAR), 1, 16) AS minute, AVG(cpu), MAX(rss) "
+                                "FROM processed_metrics GROUP BY 1, 2 ORDER BY 1, 2"),
+    "run durations": ("SELECT pipeline, run_id, COUNT(*), SUM(duration) FROM processed_executions "
+                      "WHERE event_type = 'END' GROUP BY 1, 2"),
+}
+
+
+def make_executions(count: int, start: datetime.datetime, seed: int = 0) -> List[ProcessedExecutionSchema]:
+    rng = random.Random(seed)
+    return [
+        ProcessedExecutionSchema(
+            user="francesco-iori", event_type=rng.choice(["START", "END"]),
+            timestamp=start + datetime.timedelta(milliseconds=i), pid=rng.randint(1, 4_000_000), ppid=1, uid=1000,
+            command=rng.choice(COMMANDS), args=None, duration=rng.randint(0, 600),
+            cpu_ticks=rng.randint(0, 2 ** 40),  # CPU ns: past 2**31 once a process used 2.1 s of CPU
+            pipeline=rng.choice("abc"), run_id=f"run-{rng.randint(1, 20)}",
+        )
+        for i in range(count)
+    ]
+
+
+def make_processed_metrics(batch: SnapshotBatch) -> List[ProcessedMetricsSchema]:
+    return [
+        ProcessedMetricsSchema(user=user, pid=pid, cpu=cpu, mem=mem, vsz=vsz, rss=rss, tty=tty, stat=stat, start=start,
+                               time=cpu_time, command=command, snapshot_time=batch.snapshot_time, pipeline=command[:3])
+        for user, pid, ppid, cpu, mem, vsz, rss, tty, stat, start, cpu_time, command, *_ in batch.rows()
+    ]
+
+
+def reference_metadata(batch: SnapshotBatch):
+    """Mark every sample as resolved by the process metadata cache: user and command are stored as NULL."""
+    for index in range(len(batch)):
+        batch.meta_id[index] = metadata_id(batch.pid[index], 0, batch.command[index])
+        batch.shared[index] = SHARED_USER | SHARED_COMMAND
+
+
+async def run_backend(url: str, processes: int, snapshots: int, flush_every: int, runs: int,
+                      metadata: bool = False) -> Dict[str, float]:
+    """Rows/s of each write path and median latency (ms) of each query against one backend."""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from tracer_bio_agent.database import Base  # Also registers the duckdb:// dialect
+    from tracer_bio_agent.crud import MetricsRepository, ProcessedExecutionRepository, ProcessedMetricsRepository
+
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    lines = make_ps_lines(processes)
+    start = datetime.datetime(2026, 1, 1)
+    batches = [SnapshotBatch.from_ps_lines(lines, start + datetime.timedelta(seconds=2 * i)) for i in range(snapshots)]
+    processed = [make_processed_metrics(batch) for batch in batches[:max(snapshots // 4, 1)]]
+    if metadata:
+        for batch in batches:
+            reference_metadata(batch)
+    results = {}
+
+    async with AsyncSession(engine) as session:
+        repository = MetricsRepository(session)
+        began = time.perf_counter()
+        for i in range(0, snapshots, flush_every):
+            await repository.add_snapshots(batches[i:i + flush_every])
+        results["metrics rows/s"] = processes * snapshots / (time.perf_counter() - began)
+
+        repository = ProcessedMetricsRepository(session)
+        began = time.perf_counter()
+        for metrics in processed:
+            await repository.add_processed_metrics(metrics)
+        results["processed_metrics rows/s"] = sum(map(len, processed)) / (time.perf_counter() - began)
+
+        executions = make_executions(processes * 10, start)
+        repository = ProcessedExecutionRepository(session)
+        began = time.perf_counter()
+        for i in range(0, len(executions), 500):
+            async with session.begin():
+                await repository.add_processed_executions(executions[i:i + 500])
+        results["processed_executions rows/s"] = len(executions) / (time.perf_counter() - began)
+
+        pid = batches[0].pid[0]
+        for label, query in QUERIES.items():
+            timings = []
+            for _ in range(runs):
+                began = time.perf_counter()
+                (await session.execute(text(query.format(pid=pid)))).fetchall()
+                timings.append((time.perf_counter() - began) * 1000)
+            await session.rollback()
+            results[f"{label} ms"] = statistics.median(timings)
+
+    await engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the SQLite and DuckDB storage backends")
+    parser.add_argument("--processes", type=int, default=500, help="Processes per snapshot")
+    parser.add_argument("--snapshots", type=int, default=200, help="Snapshots to store")
+    parser.add_argument("--flush-every", type=int, default=5, help="Snapshots per write, as with [monitoring] flush_interval")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per query")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma separated subset of " + ", ".join(BACKENDS))
+    parser.add_argument("--metadata", action="store_true",
+                        help="Store samples as references to process metadata entries (user and command NULL)")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.backends.split(",") if name.strip()]
+    results = {}
+    for name in names:
+        with tempfile.TemporaryDirectory() as directory:
+            results[name] = asyncio.run(run_backend(BACKENDS[name].format(dir=directory), args.processes,
+                                                    args.snapshots, args.flush_every, args.runs, args.metadata))
+            size = sum(os.path.getsize(os.path.join(directory, file)) for file in os.listdir(directory))
+            results[name]["file MiB"] = size / 1024 / 1024
+
+    print(f"{args.snapshots} snapshots of {args.processes} processes"
+          f"{', samples referencing process metadata' if args.metadata else ''}\n" + "=" * 40)
+    print(f"{'Measure':<32}" + "".join(f"{name:>14}" for name in names))
+    print("-" * (32 + 14 * len(names)))
+    for measure in results[names[0]]:
+        print(f"{measure:<32}" + "".join(f"{results[name][measure]:>14,.1f}" for name in names))
+    print("-" * (32 + 14 * len(names)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# cache.py (bounded, shared caches for per-process metadata)
+import pwd
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+MISSING = object()
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live.
+
+    At most `max_entries` values are kept; the least recently used one is evicted first. Entries
+    older than `ttl` seconds are reloaded, so changes (e.g. a renamed user) are picked up.
+    Negative results can be cached like any other value.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (self.ttl is not None and time.monotonic() - entry[0] > self.ttl):
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable):
+        """Cached value of `key`, calling `loader(key)` on a miss."""
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = loader(key)
+            self.put(key, value)
+        return value
+
+    def discard(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Shared by every service of the process
+USERNAMES = BoundedCache(max_entries=4096, ttl=600)
+
+
+def _load_username(uid: int) -> str | None:
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return None  # Cached too: unknown UIDs are looked up once per TTL
+
+
+def username(uid: int) -> str | None:
+    """User name of a UID through the shared cache, or None if the UID is unknown."""
+    return USERNAMES.get_or_load(uid, _load_username)
@@ -0,0 +1,153 @@
+# cgroups.py (cgroup v2 accounting: placement, discovery and one-pass stat reads)
+#
+# Every function takes the cgroup directory (or the cgroupfs root) as a path, so the same code
+# runs against /sys/fs/cgroup or a fixture tree of plain files.
+import os
+import glob
+from typing import Dict, Iterable, List, NamedTuple
+
+CONTROLLERS = "+cpu +memory +io"
+
+# `processed_metrics.stat` of the whole-run rows stored by `CgroupMetricsService`. They share the table with
+# the per-process samples, so per-process aggregates must exclude them with `PROCESS_ROWS` (`stat` may be NULL).
+RUN_STAT = "cgroup"
+PROCESS_ROWS = f"COALESCE(stat, '') <> '{RUN_STAT}'"
+
+
+class CgroupStats(NamedTuple):
+    """Cumulative counters of one cgroup, read in a single pass."""
+    cpu_usec: int
+    user_usec: int
+    system_usec: int
+    memory_current: int  # Bytes, including page cache
+    memory_peak: int | None  # Bytes, None before Linux 5.19
+    anon: int  # Bytes of anonymous memory (closest to RSS)
+    file: int  # Bytes of page cache
+    read_bytes: int
+    write_bytes: int
+    read_ios: int
+    write_ios: int
+
+
+def _read(path: str, name: str) -> str | None:
+    """Content of a cgroup interface file, or None if the file (or controller) is missing."""
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def parse_flat_keyed(text: str | None) -> Dict[str, int]:
+    """Parse `key value` lines (`cpu.stat`, `memory.stat`, `cgroup.events`)."""
+    values = {}
+    for line in (text or "").splitlines():
+        key, _, value = line.partition(" ")
+        if value.strip().lstrip("-").isdigit():
+            values[key] = int(value)
+    return values
+
+
+def parse_io_stat(text: str | None) -> Dict[str, int]:
+    """Sum `io.stat` counters (`8:0 rbytes=... wbytes=... rios=... wios=...`) over all devices."""
+    totals = {}
+    for line in (text or "").splitlines():
+        for field in line.split()[1:]:
+            key, _, value = field.partition("=")
+            if value.isdigit():
+                totals[key] = totals.get(key, 0) + int(value)
+    return totals
+
+
+def read_stats(path: str) -> CgroupStats | None:
+    """Read `cpu.stat`, `memory.current`, `memory.peak`, `memory.stat` and `io.stat`; None if the cgroup is gone."""
+    cpu_stat = _read(path, "cpu.stat")
+    if cpu_stat is None:
+        return None  # cpu.stat exists in every cgroup v2 group
+
+    cpu = parse_flat_keyed(cpu_stat)
+    memory = parse_flat_keyed(_read(path, "memory.stat"))
+    io = parse_io_stat(_read(path, "io.stat"))
+    current = _read(path, "memory.current")
+    peak = _read(path, "memory.peak")
+
+    return CgroupStats(
+        cpu_usec=cpu.get("usage_usec", 0),
+        user_usec=cpu.get("user_usec", 0),
+        system_usec=cpu.get("system_usec", 0),
+        memory_current=int(current) if current and current.strip().isdigit() else 0,
+        memory_peak=int(peak) if peak and peak.strip().isdigit() else None,
+        anon=memory.get("anon", 0),
+        file=memory.get("file", 0),
+        read_bytes=io.get("rbytes", 0),
+        write_bytes=io.get("wbytes", 0),
+        read_ios=io.get("rios", 0),
+        write_ios=io.get("wios", 0),
+    )
+
+
+def is_populated(path: str) -> bool:
+    """Whether any process is left in the cgroup or its descendants."""
+    return parse_flat_keyed(_read(path, "cgroup.events")).get("populated", 1) == 1
+
+
+def pids(path: str) -> List[int]:
+    return [int(pid) for pid in (_read(path, "cgroup.procs") or "").split()]
+
+
+def discover(root: str, patterns: Dict[str, Iterable[str]]) -> Dict[str, str]:
+    """Existing cgroups (e.g. created by a batch scheduler) matching glob patterns: path -> pipeline."""
+    found = {}
+    for pipeline, pipeline_patterns in patterns.items():
+        if isinstance(pipeline_patterns, str):
+            pipeline_patterns = [pipeline_patterns]
+        for pattern in pipeline_patterns:
+            for path in glob.glob(os.path.join(root, pattern)):
+                if os.path.isdir(path):
+                    found.setdefault(path, pipeline)
+    return found
+
+
+def create(root: str, parent: str, name: str) -> str:
+    """Create `<root>/<parent>/<name>` with the cpu, memory and io controllers enabled where possible."""
+    parent_path = os.path.join(root, parent)
+    os.makedirs(parent_path, exist_ok=True)
+    for path in (root, parent_path):
+        try:
+            with open(os.path.join(path, "cgroup.subtree_control"), "w") as f:
+                f.write(CONTROLLERS)
+        except OSError:
+            pass  # Controller unavailable or already delegated: stats fall back to what is present
+
+    path = os.path.join(parent_path, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def attach(path: str, pid: int):
+    """Move a process into the cgroup; its future children are created there too."""
+    with open(os.path.join(path, "cgroup.procs"), "w") as f:
+        f.write(str(pid))
+
+
+def descendants(pid: int, proc_root: str = "/proc") -> List[int]:
+    """Children of a process, recursively, from `/proc/<pid>/task/<pid>/children`."""
+    found, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(os.path.join(proc_root, str(current), "task", str(current), "children")) as f:
+                children = [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+        found.extend(children)
+        pending.extend(children)
+    return found
+
+
+def remove(path: str):
+    """Remove an empty cgroup; ignored if it is still populated or already gone."""
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
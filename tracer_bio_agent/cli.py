@@ -0,0 +1,373 @@
+# cli.py (command line entry point)
+#
+# Only argparse and the standard library are imported at module level: services, SQLAlchemy,
+# DuckDB and pandas are imported by the subcommand that needs them, so spawning the agent
+# per job (e.g. from a batch scheduler prolog) stays cheap.
+import os
+import sys
+import logging
+import argparse
+import importlib
+
+logger = logging.getLogger(__name__)
+
+# Service name -> (module, class), imported only when the service is selected
+COLLECTORS = {
+    "execve": ("tracer_bio_agent.services.ebpf_execve_service", "ExecveLoggerService"),
+    "metrics": ("tracer_bio_agent.services.metrics_service", "MetricsService"),
+    "psutil": ("tracer_bio_agent.services.ps_util_metrics_service", "MetricsService"),
+    "cgroups": ("tracer_bio_agent.services.cgroup_metrics_service", "CgroupMetricsService"),
+}
+PROCESSORS = {
+    "executions": ("tracer_bio_agent.services.execution_processing_service", "ExecutionProcessingService"),
+    "metrics": ("tracer_bio_agent.services.metrics_processing_service", "MetricsProcessingService"),
+}
+# Optional services that can run next to collectors/processors (`run --with api,ship`)
+EXTRAS = {
+    "api": ("tracer_bio_agent.services.api_service", "QueryAPIService"),
+    "ship": ("tracer_bio_agent.services.shipper_service", "ShipperService"),
+    "export": ("tracer_bio_agent.services.export_service", "ExportService"),
+}
+COLLECTOR = ("tracer_bio_agent.services.collector_service", "CollectorService")
+SPOOL = ("tracer_bio_agent.services.spool_service", "SpoolService")
+DEFAULT_COLLECTORS = ["execve", "metrics"]
+DEFAULT_PROCESSORS = ["metrics", "executions"]
+
+BENCHMARKS = {
+    "snapshot": "tracer_bio_agent.benchmarks.snapshot_bench",
+    "startup": "tracer_bio_agent.benchmarks.startup_bench",
+    "storage": "tracer_bio_agent.benchmarks.storage_bench",
+    "pipeline": "tracer_bio_agent.benchmarks.pipeline_bench",
+}
+
+
+def load_service(spec):
+    """Import a service class from its (module, class) spec."""
+    module_name, class_name = spec
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+async def run_services(service_classes, profiler=None):
+    """Run the given services concurrently, each with its own database session."""
+    import asyncio
+    from contextlib import AsyncExitStack
+    from tracer_bio_agent.database import init_db, AsyncSessionLocal
+
+    await init_db()
+
+    async with AsyncExitStack() as stack:
+        services = []
+        for service_class in service_classes:
+            session = await stack.enter_async_context(AsyncSessionLocal())
+            services.append(service_class(session))
+
+        runs = [service.run() for service in services]
+        if profiler:
+            profiler.start()
+            runs = [profiler.wrap(type(service).__name__, run) for service, run in zip(services, runs)]
+
+        try:
+            await asyncio.gather(*runs)
+        except asyncio.CancelledError:
+            logger.info("Shutting down application...")
+
+        finally:
+            for service in services:
+                await service.stop()  # Ensure all services stop gracefully
+            if profiler:
+                await profiler.stop()
+
+
+def start(service_classes, profiler=None):
+    """Run services until they stop or Ctrl+C is received."""
+    import asyncio
+
+    try:
+        asyncio.run(run_services(service_classes, profiler))
+    except KeyboardInterrupt:
+        logger.info("Received Ctrl+C, shutting down...")
+
+
+def parse_services(value: str, registry: dict) -> list:
+    """Parse a comma separated list of service names."""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in registry]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown service(s) {', '.join(unknown)}; choose from {', '.join(registry)}")
+    return names
+
+
+QUERY_KINDS = ["libraries", "processes"]
+
+
+def query_kind(value: str) -> str:
+    if value not in QUERY_KINDS:
+        raise argparse.ArgumentTypeError(f"invalid choice {value!r} (choose from {', '.join(QUERY_KINDS)})")
+    return value
+
+
+def with_spool(specs: list, collectors: list) -> list:
+    """Add the spool drain after the other services when collectors run and `[spool]` is enabled (stopped last)."""
+    from tracer_bio_agent.config import Config
+
+    if collectors and Config.configurations.get("spool", {}).get("enabled", True):
+        return specs + [SPOOL]
+    return specs
+
+
+def cmd_run(args):
+    """Run collectors and processors in one process (the default, as `agent.py` always did)."""
+    specs = ([COLLECTORS[name] for name in args.collectors] + [PROCESSORS[name] for name in args.processors]
+             + [EXTRAS[name] for name in args.extras])
+    start([load_service(spec) for spec in with_spool(specs, args.collectors)], args.profiler)
+
+
+def cmd_collect(args):
+    specs = with_spool([COLLECTORS[name] for name in args.services], args.services)
+    start([load_service(spec) for spec in specs], args.profiler)
+
+
+def cmd_process(args):
+    start([load_service(PROCESSORS[name]) for name in args.services], args.profiler)
+
+
+def cmd_ship(args):
+    start([load_service(EXTRAS["ship"])], args.profiler)
+
+
+def cmd_api(args):
+    start([load_service(EXTRAS["api"])], args.profiler)
+
+
+def cmd_collector(args):
+    import asyncio
+
+    collector = load_service(COLLECTOR)(database_url=args.database_url, address=args.listen)
+    try:
+        asyncio.run(collector.run())
+    except KeyboardInterrupt:
+        logger.info("Received Ctrl+C, shutting down...")
+
+
+def export_paths(args):
+    """Database file, Parquet directory and storage backend of the export/sql commands, defaulting to the configuration."""
+    from tracer_bio_agent.config import Config
+    from tracer_bio_agent.export import sqlite_path_from_url, backend_from_url
+
+    if args.sqlite_db_path:
+        sqlite_db_path, backend = args.sqlite_db_path, "sqlite"
+    else:
+        sqlite_db_path, backend = sqlite_path_from_url(Config.DATABASE_URL), backend_from_url(Config.DATABASE_URL)
+    parquet_dir = args.parquet_dir or Config.configurations.get("export", {}).get("dir", "./parquet_files")
+    return sqlite_db_path, parquet_dir, backend
+
+
+def cmd_export(args):
+    from tracer_bio_agent.export import convert_sqlite_to_parquet, export_incremental
+
+    sqlite_db_path, output_dir, backend = export_paths(args)
+    if args.incremental:
+        from tracer_bio_agent.config import Config
+        batch_rows = Config.configurations.get("export", {}).get("batch_rows", 100000)
+        exported = export_incremental(sqlite_db_path, output_dir, batch_rows=batch_rows, backend=backend)
+        for table_name, count in exported.items():
+            print(f"Exported {count} new rows of '{table_name}'")
+        if not exported:
+            print("Nothing new to export.")
+        return
+
+    if backend == "duckdb":
+        sys.exit("The full export reads SQLite databases, use --incremental with the DuckDB backend")
+    convert_sqlite_to_parquet(sqlite_db_path, output_dir)
+
+
+def cmd_sql(args):
+    from tracer_bio_agent.config import Config
+    from tracer_bio_agent.query import connect_unified, print_rows, VIEWS
+
+    sqlite_db_path, parquet_dir, backend = export_paths(args)
+    views = Config.configurations.get("export", {}).get("views", VIEWS)
+    con = connect_unified(sqlite_db_path, parquet_dir, views, backend)
+    if args.explain:
+        for _, plan in con.execute(f"EXPLAIN {args.query}").fetchall():
+            print(plan)
+        return
+    print_rows(con.execute(args.query))
+
+
+def cmd_query(args):
+    from tracer_bio_agent.query import connect, top_n, print_top_n
+
+    con = connect()
+    for kind in args.kinds:
+        print_top_n(top_n(con, kind, args.parquet_dir, args.limit), label=kind.capitalize(), limit=args.limit)
+
+
+def cmd_top(args):
+    import asyncio
+    from tracer_bio_agent.sketch_store import query_top, TopNTracker
+
+    name = TopNTracker.LIBRARIES if args.kind == "libraries" else TopNTracker.PROCESSES
+    rows = asyncio.run(query_top(name, args.pipeline, args.hours, args.limit))
+
+    print(f"\nTop {args.limit} CPU-Consuming {args.kind.capitalize()} ({args.pipeline}, last {args.hours:g} h)\n" + "=" * 40)
+    print(f"{'Process':<50} {'CPU':>12} {'± error':>12}")
+    print("-" * 77)
+    for command, cpu, error in rows:
+        print(f"{command:<50} {cpu:>12.2f} {error:>12.2f}")
+    print("-" * 77)
+
+
+def cmd_quantiles(args):
+    import asyncio
+    from tracer_bio_agent.sketch_store import query_quantiles, QuantileTracker
+
+    name = QuantileTracker.DURATION if args.metric == "duration" else QuantileTracker.PEAK_RSS
+    rows = asyncio.run(query_quantiles(name, args.pipeline, args.command, args.hours))[:args.limit]
+
+    unit = "ms" if args.metric == "duration" else "KB"
+    print(f"\n{name} per tool ({args.pipeline}, last {args.hours:g} h)\n" + "=" * 40)
+    print(f"{'Tool':<30} {'Count':>8} {'p50 ' + unit:>12} {'p95 ' + unit:>12} {'p99 ' + unit:>12}")
+    print("-" * 78)
+    for tool, count, (p50, p95, p99) in rows:
+        print(f"{tool:<30} {count:>8.0f} {p50:>12.1f} {p95:>12.1f} {p99:>12.1f}")
+    print("-" * 78)
+
+
+def cmd_spool(args):
+    from tracer_bio_agent.config import Config
+    from tracer_bio_agent.spool import Spool, read_segment
+
+    settings = Config.configurations.get("spool", {})
+    spool = Spool(args.dir or settings.get("dir", "./spool"))
+    segments = spool.segments()
+    print(f"{'Segment':<30} {'Bytes':>12} {'Records':>8} {'Rows':>10}  Status")
+    print("-" * 72)
+    for number, path in segments:
+        records, clean = read_segment(path)
+        rows = sum(len(record[2]) for record in records)
+        print(f"{number:<30} {os.path.getsize(path):>12} {len(records):>8} {rows:>10}  {'ok' if clean else 'torn tail'}")
+    print("-" * 72)
+    print(f"{len(segments)} segments, {spool.bytes} bytes waiting to be drained")
+
+
+def cmd_bench(args):
+    return importlib.import_module(BENCHMARKS[args.benchmark]).main(args.bench_args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="tracer-bio-agent",
+        description="Async eBPF agent to track process executions and system metrics",
+    )
+    parser.add_argument("--config", help="Path to the TOML configuration file (default: $CONFIG_FILE or ./config.toml)")
+    parser.add_argument("--log-level", default="INFO", help="Logging level (default: INFO)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the running services: per-service CPU, event loop lag and a sampling profiler")
+    parser.add_argument("--profile-dir", help="Where to write stacks.folded and summary.txt (default: [profiling] output_dir)")
+    parser.add_argument("--profile-memory", action="store_true", default=None,
+                        help="Also take periodic tracemalloc snapshots (memory.txt)")
+    parser.set_defaults(handler=cmd_run, collectors=DEFAULT_COLLECTORS, processors=DEFAULT_PROCESSORS, extras=[])
+
+    subparsers = parser.add_subparsers(title="commands", metavar="COMMAND")
+
+    run = subparsers.add_parser("run", help="Run collectors and processors (default)")
+    run.add_argument("--collectors", type=lambda v: parse_services(v, COLLECTORS), default=DEFAULT_COLLECTORS,
+                     help=f"Comma separated collectors ({', '.join(COLLECTORS)})")
+    run.add_argument("--processors", type=lambda v: parse_services(v, PROCESSORS), default=DEFAULT_PROCESSORS,
+                     help=f"Comma separated processors ({', '.join(PROCESSORS)})")
+    run.add_argument("--with", dest="extras", type=lambda v: parse_services(v, EXTRAS), default=[],
+                     help=f"Comma separated optional services ({', '.join(EXTRAS)})")
+    run.set_defaults(handler=cmd_run)
+
+    collect = subparsers.add_parser("collect", help="Run signal and metrics collectors only")
+    collect.add_argument("--services", type=lambda v: parse_services(v, COLLECTORS), default=DEFAULT_COLLECTORS,
+                         help=f"Comma separated collectors ({', '.join(COLLECTORS)})")
+    collect.set_defaults(handler=cmd_collect)
+
+    process = subparsers.add_parser("process", help="Run execution and metrics processors only")
+    process.add_argument("--services", type=lambda v: parse_services(v, PROCESSORS), default=DEFAULT_PROCESSORS,
+                         help=f"Comma separated processors ({', '.join(PROCESSORS)})")
+    process.set_defaults(handler=cmd_process)
+
+    ship = subparsers.add_parser("ship", help="Ship processed rows to the central collector ([shipping] url)")
+    ship.set_defaults(handler=cmd_ship)
+
+    api = subparsers.add_parser("api", help="Serve cached dashboard queries over HTTP ([api] listen)")
+    api.set_defaults(handler=cmd_api)
+
+    collector = subparsers.add_parser("collector", help="Run the central ingest service receiving shipped batches")
+    collector.add_argument("--listen", help="host:port or unix:///path.sock (default: [collector] listen)")
+    collector.add_argument("--database-url", help="Central database URL (default: [collector] database_url)")
+    collector.set_defaults(handler=cmd_collector)
+
+    export = subparsers.add_parser("export", help="Export the SQLite tables to Parquet files")
+    export.add_argument("parquet_dir", metavar="output_dir", nargs="?",
+                        help="Directory to save Parquet files (default: [export] dir)")
+    export.add_argument("--sqlite-db-path", help="SQLite database file (default: from [database] url)")
+    export.add_argument("--incremental", action="store_true",
+                        help="Append the rows added since the last export to date partitions (read by `sql`)")
+    export.set_defaults(handler=cmd_export)
+
+    sql = subparsers.add_parser("sql", help="Query the executions/metrics views over live SQLite and exported Parquet")
+    sql.add_argument("query", help="SQL (DuckDB dialect), e.g. \"SELECT pipeline, count(*) FROM executions GROUP BY 1\"")
+    sql.add_argument("--parquet-dir", help="Incremental export directory (default: [export] dir)")
+    sql.add_argument("--sqlite-db-path", help="SQLite database file (default: from [database] url)")
+    sql.add_argument("--explain", action="store_true", help="Show the query plan instead of running the query")
+    sql.set_defaults(handler=cmd_sql)
+
+    query = subparsers.add_parser("query", help="Top CPU-consuming processes/libraries from the Parquet files")
+    query.add_argument("kinds", nargs="*", type=query_kind, default=QUERY_KINDS,
+                       help=f"What to rank ({', '.join(QUERY_KINDS)}; default: both)")
+    query.add_argument("--parquet-dir", default="./parquet_files", help="Directory containing the Parquet files")
+    query.add_argument("--limit", type=int, default=10, help="Number of rows to show")
+    query.set_defaults(handler=cmd_query)
+
+    top = subparsers.add_parser("top", help="Top CPU-consuming processes/libraries from the streaming sketches")
+    top.add_argument("kind", nargs="?", type=query_kind, default="processes", help="libraries or processes")
+    top.add_argument("--pipeline", default="*", help="Pipeline name (default: * for all processes)")
+    top.add_argument("--hours", type=float, default=24, help="Time range to merge (default: 24)")
+    top.add_argument("--limit", type=int, default=10, help="Number of rows to show")
+    top.set_defaults(handler=cmd_top)
+
+    quantiles = subparsers.add_parser("quantiles", help="p50/p95/p99 of tool durations or peak RSS from the sketches")
+    quantiles.add_argument("--metric", choices=["duration", "peak_rss"], default="duration",
+                           help="duration (ms, per END event) or peak_rss (KB, per process)")
+    quantiles.add_argument("--pipeline", default="*", help="Pipeline name (default: * for all pipelines)")
+    quantiles.add_argument("--command", help="Only this tool (basename of the executable)")
+    quantiles.add_argument("--hours", type=float, default=24, help="Time range to merge (default: 24)")
+    quantiles.add_argument("--limit", type=int, default=20, help="Number of tools to show")
+    quantiles.set_defaults(handler=cmd_quantiles)
+
+    spool = subparsers.add_parser("spool", help="Show the batches spooled while the database was unavailable")
+    spool.add_argument("--dir", help="Spool directory (default: [spool] dir)")
+    spool.set_defaults(handler=cmd_spool)
+
+    bench = subparsers.add_parser("bench", help="Run a benchmark")
+    bench.add_argument("benchmark", choices=list(BENCHMARKS))
+    bench.add_argument("bench_args", nargs=argparse.REMAINDER, help="Arguments passed to the benchmark")
+    bench.set_defaults(handler=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    if args.config:
+        from tracer_bio_agent.config import Config
+        Config.CONFIG_FILE = args.config
+
+    args.profiler = None
+    if args.profile:
+        from tracer_bio_agent.config import Config
+        from tracer_bio_agent.profiling import Profiler
+        args.profiler = Profiler.from_config(Config.configurations, args.profile_dir, args.profile_memory)
+
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# columnar.py (Arrow-native batches: `[arrow] enabled = true`)
+#
+# In Arrow mode records stay in `pyarrow` columns from the collector output to the database. `ps`
+# output is split and converted with Arrow string kernels instead of one split per line, execve
+# events are buffered column by column and written as one record batch instead of one pydantic
+# model, ORM object and transaction per event, and matched metrics are attributed and written with
+# compute kernels (see `MetricsProcessingService.process_metrics_arrow`). DuckDB loads and returns
+# the batches as they are; SQLite gets executemany parameters built column by column.
+#
+# bpftrace lines are still matched by `re` one at a time: Arrow's RE2 `extract_regex` is slower than
+# `re` on that pattern (its optional groups), and the pairing of START and END events is sequential.
+import logging
+import datetime
+from typing import Dict, List, Sequence
+from tracer_bio_agent.snapshot import SnapshotBatch
+
+logger = logging.getLogger(__name__)
+
+# Columns of the `executions` table written by the execve collector, in table order
+EXECUTION_COLUMNS = ("event_type", "timestamp", "pid", "ppid", "uid", "command", "executable", "args", "duration",
+                     "cpu_ticks", "start_ns", "end_ns", "exit_status")
+
+PS_FIELDS = 12  # user, pid, ppid, %cpu, %mem, vsz, rss, tty, stat, start, time, command
+
+# Snapshots with fewer lines are parsed line by line: the fixed cost of the Arrow kernels makes them
+# slower below ~300-500 processes (0.17x at 50, 0.73x at 200), and ~2x faster from 1000 on
+# (`python -m tracer_bio_agent.benchmarks.snapshot_bench --compare-parsers`)
+PS_ARROW_MIN_ROWS = 1000
+
+
+def arrow_settings(configurations: dict) -> dict | None:
+    """The `[arrow]` settings when Arrow mode is enabled, else None."""
+    settings = configurations.get("arrow", {})
+    return settings if settings.get("enabled", False) else None
+
+
+def parse_ps_lines(lines: Sequence[str], snapshot_time: datetime.datetime):
+    """
+    The data lines of a `ps -eo user,pid,ppid,...,command` snapshot as a `pyarrow.RecordBatch` in
+    `snapshot.COLUMNS` order, split and converted by Arrow kernels. Lines with missing fields are
+    skipped; a malformed number raises `pyarrow.ArrowInvalid`.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # The command is the last column and may contain spaces: keep it in one piece
+    parts = pc.ascii_split_whitespace(pa.array(lines, pa.string()), max_splits=PS_FIELDS - 1)
+    parts = parts.filter(pc.equal(pc.list_value_length(parts), PS_FIELDS))
+    field = lambda index: pc.list_element(parts, index)
+    count = len(parts)
+
+    tty = field(7)
+    columns = {
+        "user": field(0),
+        "pid": field(1).cast(pa.int64()),
+        "ppid": field(2).cast(pa.int64()),
+        "cpu": field(3).cast(pa.float64()),
+        "mem": field(4).cast(pa.float64()),
+        "vsz": field(5).cast(pa.int64()),
+        "rss": field(6).cast(pa.int64()),
+        "tty": pc.if_else(pc.equal(tty, "?"), pa.scalar(None, pa.string()), tty),
+        "stat": field(8),
+        "start": field(9),
+        "time": field(10),
+        "command": field(11),
+        "snapshot_time": pa.repeat(pa.scalar(snapshot_time, pa.timestamp("us")), count),
+        # Filled after parsing (see `proc_io.IOSampler` and `proc_meta.py`)
+        **{name: pa.nulls(count, pa.float64()) for name in ("read_bps", "write_bps", "syscr_rate", "syscw_rate")},
+        "cwd_bytes": pa.nulls(count, pa.int64()),
+        "meta_id": pa.nulls(count, pa.int64()),
+    }
+    return pa.RecordBatch.from_pydict(columns)
+
+
+def snapshot_from_ps_lines(lines: Sequence[str], snapshot_time: datetime.datetime,
+                           min_rows: int = PS_ARROW_MIN_ROWS) -> SnapshotBatch:
+    """
+    `SnapshotBatch.from_ps_lines` through `parse_ps_lines` for snapshots of at least `min_rows` lines,
+    falling back to the line parser for smaller snapshots and for malformed output.
+    """
+    import pyarrow as pa
+
+    if len(lines) < min_rows:
+        return SnapshotBatch.from_ps_lines(lines, snapshot_time)
+    try:
+        return SnapshotBatch.from_record_batch(parse_ps_lines(lines, snapshot_time), snapshot_time)
+    except pa.ArrowInvalid:
+        return SnapshotBatch.from_ps_lines(lines, snapshot_time)  # Skips (and logs) the bad lines
+
+
+class ExecutionBatch:
+    """Execve collector rows buffered column by column, written as one `pyarrow.RecordBatch`."""
+
+    def __init__(self):
+        self.columns: Dict[str, list] = {name: [] for name in EXECUTION_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns["pid"])
+
+    def append(self, values: Dict):
+        for name, column in self.columns.items():
+            column.append(values.get(name))
+
+    def rows(self) -> List[tuple]:
+        """Rows in `EXECUTION_COLUMNS` order, for the spool."""
+        return list(zip(*self.columns.values()))
+
+    def to_record_batch(self):
+        import pyarrow as pa
+        from tracer_bio_agent.export import arrow_schema
+
+        schema = arrow_schema("executions")
+        return pa.RecordBatch.from_arrays([pa.array(values, schema.field(name).type)
+                                           for name, values in self.columns.items()], names=list(self.columns))
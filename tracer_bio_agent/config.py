@@ -3,12 +3,33 @@ import toml
 import os
 
 
-class Config:
+class _LazyConfig(type):
+    """Loads the TOML file on first access to a configured value instead of at import time."""
+    LAZY_ATTRIBUTES = {"configurations", "MONITORING_INTERVAL", "PROCESSING_INTERVAL", "DATABASE_URL"}
+
+    def __getattr__(cls, name):
+        # Only called when the attribute is not set yet
+        if name not in cls.LAZY_ATTRIBUTES:
+            raise AttributeError(name)
+        cls.load()
+        return type.__getattribute__(cls, name)
+
+
+class Config(metaclass=_LazyConfig):
     CONFIG_FILE = os.getenv("CONFIG_FILE", "./config.toml")
-    configurations = toml.load(CONFIG_FILE)
-    MONITORING_INTERVAL = configurations['monitoring']['interval']
-    PROCESSING_INTERVAL = configurations['processing']['interval']
 
-    DATABASE_URL = os.getenv("DATABASE_URL", configurations['database']['url'])
     EBPF_SCRIPT = os.getenv("EBPF_SCRIPT", "./signal_collection/monitor_lifecyle_events.sh")
     PS_SCRIPT_PATH = os.getenv("PS_SCRIPT_PATH", "./signal_collection/metrics_collection.sh")
+
+    @classmethod
+    def load(cls, config_file: str | None = None):
+        """(Re)load the TOML configuration, optionally from another file."""
+        if config_file:
+            cls.CONFIG_FILE = config_file
+
+        configurations = toml.load(cls.CONFIG_FILE)
+        cls.configurations = configurations
+        cls.MONITORING_INTERVAL = configurations['monitoring']['interval']
+        cls.PROCESSING_INTERVAL = configurations['processing']['interval']
+
+        cls.DATABASE_URL = os.getenv("DATABASE_URL", configurations['database']['url'])
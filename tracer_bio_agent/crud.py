@@ -1,9 +1,152 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import delete, and_
+from sqlalchemy import delete, and_, exists, insert, DateTime
+from sqlalchemy.orm import aliased
 from typing import List, Dict, Tuple, Sequence
-from tracer_bio_agent.models import (Execution, ExecutionLogSchema, Metrics,
-                                     MetricsSchema, ProcessedExecution, ProcessedExecutionSchema)
+from datetime import datetime
+from tracer_bio_agent.models import (Execution, ExecutionLogSchema, Metrics, MetricsSchema, ProcessedExecution,
+                                     ProcessedExecutionSchema, ProcessedMetrics, ProcessedMetricsSchema, ShipOffset,
+                                     IngestOffset, Sketch, SketchOffset, SpoolOffset, ProcessMetadata)
+from tracer_bio_agent.database import Base
+from tracer_bio_agent.snapshot import SnapshotBatch, COLUMNS as SNAPSHOT_COLUMNS
+from tracer_bio_agent.proc_meta import COLUMNS as METADATA_COLUMNS
+
+
+# Hot queries, kept as module-level builders so `query_plan_validation.py` checks the exact statements
+def pipeline_parents_query(pipeline_filter: str):
+    """Pipeline parent processes (bash scripts) matching a pipeline filter."""
+    return (
+        select(Execution.pid, Execution.timestamp)
+        .where(and_(Execution.command == "bash", Execution.args.like(f"%{pipeline_filter}%")))
+    )
+
+
+def pipeline_commands_query(pipeline_pid: int):
+    """Execution events spawned by a pipeline parent process."""
+    return select(Execution).where(Execution.ppid == pipeline_pid)
+
+
+def duplicate_execution_query(pid: int, timestamp, event_type: str):
+    """Processed execution matching a raw event, if it was already moved."""
+    return select(ProcessedExecution).where(
+        (ProcessedExecution.pid == pid) &
+        (ProcessedExecution.timestamp == timestamp) &
+        (ProcessedExecution.event_type == event_type)
+    )
+
+
+def processed_events_query(pids: Sequence[int]):
+    """Keys (pid, timestamp, event_type) of the processed executions of some pids, for bulk duplicate checks."""
+    return (
+        select(ProcessedExecution.pid, ProcessedExecution.timestamp, ProcessedExecution.event_type)
+        .where(ProcessedExecution.pid.in_(pids))
+    )
+
+
+# Provisional START rows (see `ExecveLoggerService`) whose EXEC row is stored. `processed_executions` is
+# append-only, since shipping and incremental export read it by id, so these rows are kept and every
+# reader skips them: `superseded_start` in queries, `SUPERSEDED_START_SQL` in raw SQL (`{table}` is the
+# table or view to look the EXEC row up in, `{row}` the alias of the row tested).
+SUPERSEDED_START_SQL = ("{row}.event_type = 'START' AND EXISTS (SELECT 1 FROM {table} x WHERE x.pid = {row}.pid "
+                        "AND x.\"timestamp\" = {row}.\"timestamp\" AND x.event_type = 'EXEC')")
+
+
+def superseded_start(rows=ProcessedExecution):
+    """`SUPERSEDED_START_SQL` for rows of `processed_executions` (or an alias of it)."""
+    exec_rows = aliased(ProcessedExecution)
+    return and_(rows.event_type == "START", exists().where(
+        (exec_rows.pid == rows.pid) & (exec_rows.timestamp == rows.timestamp) & (exec_rows.event_type == "EXEC")))
+
+
+def matched_metrics_query():
+    """Raw metrics joined to the pipeline of the processed execution they belong to, and to their process metadata."""
+    return (
+        select(Metrics, ProcessedExecution.pipeline, ProcessMetadata.user, ProcessMetadata.command)
+        .join(ProcessedExecution, Metrics.pid == ProcessedExecution.pid)
+        .outerjoin(ProcessMetadata, Metrics.meta_id == ProcessMetadata.meta_id)
+        .where(~superseded_start())
+    )
+
+
+def matched_metric_columns_query():
+    """`matched_metrics_query` as plain columns, for reading it as an Arrow table (`fetch_arrow`)."""
+    return (
+        select(*Metrics.__table__.columns, ProcessedExecution.pipeline,
+               ProcessMetadata.user.label("meta_user"), ProcessMetadata.command.label("meta_command"))
+        .join(ProcessedExecution, Metrics.pid == ProcessedExecution.pid)
+        .outerjoin(ProcessMetadata, Metrics.meta_id == ProcessMetadata.meta_id)
+        .where(~superseded_start())
+    )
+
+
+async def arrow_connection(session: AsyncSession):
+    """The DuckDB connection behind a session, which bulk loads Arrow data (see `duckdb_backend.py`), or None on SQLite."""
+    connection = await session.connection()
+    if connection.dialect.name != "duckdb":
+        return None
+    return (await connection.get_raw_connection()).driver_connection
+
+
+def arrow_rows(table_name: str, rows: List[Dict]):
+    """Rows (dicts) as an Arrow table typed like `table_name`, for `AsyncDuckDBConnection.insert_arrow`."""
+    import pyarrow as pa
+    from tracer_bio_agent.export import arrow_schema
+
+    schema = arrow_schema(table_name)
+    names = [name for name in schema.names if rows and name in rows[0]]
+    return pa.Table.from_pylist(rows, schema=pa.schema([schema.field(name) for name in names]))
+
+
+async def fetch_arrow(session: AsyncSession, statement):
+    """
+    Result of a Core select as an Arrow table typed from its selected columns, in the current
+    transaction: returned as it is by DuckDB, converted column by column from the rows on SQLite.
+    """
+    import pyarrow as pa
+    from tracer_bio_agent.export import arrow_type, rows_to_arrow
+
+    schema = pa.schema([pa.field(column.name, arrow_type(column.type)) for column in statement.selected_columns])
+    connection = await session.connection()
+    compiled = statement.compile(dialect=connection.dialect)
+    parameters = tuple(compiled.params[name] for name in compiled.positiontup or ())
+
+    duckdb = await arrow_connection(session)
+    if duckdb is not None:
+        table = await duckdb.fetch_arrow(str(compiled), list(parameters))
+        return table.rename_columns(schema.names).cast(schema)
+    result = await connection.exec_driver_sql(str(compiled), parameters)
+    return rows_to_arrow(result.fetchall(), schema)
+
+
+def sqlite_parameters(data) -> List[tuple]:
+    """Rows of an Arrow table as DBAPI parameters, with timestamps formatted like SQLAlchemy's SQLite `DateTime`."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = []
+    for column in data.columns:
+        if pa.types.is_timestamp(column.type):
+            column = pc.strftime(column, "%Y-%m-%d %H:%M:%S")  # Microseconds included for timestamp("us")
+        columns.append(column.to_pylist())
+    return list(zip(*columns))
+
+
+async def insert_arrow(session: AsyncSession, table, data):
+    """
+    Insert an Arrow table (or record batch) into `table` in the current transaction: loaded as it is
+    by DuckDB, one executemany with parameters built column by column on SQLite.
+    """
+    if not data.num_rows:
+        return
+    duckdb = await arrow_connection(session)
+    if duckdb is not None:
+        await duckdb.insert_arrow(table.name, data)
+        return
+
+    names = [column.name for column in table.columns if column.name in data.schema.names]  # Compiled in table order
+    connection = await session.connection()
+    statement = insert(table).compile(dialect=connection.dialect, column_keys=names)
+    await connection.exec_driver_sql(str(statement), sqlite_parameters(data.select(names)))
 
 
 class MetricsRepository:
@@ -22,12 +165,86 @@ class MetricsRepository:
             await self.session.rollback()  # Rollback if any issue occurs
             raise e  # Raise error for logging
 
+    async def add_snapshot(self, batch: SnapshotBatch):
+        """Bulk insert a columnar snapshot with a single driver-level executemany."""
+        if not len(batch):
+            return
+
+        try:
+            async with self.session.begin():
+                duckdb = await arrow_connection(self.session)
+                if duckdb is not None:
+                    await duckdb.insert_arrow(Metrics.__tablename__, batch.to_record_batch())
+                    return
+
+                conn = await self.session.connection()
+                statement = insert(Metrics.__table__).compile(dialect=conn.dialect, column_keys=SNAPSHOT_COLUMNS)
+
+                # Convert the shared timestamp once instead of once per row
+                bind_timestamp = Metrics.__table__.c.snapshot_time.type.bind_processor(conn.dialect)
+                snapshot_time = bind_timestamp(batch.snapshot_time) if bind_timestamp else batch.snapshot_time
+
+                await conn.exec_driver_sql(str(statement), list(batch.rows(snapshot_time)))
+
+        except Exception as e:
+            await self.session.rollback()  # Rollback if any issue occurs
+            raise e  # Raise error for logging
+
+    async def add_snapshots(self, batches: List[SnapshotBatch]):
+        """Bulk insert several snapshots in one transaction, sorted by (pid, snapshot time) so each process's rows are adjacent."""
+        if not batches:
+            return
+
+        try:
+            async with self.session.begin():
+                duckdb = await arrow_connection(self.session)
+                if duckdb is not None:
+                    import pyarrow as pa
+
+                    batches = sorted(batches, key=lambda batch: batch.snapshot_time)
+                    table = pa.Table.from_batches([batch.to_record_batch() for batch in batches])
+                    await duckdb.insert_arrow(Metrics.__tablename__, table.sort_by("pid"))  # Stable sort
+                    return
+
+                conn = await self.session.connection()
+                statement = insert(Metrics.__table__).compile(dialect=conn.dialect, column_keys=SNAPSHOT_COLUMNS)
+                bind_timestamp = Metrics.__table__.c.snapshot_time.type.bind_processor(conn.dialect)
+
+                rows = []
+                for batch in sorted(batches, key=lambda batch: batch.snapshot_time):
+                    snapshot_time = bind_timestamp(batch.snapshot_time) if bind_timestamp else batch.snapshot_time
+                    rows.extend(batch.rows(snapshot_time))
+                rows.sort(key=lambda row: row[1])  # Stable: snapshot order is kept per pid
+
+                await conn.exec_driver_sql(str(statement), rows)
+
+        except Exception as e:
+            await self.session.rollback()  # Rollback if any issue occurs
+            raise e  # Raise error for logging
+
     async def get_all_processes(self) -> Sequence[Metrics]:
         result = await self.session.execute(select(Metrics))
         return result.scalars().all()
 
 
 
+class ProcessMetadataRepository:
+    """Stores process metadata entries (see `proc_meta.py`); entries already stored are skipped."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add_metadata(self, rows: Sequence[Sequence]):
+        """Insert rows in `proc_meta.COLUMNS` order in one transaction."""
+        if not rows:
+            return
+
+        async with self.session.begin():
+            # Ids are derived from the process, so an entry resolved again (or by another agent process) is a duplicate
+            await self.session.execute(insert(ProcessMetadata).prefix_with("OR IGNORE"),
+                                       [dict(zip(METADATA_COLUMNS, row)) for row in rows])
+
+
 class ExecutionRepository:
     """Handles CRUD operations for Execution table."""
 
@@ -40,6 +257,11 @@ class ExecutionRepository:
         self.session.add(execution)
         await self.session.commit()
 
+    async def add_executions(self, data):
+        """Insert an Arrow batch of execution logs (see `columnar.ExecutionBatch`) in one transaction."""
+        async with self.session.begin():
+            await insert_arrow(self.session, Execution.__table__, data)
+
     async def get_executions(self, pid: int) -> Sequence[Execution]:
         """Retrieve executions by PID."""
         result = await self.session.execute(select(Execution).filter(Execution.pid == pid))
@@ -59,10 +281,7 @@ class ExecutionRepository:
 
         async with self.session.begin():
             for pipeline_filter in filtered_executables.keys():
-                query = (
-                    select(Execution.pid, Execution.timestamp)
-                    .where(and_(Execution.command == "bash", Execution.args.like(f"%{pipeline_filter}%")))
-                )
+                query = pipeline_parents_query(pipeline_filter)
                 result = await self.session.execute(query)
                 pipeline_pids[pipeline_filter] = [(row[0], row[1]) for row in result.fetchall()]
 
@@ -80,7 +299,7 @@ class ExecutionRepository:
         for pipeline_name, run in pipeline_pids.items():
             for (pipeline_pid, timestamp) in run:
                 async with self.session.begin():
-                    query = select(Execution).where(Execution.ppid == pipeline_pid)
+                    query = pipeline_commands_query(pipeline_pid)
                     result = await self.session.execute(query)
                     commands_by_pipeline[(pipeline_name, pipeline_pid, timestamp)] = result.scalars().all()
 
@@ -105,13 +324,230 @@ class ProcessedExecutionRepository:
         self.session.add(processed_exec)  # No transaction here
         # Do NOT call `self.session.commit()`, let the calling function handle commits.
 
+    async def add_processed_executions(self, executions: List[ProcessedExecutionSchema]):
+        """Bulk insert processed executions with one executemany (the caller manages the transaction)."""
+        rows = [execution.dict() for execution in executions]
+        duckdb = await arrow_connection(self.session)
+        if duckdb is not None:
+            await duckdb.insert_arrow(ProcessedExecution.__tablename__, arrow_rows(ProcessedExecution.__tablename__, rows))
+            return
+        await self.session.execute(insert(ProcessedExecution), rows)
+
+    async def get_processed_keys(self, pids: Sequence[int], chunk_size: int = 500) -> set:
+        """(pid, timestamp, event_type) of every processed execution of `pids`, one query per chunk."""
+        pids = list(pids)
+        keys = set()
+        for start in range(0, len(pids), chunk_size):
+            result = await self.session.execute(processed_events_query(pids[start:start + chunk_size]))
+            keys.update(tuple(row) for row in result)
+        return keys
+
     async def check_duplicate(self, pid: int, timestamp: str, event_type: str) -> bool:
         """Check if a processed execution already exists."""
-        exists_query = select(ProcessedExecution).where(
-            (ProcessedExecution.pid == pid) &
-            (ProcessedExecution.timestamp == timestamp) &
-            (ProcessedExecution.event_type == event_type)
-        )
+        exists_query = duplicate_execution_query(pid, timestamp, event_type)
         result = await self.session.execute(exists_query)
         return result.scalars().first() is not None
 
+
+class ProcessedMetricsRepository:
+    """Handles CRUD operations for ProcessedMetrics table."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add_processed_metrics(self, metrics: List[ProcessedMetricsSchema]):
+        """Insert processed metrics, e.g. from collectors that attribute them to a pipeline themselves."""
+        async with self.session.begin():
+            duckdb = await arrow_connection(self.session)
+            if duckdb is not None:
+                rows = [metric.dict() for metric in metrics]
+                await duckdb.insert_arrow(ProcessedMetrics.__tablename__, arrow_rows(ProcessedMetrics.__tablename__, rows))
+                return
+            self.session.add_all([ProcessedMetrics(**metric.dict()) for metric in metrics])
+
+    async def add_processed_metrics_table(self, data):
+        """Insert processed metrics given as an Arrow table (the caller manages the transaction)."""
+        await insert_arrow(self.session, ProcessedMetrics.__table__, data)
+
+
+# Processed tables shipped from agents to the central collector, by stream name
+SHIPPED_TABLES = {
+    "processed_executions": ProcessedExecution.__table__,
+    "processed_metrics": ProcessedMetrics.__table__,
+}
+
+
+class ShippingRepository:
+    """Reads processed rows for shipping and tracks the offsets acknowledged by the collector."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_offset(self, stream: str) -> int:
+        """Last row id acknowledged by the collector for a stream."""
+        async with self.session.begin():
+            record = await self.session.get(ShipOffset, stream)
+            return record.offset if record else 0
+
+    async def set_offset(self, stream: str, offset: int):
+        async with self.session.begin():
+            await self.session.merge(ShipOffset(stream=stream, offset=offset))
+
+    async def rows_after(self, stream: str, offset: int, limit: int) -> Tuple[List[str], Sequence[Tuple]]:
+        """Rows with an id greater than `offset`, in id order (columns include `id`, exclude `host`)."""
+        table = SHIPPED_TABLES[stream]
+        columns = [column for column in table.columns if column.name != "host"]
+
+        async with self.session.begin():
+            query = select(*columns).where(table.c.id > offset).order_by(table.c.id).limit(limit)
+            result = await self.session.execute(query)
+            return [column.name for column in columns], result.all()
+
+
+class IngestRepository:
+    """Bulk loads shipped batches on the central collector, exactly once per source row."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def ingest_batch(self, host: str, stream: str, after: int,
+                           columns: List[str], rows: List[list]) -> Tuple[bool, int]:
+        """
+        Insert the rows of a batch that were not ingested yet and advance the host offset.
+
+        Rows and offset are written in one transaction, so a batch re-sent after a lost
+        acknowledgement is skipped instead of duplicated. Returns (accepted, offset): a batch
+        starting after the stored offset is rejected so the agent can rewind to `offset`.
+        """
+        table = SHIPPED_TABLES[stream]
+        id_index = columns.index("id")
+        datetime_indexes = [i for i, name in enumerate(columns)
+                            if name in table.c and isinstance(table.c[name].type, DateTime)]
+
+        async with self.session.begin():
+            record = await self.session.get(IngestOffset, (host, stream))
+            if record is None:
+                record = IngestOffset(host=host, stream=stream, offset=0)
+                self.session.add(record)
+
+            if after > record.offset:
+                return False, record.offset  # Gap: rows between the two offsets were never received
+
+            values = []
+            for row in rows:
+                if row[id_index] <= record.offset:
+                    continue  # Already ingested
+                for i in datetime_indexes:
+                    if row[i] is not None:
+                        row[i] = datetime.fromisoformat(row[i])
+                value = dict(zip(columns, row))
+                del value["id"]  # Central ids are assigned by the collector database
+                value["host"] = host
+                values.append(value)
+
+            if values:
+                await self.session.execute(insert(table), values)
+                record.offset = max(row[id_index] for row in rows)
+
+            return True, record.offset
+
+
+class SpoolRepository:
+    """Drains spooled collector batches (see `spool.py`) back into their tables, exactly once per segment."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_offset(self, spool: str) -> int:
+        """Last segment of a spool directory already drained."""
+        async with self.session.begin():
+            record = await self.session.get(SpoolOffset, spool)
+            return record.segment if record else 0
+
+    async def drain_segment(self, spool: str, segment: int, records: List[Tuple[str, List[str], List[list]]],
+                            chunk_size: int = 5000) -> int:
+        """Insert the rows of a segment and record it as drained in one transaction; returns the rows inserted."""
+        count = 0
+        async with self.session.begin():
+            for table_name, columns, rows in records:
+                table = Base.metadata.tables[table_name]
+                datetime_indexes = [i for i, name in enumerate(columns)
+                                    if name in table.c and isinstance(table.c[name].type, DateTime)]
+                # Rows carrying their own primary key (process metadata) may already be stored
+                or_ignore = all(column.name in columns for column in table.primary_key)
+                values = []
+                for row in rows:
+                    for i in datetime_indexes:
+                        if row[i] is not None:
+                            row[i] = datetime.fromisoformat(row[i])
+                    values.append(dict(zip(columns, row)))
+                duckdb = await arrow_connection(self.session)
+                if duckdb is not None:
+                    if values:
+                        await duckdb.insert_arrow(table_name, arrow_rows(table_name, values), or_ignore=or_ignore)
+                else:
+                    statement = insert(table).prefix_with("OR IGNORE") if or_ignore else insert(table)
+                    for start in range(0, len(values), chunk_size):
+                        await self.session.execute(statement, values[start:start + chunk_size])
+                count += len(values)
+            await self.session.merge(SpoolOffset(spool=spool, segment=segment))
+        return count
+
+
+class SketchRepository:
+    """Handles persistence of windowed streaming sketches."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_payload(self, kind: str, name: str, pipeline: str, key: str, host: str,
+                          window_start: datetime) -> str | None:
+        async with self.session.begin():
+            query = select(Sketch.payload).where(
+                (Sketch.kind == kind) & (Sketch.name == name) & (Sketch.pipeline == pipeline) &
+                (Sketch.window_start == window_start) & (Sketch.key == key) & (Sketch.host == host)
+            )
+            result = await self.session.execute(query)
+            return result.scalars().first()
+
+    async def get_offset(self, stream: str) -> int:
+        """Last source row id of a stream already counted in the stored sketches."""
+        async with self.session.begin():
+            record = await self.session.get(SketchOffset, stream)
+            return record.offset if record else 0
+
+    async def save_payloads(self, sketches: List[Dict], offsets: Dict[str, int] | None = None):
+        """
+        Insert or replace sketches, given as dicts of `Sketch` column values, in one transaction,
+        and advance the given stream offsets in the same transaction.
+        """
+        async with self.session.begin():
+            for stream, offset in (offsets or {}).items():
+                await self.session.merge(SketchOffset(stream=stream, offset=offset))
+            for values in sketches:
+                query = select(Sketch).where(
+                    (Sketch.kind == values["kind"]) & (Sketch.name == values["name"]) &
+                    (Sketch.pipeline == values["pipeline"]) & (Sketch.window_start == values["window_start"]) &
+                    (Sketch.key == values["key"]) & (Sketch.host == values["host"])
+                )
+                record = (await self.session.execute(query)).scalars().first()
+                if record is None:
+                    self.session.add(Sketch(**values))
+                else:
+                    record.payload = values["payload"]
+
+    async def get_payloads(self, kind: str, name: str, pipeline: str, since: datetime,
+                           until: datetime | None = None, key: str | None = None) -> Sequence[Tuple[str, str]]:
+        """(key, payload) of every window (and host) starting in [since, until), optionally for one key."""
+        query = select(Sketch.key, Sketch.payload).where(
+            (Sketch.kind == kind) & (Sketch.name == name) & (Sketch.pipeline == pipeline) &
+            (Sketch.window_start >= since)
+        )
+        if until is not None:
+            query = query.where(Sketch.window_start < until)
+        if key is not None:
+            query = query.where(Sketch.key == key)
+
+        async with self.session.begin():
+            result = await self.session.execute(query)
+            return result.all()
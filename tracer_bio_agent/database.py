@@ -1,10 +1,15 @@
 # database.py (DB setup and session management)
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects import registry
 from tracer_bio_agent.config import Config
 
+# `duckdb:///path` URLs, see duckdb_backend.py (imported only when such a URL is used)
+registry.register("duckdb", "tracer_bio_agent.duckdb_backend", "DuckDBDialect")
+
 DATABASE_URL = Config.DATABASE_URL
-engine = create_async_engine(Config.DATABASE_URL, connect_args={"check_same_thread": False}, future=True)
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+engine = create_async_engine(Config.DATABASE_URL, connect_args=connect_args, future=True)
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
@@ -0,0 +1,311 @@
+# duckdb_backend.py (DuckDB storage backend: `[database] url = "duckdb:///./tracer_bio.duckdb"`)
+#
+# A small asyncio SQLAlchemy dialect, so the repositories of `crud.py` and every service run unchanged
+# on a DuckDB file. Statements are compiled by the PostgreSQL dialect, which DuckDB understands; the
+# DuckDB connection is driven from one worker thread per connection, like aiosqlite does for SQLite.
+# Bulk writes bypass row-by-row statements and are loaded from Arrow tables (`insert_arrow`, used by
+# the repositories through `crud.arrow_connection`), and query results can be read back as Arrow
+# tables (`fetch_arrow`).
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Sequence
+from sqlalchemy import pool
+from sqlalchemy.connectors.asyncio import AsyncAdapt_dbapi_connection, AsyncAdapt_dbapi_cursor, AsyncAdapt_dbapi_module
+from sqlalchemy.dialects.postgresql.base import PGDialect, PGDDLCompiler, PGTypeCompiler, PGExecutionContext
+from sqlalchemy.util.concurrency import await_
+
+DML = ("INSERT", "UPDATE", "DELETE")
+
+
+def sequence_name(table_name: str) -> str:
+    return f"{table_name}_id_seq"
+
+
+class AsyncDuckDBConnection:
+    """
+    asyncio facade of a DuckDB connection. Every call runs on the connection's own thread.
+
+    DuckDB connections autocommit; DBAPI (and SQLAlchemy) expects a transaction to start with the
+    first statement and to end with `commit()` or `rollback()`, so `BEGIN` is issued lazily.
+    """
+
+    def __init__(self, database: str, config: dict | None = None):
+        self.database = database
+        self.config = config or {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="duckdb")
+        self.connection = None
+        self.in_transaction = False
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def open(self) -> "AsyncDuckDBConnection":
+        import duckdb
+
+        self.connection = await self.run(lambda: duckdb.connect(self.database, config=self.config))
+        return self
+
+    def _begin(self):
+        if not self.in_transaction:
+            self.connection.begin()
+            self.in_transaction = True
+
+    def cursor(self) -> "AsyncDuckDBCursor":
+        return AsyncDuckDBCursor(self)
+
+    async def commit(self):
+        await self.run(self._end, "commit")
+
+    async def rollback(self):
+        await self.run(self._end, "rollback")
+
+    def _end(self, method: str):
+        if self.in_transaction:
+            self.in_transaction = False
+            getattr(self.connection, method)()
+
+    async def close(self):
+        if self.connection is not None:
+            await self.run(self.connection.close)
+            self.connection = None
+        self.executor.shutdown(wait=False)
+
+    async def insert_arrow(self, table_name: str, data, or_ignore: bool = False):
+        """
+        Append an Arrow table (or record batch) to `table_name` in the current transaction, matching columns
+        by name. With `or_ignore`, rows whose primary key is already stored are skipped.
+        """
+        import duckdb
+        from sqlalchemy.exc import DBAPIError
+
+        try:
+            await self.run(self._insert_arrow, table_name, data, or_ignore)
+        except duckdb.Error as e:
+            # Raised like statements run through SQLAlchemy, e.g. OperationalError for the spool
+            raise DBAPIError.instance(f"INSERT INTO {table_name} (Arrow)", None, e, duckdb.Error) from e
+
+    def _insert_arrow(self, table_name: str, data, or_ignore: bool):
+        if not data.num_rows:
+            return
+        self._begin()
+        view = f"_ingest_{threading.get_ident()}"
+        columns = ", ".join(f'"{name}"' for name in data.schema.names)
+        self.connection.register(view, data)
+        try:
+            self.connection.execute(f'INSERT {"OR IGNORE " if or_ignore else ""}INTO "{table_name}" ({columns}) '
+                                    f'SELECT {columns} FROM "{view}"')
+        finally:
+            self.connection.unregister(view)
+
+    async def fetch_arrow(self, sql: str, parameters=None):
+        """Result of a query as an Arrow table, read in the current transaction."""
+        import duckdb
+        from sqlalchemy.exc import DBAPIError
+
+        try:
+            return await self.run(self._fetch_arrow, sql, parameters)
+        except duckdb.Error as e:
+            raise DBAPIError.instance(sql, parameters, e, duckdb.Error) from e
+
+    def _fetch_arrow(self, sql: str, parameters):
+        self._begin()
+        return self.connection.execute(sql, parameters).fetch_arrow_table()
+
+
+class AsyncDuckDBCursor:
+    """DBAPI cursor over the connection itself (a DuckDB `cursor()` is a separate connection, outside the transaction)."""
+
+    arraysize = 1
+
+    def __init__(self, connection: AsyncDuckDBConnection):
+        self._connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def close(self):
+        self._rows = []
+
+    def _execute(self, operation: str, parameters=None):
+        connection = self._connection
+        connection._begin()
+        connection.connection.execute(operation, parameters)
+        description = connection.connection.description
+        rows = connection.connection.fetchall() if description else []
+        # DuckDB returns the affected row count of a DML statement as a one-row result
+        if (description and description[0][0] == "Count" and len(rows) == 1
+                and operation.lstrip()[:6].upper() in DML and "RETURNING" not in operation.upper()):
+            self.description, self.rowcount, self._rows = None, rows[0][0], []
+        else:
+            self.description, self.rowcount, self._rows = description, len(rows), rows
+
+    def _executemany(self, operation: str, seq_of_parameters: Sequence):
+        connection = self._connection
+        connection._begin()
+        parameters = list(seq_of_parameters)
+        connection.connection.executemany(operation, parameters)
+        self.description, self.rowcount, self._rows = None, len(parameters), []
+
+    async def execute(self, operation: str, parameters=None):
+        await self._connection.run(self._execute, operation, parameters)
+
+    async def executemany(self, operation: str, seq_of_parameters: Sequence):
+        await self._connection.run(self._executemany, operation, seq_of_parameters)
+
+    async def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    async def nextset(self):
+        return None
+
+    async def setinputsizes(self, *sizes):
+        return None
+
+
+class AsyncAdapt_duckdb_cursor(AsyncAdapt_dbapi_cursor):
+    __slots__ = ()
+
+
+class AsyncAdapt_duckdb_connection(AsyncAdapt_dbapi_connection):
+    __slots__ = ()
+
+    _cursor_cls = AsyncAdapt_duckdb_cursor
+
+    def terminate(self):
+        self._connection.executor.shutdown(wait=False)
+
+
+class AsyncAdapt_duckdb_dbapi(AsyncAdapt_dbapi_module):
+    paramstyle = "qmark"
+
+    def __init__(self, duckdb):
+        super().__init__(duckdb, dbapi_module=duckdb)
+        self.duckdb = duckdb
+        for name in ("Error", "DatabaseError", "DataError", "IntegrityError", "InternalError", "NotSupportedError",
+                     "OperationalError", "ProgrammingError", "Warning"):
+            setattr(self, name, getattr(duckdb, name))
+        self.InterfaceError = duckdb.Error  # Not defined by DuckDB
+
+    def connect(self, database: str = ":memory:", **config: Any) -> AsyncAdapt_duckdb_connection:
+        return AsyncAdapt_duckdb_connection(self, await_(AsyncDuckDBConnection(database, config).open()))
+
+
+class DuckDBTypeCompiler(PGTypeCompiler):
+    def visit_float(self, type_, **kw):
+        return "DOUBLE"  # FLOAT is single precision in DuckDB
+
+    def visit_integer(self, type_, **kw):
+        return "BIGINT"  # INTEGER is 32-bit in DuckDB; SQLite integers, which the models were written for, are 64-bit
+
+
+class DuckDBDDLCompiler(PGDDLCompiler):
+    def visit_create_table(self, create, **kw):
+        # Integer primary keys are filled from a sequence instead of SERIAL
+        table = create.element
+        column = table._autoincrement_column
+        statement = super().visit_create_table(create, **kw)
+        if column is None:
+            return statement
+        return f"CREATE SEQUENCE IF NOT EXISTS {sequence_name(table.name)};\n{statement}"
+
+    def get_column_specification(self, column, **kwargs):
+        if column is column.table._autoincrement_column:
+            return (f"{self.preparer.format_column(column)} {self.type_compiler.process(column.type)} "
+                    f"DEFAULT nextval('{sequence_name(column.table.name)}') NOT NULL")
+        return super().get_column_specification(column, **kwargs)
+
+    def visit_create_index(self, create, **kw):
+        # Plain indexes slow appends down and DuckDB prunes scans with zone maps instead;
+        # unique ones are kept because they enforce constraints
+        if not create.element.unique:
+            return "SELECT 1"
+        return super().visit_create_index(create, **kw)
+
+
+class DuckDBExecutionContext(PGExecutionContext):
+    pass
+
+
+class DuckDBDialect(PGDialect):
+    """PostgreSQL-flavoured SQL on DuckDB, through `AsyncDuckDBConnection`."""
+
+    name = "duckdb"
+    driver = "duckdb"
+    is_async = True
+    supports_statement_cache = True
+    supports_server_side_cursors = False
+    supports_sane_multi_rowcount = False
+    supports_identity_columns = False
+    use_insertmanyvalues_wo_returning = True  # Multi-row VALUES: DuckDB's executemany binds one row at a time
+    default_paramstyle = "qmark"
+    preexecute_autoincrement_sequences = False
+
+    type_compiler_cls = DuckDBTypeCompiler
+    ddl_compiler = DuckDBDDLCompiler
+    execution_ctx_cls = DuckDBExecutionContext
+
+    @classmethod
+    def import_dbapi(cls):
+        return AsyncAdapt_duckdb_dbapi(__import__("duckdb"))
+
+    @classmethod
+    def get_pool_class(cls, url):
+        return pool.AsyncAdaptedQueuePool
+
+    def create_connect_args(self, url):
+        return [], {"database": url.database or ":memory:", **url.query}
+
+    def get_driver_connection(self, connection):
+        return connection._connection
+
+    def do_terminate(self, dbapi_connection):
+        dbapi_connection.terminate()
+
+    def initialize(self, connection):
+        super(PGDialect, self).initialize(connection)
+        self.supports_smallserial = False
+        self._backslash_escapes = False
+        self._supports_drop_index_concurrently = False
+
+    def _get_server_version_info(self, connection):
+        return (14, 0)  # Closest PostgreSQL version for the compiler
+
+    def _get_default_schema_name(self, connection):
+        return "main"
+
+    def get_isolation_level(self, dbapi_connection):
+        return "SERIALIZABLE"  # Snapshot isolation, no other levels
+
+    def set_isolation_level(self, dbapi_connection, level):
+        pass
+
+    def get_default_isolation_level(self, dbapi_connection):
+        return "SERIALIZABLE"
+
+    def do_ping(self, dbapi_connection):
+        return True
+
+    def has_table(self, connection, table_name, schema=None, **kw):
+        return bool(connection.exec_driver_sql(
+            "SELECT 1 FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+            (schema or "main", table_name)).first())
+
+    def has_sequence(self, connection, sequence_name, schema=None, **kw):
+        return bool(connection.exec_driver_sql(
+            "SELECT 1 FROM duckdb_sequences() WHERE schema_name = ? AND sequence_name = ?",
+            (schema or "main", sequence_name)).first())
+
+    def has_index(self, connection, table_name, index_name, schema=None, **kw):
+        return bool(connection.exec_driver_sql(
+            "SELECT 1 FROM duckdb_indexes() WHERE schema_name = ? AND index_name = ?",
+            (schema or "main", index_name)).first())
+
+
+dialect = DuckDBDialect
+
@@ -0,0 +1,229 @@
+# export.py (SQLite -> Parquet export)
+import os
+import glob
+import json
+import sqlite3
+
+
+def convert_sqlite_to_parquet(sqlite_db_path: str, output_dir: str):
+    """
+    Converts an SQLite database into Parquet files, saving each table as a separate Parquet file.
+
+    Args:
+        sqlite_db_path (str): Path to the SQLite database file.
+        output_dir (str): Directory where Parquet files will be stored.
+    """
+    import pandas as pd  # Heavy dependency, only needed when exporting
+
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Connect to the SQLite database
+    conn = sqlite3.connect(sqlite_db_path)
+
+    # Fetch all table names
+    query = "SELECT name FROM sqlite_master WHERE type='table';"
+    tables = pd.read_sql(query, conn)
+
+    if tables.empty:
+        print("No tables found in the database.")
+        return
+
+    print(f"Found {len(tables)} tables: {tables['name'].tolist()}")
+
+    # Convert each table to a Parquet file
+    for table_name in tables["name"]:
+        df = pd.read_sql(f"SELECT * FROM {table_name};", conn)
+        output_file = os.path.join(output_dir, f"{table_name}.parquet")
+
+        df.to_parquet(output_file, engine="pyarrow", index=False)
+        print(f"✅ Converted table '{table_name}' to '{output_file}'")
+
+    # Close the database connection
+    conn.close()
+    print("Conversion complete.")
+
+
+def sqlite_path_from_url(database_url: str) -> str:
+    """Extract the file path from a `sqlite+aiosqlite:///./file.db` (or `duckdb:///./file.duckdb`) style URL."""
+    return database_url.split(":///", 1)[-1]
+
+
+def backend_from_url(database_url: str) -> str:
+    """`duckdb` for the DuckDB storage backend, else `sqlite`."""
+    return "duckdb" if database_url.startswith("duckdb") else "sqlite"
+
+
+# Incremental, partitioned export read by the unified hot/cold query layer (see `query.connect_unified`).
+#
+# Rows are appended to `<output_dir>/<table>/date=YYYY-MM-DD/part-<first id>-<last id>.parquet`
+# in id order, and the last exported id of each table (its watermark) is recorded in
+# `<output_dir>/_watermark.json` once the files are written. Rows up to the watermark are read
+# from Parquet, rows after it from SQLite, so a query never sees a row twice or misses one.
+
+WATERMARK_FILE = "_watermark.json"
+
+# Tables exported incrementally and the column used for their date partitions
+TIME_COLUMNS = {
+    "processed_executions": "timestamp",
+    "processed_metrics": "snapshot_time",
+    "executions": "timestamp",
+    "metrics": "snapshot_time",
+}
+
+NULL_DATE = "1970-01-01"  # Partition of rows without a timestamp
+
+
+def read_watermarks(output_dir: str) -> dict:
+    """Last exported id of each table, {} before the first incremental export."""
+    try:
+        with open(os.path.join(output_dir, WATERMARK_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_watermarks(output_dir: str, watermarks: dict):
+    """Atomically replace the watermark file."""
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def arrow_type(column_type):
+    """Arrow type of a SQLAlchemy column type."""
+    import pyarrow as pa
+    from sqlalchemy import Integer, Float, DateTime
+
+    if isinstance(column_type, Integer):  # BigInteger included
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def arrow_schema(table_name: str):
+    """Arrow schema of a table, from its SQLAlchemy model, so every part file has the same types."""
+    import pyarrow as pa
+    from tracer_bio_agent import models  # noqa: F401, registers the tables
+    from tracer_bio_agent.database import Base
+
+    return pa.schema([pa.field(column.name, arrow_type(column.type))
+                      for column in Base.metadata.tables[table_name].columns])
+
+
+def rows_to_arrow(rows, schema):
+    """DBAPI rows as an Arrow table of `schema`, converted column by column."""
+    import pyarrow as pa
+
+    import pyarrow.compute as pc
+
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pa.types.is_timestamp(field.type):
+            # SQLite returns timestamps as ISO strings: let Arrow parse them column-wise. A UTC offset
+            # (stored for timezone-aware values) is ignored, as by SQLAlchemy's SQLite `DateTime`
+            values = pa.array(values) if values else pa.array([], field.type)
+            if pa.types.is_string(values.type):
+                values = pc.replace_substring_regex(values, r"[+-]\d\d:\d\d$", "")
+            arrays.append(values.cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def part_files(output_dir: str, table_name: str):
+    """(first id, path) of every exported part of a table."""
+    for path in glob.glob(os.path.join(output_dir, table_name, "date=*", "part-*.parquet")):
+        first_id = int(os.path.basename(path)[len("part-"):].split("-", 1)[0])
+        yield first_id, path
+
+
+def export_table(conn, output_dir: str, table_name: str, after_id: int,
+                 batch_rows: int = 100000):
+    """Append rows with `id > after_id` to the date partitions of a table; yields (last id, rows) per batch."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(table_name)
+    time_column = TIME_COLUMNS[table_name]
+    columns = ", ".join(f'"{name}"' for name in schema.names)
+
+    while True:
+        cursor = conn.execute(f'SELECT {columns} FROM "{table_name}" WHERE id > ? ORDER BY id LIMIT ?',
+                              (after_id, batch_rows))
+        if hasattr(cursor, "fetch_arrow_table"):
+            batch = cursor.fetch_arrow_table().cast(schema)  # DuckDB: already columnar, no Python rows
+        else:
+            batch = rows_to_arrow(cursor.fetchall(), schema)
+        if not batch.num_rows:
+            return
+
+        dates = pc.fill_null(pc.strftime(batch[time_column], format="%Y-%m-%d"), NULL_DATE)
+        for date in pc.unique(dates).to_pylist():
+            part = batch.filter(pc.equal(dates, date))
+            ids = part["id"]
+            directory = os.path.join(output_dir, table_name, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{pc.min(ids).as_py():012d}-{pc.max(ids).as_py():012d}.parquet")
+            pq.write_table(part, path + ".tmp", compression="zstd")
+            os.replace(path + ".tmp", path)
+
+        after_id = batch["id"][-1].as_py()
+        yield after_id, batch.num_rows
+
+
+# Table lookup of each backend
+TABLE_EXISTS = {
+    "sqlite": "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+    "duckdb": "SELECT 1 FROM information_schema.tables WHERE table_name = ?",
+}
+
+
+def connect_database(db_path: str, backend: str = "sqlite"):
+    """DBAPI connection for reading a database file of the given backend."""
+    if backend == "duckdb":
+        import duckdb
+
+        # Not read-only: in the agent process this shares the open database instead of being refused
+        return duckdb.connect(db_path)
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def export_incremental(sqlite_db_path: str, output_dir: str, tables=None, batch_rows: int = 100000,
+                       backend: str = "sqlite") -> dict:
+    """
+    Export the rows added since the previous run of each table, returning the rows exported per table.
+
+    Parts left after the watermark by an interrupted export are removed first and written again,
+    and the watermark advances after every batch, so a crash never duplicates or skips rows.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    watermarks = read_watermarks(output_dir)
+    exported = {}
+
+    conn = connect_database(sqlite_db_path, backend)
+    try:
+        for table_name in tables or TIME_COLUMNS:
+            exists = conn.execute(TABLE_EXISTS[backend], (table_name,)).fetchone()
+            if not exists:
+                continue
+
+            watermark = watermarks.get(table_name, 0)
+            for first_id, path in part_files(output_dir, table_name):
+                if first_id > watermark:
+                    os.remove(path)  # Written after the last recorded watermark
+
+            for last_id, count in export_table(conn, output_dir, table_name, watermark, batch_rows):
+                exported[table_name] = exported.get(table_name, 0) + count
+                watermarks[table_name] = last_id
+                write_watermarks(output_dir, watermarks)
+    finally:
+        conn.close()
+    return exported
@@ -1,5 +1,5 @@
 # models.py (SQLAlchemy models and Pydantic schemas)
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Index, Text
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional
@@ -7,30 +7,48 @@ from tracer_bio_agent.database import Base
 
 
 class Execution(Base):
-    """Database model for storing execution details."""
+    """Database model for storing execution details.
+
+    Buffer table: rows are appended by the eBPF logger and drained by the processor, so it only
+    carries the indexes used by `ExecutionRepository` (parent lookup by command, children by ppid).
+    `EXEC` rows are complete executions paired by the logger; `START`/`END` rows are only written
+    for pipeline parents still running and for exits whose start was not seen.
+    """
     __tablename__ = "executions"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_executions_command", "command"),
+        Index("ix_executions_ppid", "ppid"),
+        {'extend_existing': True},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    event_type = Column(String, index=True)  # START or END
-    timestamp = Column(DateTime, index=True)
-    pid = Column(Integer, index=True)
-    ppid = Column(Integer, index=True)
-    uid = Column(Integer, index=True)
-    command = Column(String, index=True)
-    args = Column(String, nullable=True)
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String)  # EXEC, START or END
+    timestamp = Column(DateTime)
+    pid = Column(Integer)
+    ppid = Column(Integer)
+    uid = Column(Integer)
+    command = Column(String)  # Name of the task calling execve()
+    executable = Column(String, nullable=True)  # argv[0] (EXEC only)
+    args = Column(String, nullable=True)  # Comma separated argv[1:] (EXEC), full argv (START)
     duration = Column(Integer, nullable=True)
-    cpu_ticks = Column(Integer, nullable=True)
+    cpu_ticks = Column(BigInteger, nullable=True)  # CPU time in ns (bpftrace `CPU`)
+    start_ns = Column(BigInteger, nullable=True)  # Monotonic (since boot) timestamps from bpftrace
+    end_ns = Column(BigInteger, nullable=True)
+    exit_status = Column(Integer, nullable=True)  # Exit code, or -signal if killed
 
 class Metrics(Base):
-    """Database model for storing resource usage metrics."""
+    """Database model for storing resource usage metrics.
+
+    Buffer table: every snapshot is appended here and scanned once by the metrics processor,
+    so no secondary index (or foreign key) is maintained on insert.
+    """
     __tablename__ = "metrics"
     __table_args__ = {'extend_existing': True}
 
-    id = Column(Integer, primary_key=True, index=True)
-    user = Column(String, index=True)
-    pid = Column(Integer, ForeignKey("executions.pid"), index=True)
-    ppid = Column(Integer, index=True, nullable=True)
+    id = Column(Integer, primary_key=True)
+    user = Column(String)
+    pid = Column(Integer)
+    ppid = Column(Integer, nullable=True)
     cpu = Column(Float)
     mem = Column(Float)
     vsz = Column(Integer)
@@ -41,35 +59,75 @@ class Metrics(Base):
     time = Column(String)
     command = Column(String)
     snapshot_time = Column(DateTime)
+    # Rates since the previous sample, for processes of running pipelines only (see `proc_io.py`)
+    read_bps = Column(Float, nullable=True)
+    write_bps = Column(Float, nullable=True)
+    syscr_rate = Column(Float, nullable=True)
+    syscw_rate = Column(Float, nullable=True)
+    cwd_bytes = Column(BigInteger, nullable=True)  # Working directory growth, pipeline parents only
+    # `process_metadata` entry of the process; user and command are NULL when the entry holds them
+    meta_id = Column(BigInteger, nullable=True)
+
+
+class ProcessMetadata(Base):
+    """Static attributes of one process image, stored once and referenced by `Metrics.meta_id` (see `proc_meta.py`)."""
+    __tablename__ = "process_metadata"
+    __table_args__ = {'extend_existing': True}
+
+    meta_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    pid = Column(Integer, nullable=False)
+    start_ticks = Column(BigInteger, nullable=False)  # Clock ticks since the epoch
+    user = Column(String, nullable=True)
+    exe = Column(String, nullable=True)
+    command = Column(String, nullable=False)  # Full command line
+    cgroup = Column(String, nullable=True)
+    pipeline = Column(String, nullable=True)
+    first_seen = Column(DateTime)
 
 class ProcessedExecution(Base):
     """Database model for storing processed execution events."""
     __tablename__ = "processed_executions"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Per-run timelines (dashboards, run summaries)
+        Index("ix_processed_executions_run", "pipeline", "run_id", "timestamp"),
+        # Duplicate check in the processor and pid joins from the metrics processor
+        Index("ix_processed_executions_event", "pid", "timestamp", "event_type"),
+        Index("ix_processed_executions_ppid", "ppid"),
+        {'extend_existing': True},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    user = Column(String, index=True)
-    event_type = Column(String, index=True)  # START or END
-    timestamp = Column(DateTime, index=True)
-    pid = Column(Integer, index=True)
-    ppid = Column(Integer, index=True)
-    uid = Column(Integer, index=True)
-    command = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    user = Column(String)
+    event_type = Column(String)  # EXEC, START or END
+    timestamp = Column(DateTime)
+    pid = Column(Integer)
+    ppid = Column(Integer)
+    uid = Column(Integer)
+    command = Column(String)
     args = Column(String, nullable=True)
     duration = Column(Integer, nullable=True)
-    cpu_ticks = Column(Integer, nullable=True)
-    pipeline = Column(String, index=True)
-    run_id = Column(String, index=True)
+    cpu_ticks = Column(BigInteger, nullable=True)  # CPU time in ns (bpftrace `CPU`)
+    start_ns = Column(BigInteger, nullable=True)
+    end_ns = Column(BigInteger, nullable=True)
+    exit_status = Column(Integer, nullable=True)
+    pipeline = Column(String)
+    run_id = Column(String)
+    host = Column(String, nullable=True)  # Source agent, set by the central collector
 
 
 class ProcessedMetrics(Base):
     """Database model for storing filtered and processed metrics."""
     __tablename__ = "processed_metrics"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Per-pipeline CPU/RSS series
+        Index("ix_processed_metrics_series", "pipeline", "snapshot_time"),
+        Index("ix_processed_metrics_pid", "pid", "snapshot_time"),
+        {'extend_existing': True},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    user = Column(String, index=True)
-    pid = Column(Integer, index=True)
+    id = Column(Integer, primary_key=True)
+    user = Column(String)
+    pid = Column(Integer)
     cpu = Column(Float)
     mem = Column(Float)
     vsz = Column(Integer)
@@ -78,9 +136,73 @@ class ProcessedMetrics(Base):
     stat = Column(String)
     start = Column(String)
     time = Column(String)
-    command = Column(String, index=True)
+    command = Column(String)
     snapshot_time = Column(DateTime)
-    pipeline = Column(String, index=True)  # The pipeline it belongs to
+    pipeline = Column(String)  # The pipeline it belongs to
+    host = Column(String, nullable=True)  # Source agent, set by the central collector
+    read_bps = Column(Float, nullable=True)
+    write_bps = Column(Float, nullable=True)
+    syscr_rate = Column(Float, nullable=True)
+    syscw_rate = Column(Float, nullable=True)
+    cwd_bytes = Column(BigInteger, nullable=True)
+    # Cumulative totals of a whole run, from its cgroup (stat "cgroup" rows only)
+    cpu_usec = Column(BigInteger, nullable=True)
+    memory_peak = Column(BigInteger, nullable=True)  # KB
+    read_bytes = Column(BigInteger, nullable=True)
+    write_bytes = Column(BigInteger, nullable=True)
+
+
+class ShipOffset(Base):
+    """Last row id of each processed table acknowledged by the central collector."""
+    __tablename__ = "ship_offsets"
+    __table_args__ = {'extend_existing': True}
+
+    stream = Column(String, primary_key=True)
+    offset = Column(Integer, nullable=False, default=0)
+
+
+class IngestOffset(Base):
+    """Last source row id ingested by the central collector, per agent host and stream."""
+    __tablename__ = "ingest_offsets"
+    __table_args__ = {'extend_existing': True}
+
+    host = Column(String, primary_key=True)
+    stream = Column(String, primary_key=True)
+    offset = Column(Integer, nullable=False, default=0)
+
+class SpoolOffset(Base):
+    """Last spool segment drained into this database, written in the same transaction as its rows."""
+    __tablename__ = "spool_offsets"
+    __table_args__ = {'extend_existing': True}
+
+    spool = Column(String, primary_key=True)  # Absolute path of the spool directory
+    segment = Column(BigInteger, nullable=False, default=0)
+
+class SketchOffset(Base):
+    """Last source row id counted in the sketches, written in the same transaction as the sketch windows."""
+    __tablename__ = "sketch_offsets"
+    __table_args__ = {'extend_existing': True}
+
+    stream = Column(String, primary_key=True)
+    offset = Column(Integer, nullable=False, default=0)
+
+class Sketch(Base):
+    """Persisted streaming sketch (see `sketches.py`) for one summary, pipeline, key, host and time window."""
+    __tablename__ = "sketches"
+    __table_args__ = (
+        Index("ix_sketches_window", "kind", "name", "pipeline", "window_start", "key", "host", unique=True),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # Sketch type, e.g. heavy_hitters
+    name = Column(String, nullable=False)  # What is summarized, e.g. cpu_processes
+    pipeline = Column(String, nullable=False)  # "*" for all processes
+    key = Column(String, nullable=False, default="")  # Optional sub-key, e.g. the command of a quantile sketch
+    host = Column(String, nullable=False)
+    window_start = Column(DateTime, nullable=False)
+    window_seconds = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON, from the sketch `to_dict()`
 
 
 class ExecutionLogSchema(BaseModel):
@@ -90,9 +212,13 @@ class ExecutionLogSchema(BaseModel):
     ppid: int
     uid: int
     command: str
+    executable: Optional[str] = None
     args: Optional[str] = None
     duration: Optional[int] = None
     cpu_ticks: Optional[int] = None
+    start_ns: Optional[int] = None
+    end_ns: Optional[int] = None
+    exit_status: Optional[int] = None
 
 
 class MetricsSchema(BaseModel):
@@ -109,11 +235,16 @@ class MetricsSchema(BaseModel):
     time: str
     command: str
     snapshot_time: datetime
+    read_bps: Optional[float] = None
+    write_bps: Optional[float] = None
+    syscr_rate: Optional[float] = None
+    syscw_rate: Optional[float] = None
+    cwd_bytes: Optional[int] = None
 
 class ProcessedExecutionSchema(BaseModel):
     """Pydantic schema for processed execution events."""
     user: str
-    event_type: str  # START or END
+    event_type: str  # EXEC, START or END
     timestamp: datetime
     pid: int
     ppid: int
@@ -122,6 +253,9 @@ class ProcessedExecutionSchema(BaseModel):
     args: Optional[str] = None
     duration: Optional[int] = None
     cpu_ticks: Optional[int] = None
+    start_ns: Optional[int] = None
+    end_ns: Optional[int] = None
+    exit_status: Optional[int] = None
     pipeline: str
     run_id: str
 
@@ -140,4 +274,13 @@ class ProcessedMetricsSchema(BaseModel):
     time: str
     command: str
     snapshot_time: datetime
-    pipeline: str
\ No newline at end of file
+    pipeline: str
+    read_bps: Optional[float] = None
+    write_bps: Optional[float] = None
+    syscr_rate: Optional[float] = None
+    syscw_rate: Optional[float] = None
+    cwd_bytes: Optional[int] = None
+    cpu_usec: Optional[int] = None
+    memory_peak: Optional[int] = None
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
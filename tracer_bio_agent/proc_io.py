@@ -0,0 +1,203 @@
+# proc_io.py (per-process disk I/O rates for the processes of running pipelines)
+import os
+import time
+import logging
+from typing import Dict, Iterable, List, Tuple
+from tracer_bio_agent.snapshot import SnapshotBatch
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_SHELLS = ("bash", "sh")
+IO_COUNTERS = ("read_bytes", "write_bytes", "syscr", "syscw")  # Those `IOSampler` turns into rates
+
+
+def read_io(pid: int, proc_root: str = "/proc") -> Dict[str, int] | None:
+    """
+    Counters of `/proc/<pid>/io` (rchar, wchar, syscr, syscw, read_bytes, write_bytes, ...), or
+    None when the file cannot be read or parsed (e.g. cut short while the process exits).
+    """
+    try:
+        with open(f"{proc_root}/{pid}/io") as f:
+            data = f.read()
+    except OSError:
+        return None  # Gone, or not ours to read
+
+    counters = {}
+    try:
+        for line in data.splitlines():
+            key, _, value = line.partition(":")
+            counters[key] = int(value)
+    except ValueError:
+        return None
+    if any(key not in counters for key in IO_COUNTERS):
+        return None
+    return counters
+
+
+def directory_size(path: str, max_entries: int) -> Tuple[int, bool]:
+    """Apparent size of the files below `path`, and whether the walk finished within `max_entries`."""
+    total, seen, pending = 0, 0, [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    seen += 1
+                    if seen > max_entries:
+                        return total, False
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total, True
+
+
+def io_sampler_from_config(configurations: dict) -> "IOSampler | None":
+    """`IOSampler` configured from `[monitoring]`, or None when `io = false`."""
+    settings = configurations.get("monitoring", {})
+    if not settings.get("io", True):
+        return None
+    return IOSampler(
+        configurations.get("filters", {}).get("executables", {}),
+        budget_ms=settings.get("io_budget_ms", 5.0),
+        cwd_interval=settings.get("cwd_interval", 60),
+        cwd_max_entries=settings.get("cwd_max_entries", 100000),
+    )
+
+
+class IOSampler:
+    """
+    Adds I/O rates to a metrics snapshot, for the processes of running pipelines only.
+
+    Pipeline parents are found in the snapshot itself (a shell whose command line contains a
+    `[filters.executables]` name, as in `crud.pipeline_parents_query`) and their descendants by
+    walking the ppid column, so untracked processes cost nothing. For each tracked process
+    `/proc/<pid>/io` is read once per sample and turned into rates (storage bytes/s and
+    read/write syscalls/s) against the previous sample; raw counters are never stored.
+
+    Reads stop once the sample has used `budget_ms` of CPU time; the next sample resumes with the
+    processes that were skipped. The working directory of each pipeline parent is measured
+    every `cwd_interval` seconds, if budget is left, with a walk bounded to `cwd_max_entries`,
+    and reported as growth since the run was first seen.
+    """
+
+    def __init__(self, pipeline_filters: Iterable[str], budget_ms: float = 5.0, cwd_interval: float = 60,
+                 cwd_max_entries: int = 100000, proc_root: str = "/proc"):
+        self.pipeline_filters = list(pipeline_filters)
+        self.budget = budget_ms / 1000
+        self.cwd_interval = cwd_interval
+        self.cwd_max_entries = cwd_max_entries
+        self.proc_root = proc_root
+
+        self.previous: Dict[Tuple[int, str], Tuple[float, Dict[str, int]]] = {}  # (pid, start) -> (time, counters)
+        self.cwd_baseline: Dict[Tuple[int, str], int] = {}  # (parent pid, start) -> size when first seen
+        self.cwd_checked: Dict[Tuple[int, str], float] = {}
+        self.cwd_growth: Dict[Tuple[int, str], int] = {}
+        self.skipped: List[int] = []  # Pids left over by the previous sample
+        self.over_budget = 0  # Samples that hit the CPU budget
+
+    def is_pipeline_parent(self, command: str) -> bool:
+        executable = command.split(None, 1)[0] if command else ""
+        return os.path.basename(executable) in PIPELINE_SHELLS and any(
+            name in command for name in self.pipeline_filters)
+
+    def tracked(self, batch: SnapshotBatch) -> Tuple[List[int], List[int]]:
+        """Row indexes of the pipeline parents and of all their descendants (parents included)."""
+        children: Dict[int, List[int]] = {}
+        for index, ppid in enumerate(batch.ppid):
+            children.setdefault(ppid, []).append(index)
+
+        parents = [index for index, command in enumerate(batch.command) if self.is_pipeline_parent(command)]
+        tracked, pending, seen = [], list(parents), set()
+        while pending:
+            index = pending.pop()
+            if index in seen:
+                continue
+            seen.add(index)
+            tracked.append(index)
+            pending.extend(children.get(batch.pid[index], ()))
+        return parents, tracked
+
+    def sample(self, batch: SnapshotBatch):
+        """Fill the I/O columns of the tracked processes in `batch`."""
+        parents, tracked = self.tracked(batch)
+        if not tracked:
+            for state in (self.previous, self.cwd_baseline, self.cwd_checked, self.cwd_growth):
+                state.clear()
+            return
+
+        started = time.thread_time()
+        now = time.monotonic()
+
+        # Processes skipped by the previous (over budget) sample go first
+        first = set(self.skipped)
+        order = sorted(tracked, key=lambda index: batch.pid[index] not in first)
+        current = {}
+        self.skipped = []
+
+        for position, index in enumerate(order):
+            if time.thread_time() - started > self.budget:
+                self.skipped = [batch.pid[i] for i in order[position:]]
+                self.over_budget += 1
+                logger.debug(f"I/O sampling over budget, {len(self.skipped)} processes deferred")
+                break
+
+            pid = batch.pid[index]
+            counters = read_io(pid, self.proc_root)
+            if counters is None:
+                continue
+
+            key = (pid, batch.start[index])
+            current[key] = (now, counters)
+            previous = self.previous.get(key)
+            if previous is None:
+                continue
+
+            elapsed = now - previous[0]
+            if elapsed <= 0:
+                continue
+            last = previous[1]
+            batch.read_bps[index] = (counters["read_bytes"] - last["read_bytes"]) / elapsed
+            batch.write_bps[index] = (counters["write_bytes"] - last["write_bytes"]) / elapsed
+            batch.syscr_rate[index] = (counters["syscr"] - last["syscr"]) / elapsed
+            batch.syscw_rate[index] = (counters["syscw"] - last["syscw"]) / elapsed
+
+        # Keep the counters of deferred processes so their next rate spans both samples
+        deferred = set(self.skipped)
+        for key, value in self.previous.items():
+            if key[0] in deferred and key not in current:
+                current[key] = value
+        self.previous = current
+
+        self.sample_cwd(batch, parents, now, started)
+
+    def sample_cwd(self, batch: SnapshotBatch, parents: List[int], now: float, started: float):
+        """Working directory growth of each running pipeline, refreshed every `cwd_interval` within the budget."""
+        running = set()
+        for index in parents:
+            key = (batch.pid[index], batch.start[index])
+            running.add(key)
+
+            due = now - self.cwd_checked.get(key, -self.cwd_interval) >= self.cwd_interval
+            if due and time.thread_time() - started <= self.budget:
+                self.cwd_checked[key] = now
+                try:
+                    cwd = os.readlink(f"{self.proc_root}/{key[0]}/cwd")
+                except OSError:
+                    continue
+                size, complete = directory_size(cwd, self.cwd_max_entries)
+                if not complete:
+                    logger.debug(f"Working directory {cwd} has more than {self.cwd_max_entries} entries")
+                baseline = self.cwd_baseline.setdefault(key, size)
+                self.cwd_growth[key] = size - baseline
+
+            if key in self.cwd_growth:
+                batch.cwd_bytes[index] = self.cwd_growth[key]
+
+        for state in (self.cwd_baseline, self.cwd_checked, self.cwd_growth):
+            for key in [key for key in state if key not in running]:
+                del state[key]
@@ -0,0 +1,257 @@
+# proc_meta.py (shared cache of the static attributes of each process, keyed by (pid, start time))
+#
+# User, executable, command line, cgroup and pipeline of a process do not change while it runs, yet
+# every sample used to carry (and store) them again. `MetadataCache` resolves them once per process,
+# at execve time when the execve collector sees it first, and stores them once in `process_metadata`;
+# samples only keep the `meta_id` of their process.
+import os
+import sys
+import hashlib
+import logging
+import datetime
+import threading
+from typing import Dict, Iterable, List, Tuple
+from tracer_bio_agent.cache import BoundedCache, MISSING
+from tracer_bio_agent.proc_io import PIPELINE_SHELLS
+from tracer_bio_agent.snapshot import SnapshotBatch, SHARED_USER, SHARED_COMMAND
+
+logger = logging.getLogger(__name__)
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+# Column order of the `process_metadata` table, as produced by `ProcessMeta.row()`
+COLUMNS = ("meta_id", "pid", "start_ticks", "user", "exe", "command", "cgroup", "pipeline", "first_seen")
+
+
+def read_boot_time(proc_root: str = "/proc") -> int:
+    """Boot time in seconds since the epoch (`btime` of /proc/stat), as used by psutil's `create_time`."""
+    with open(os.path.join(proc_root, "stat")) as f:
+        for line in f:
+            if line.startswith("btime "):
+                return int(line.split()[1])
+    raise OSError(f"No btime in {proc_root}/stat")
+
+
+def read_start_ticks(pid: int, proc_root: str = "/proc") -> int | None:
+    """Start time of a process in clock ticks since boot (field 22 of `/proc/<pid>/stat`), or None if it is gone."""
+    try:
+        with open(f"{proc_root}/{pid}/stat") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces and parentheses: fields are counted after the last ")"
+    fields = data[data.rfind(")") + 2:].split()
+    try:
+        return int(fields[19])
+    except (IndexError, ValueError):
+        return None
+
+
+def read_exe(pid: int, proc_root: str = "/proc") -> str | None:
+    try:
+        return os.readlink(f"{proc_root}/{pid}/exe")
+    except OSError:
+        return None  # Kernel thread, gone, or not ours to read
+
+
+def read_cgroup(pid: int, proc_root: str = "/proc") -> str | None:
+    """cgroup v2 path of a process (the `0::` line of `/proc/<pid>/cgroup`)."""
+    try:
+        with open(f"{proc_root}/{pid}/cgroup") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        if line.startswith("0::"):
+            return line[3:]
+    return None
+
+
+def metadata_id(pid: int, start_ticks: int, command: str) -> int:
+    """
+    Stable id of a process image: the same (pid, start time, command line) always gets the same id,
+    in every agent process and across restarts, so metadata can be inserted without a lookup.
+    A process that calls execve() again keeps its pid and start time but gets a new id.
+    """
+    digest = hashlib.blake2b(f"{pid}:{start_ticks}:{command}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> 1  # Positive signed 64-bit
+
+
+class ProcessMeta:
+    """Static attributes of one process image."""
+    __slots__ = ("meta_id", "pid", "start_ticks", "user", "exe", "command", "cgroup", "pipeline", "first_seen")
+
+    def __init__(self, pid: int, start_ticks: int, user: str | None, exe: str | None, command: str,
+                 cgroup: str | None = None, pipeline: str | None = None):
+        self.meta_id = metadata_id(pid, start_ticks, command)
+        self.pid = pid
+        self.start_ticks = start_ticks
+        self.user = sys.intern(user) if user is not None else None
+        self.exe = exe
+        self.command = sys.intern(command)
+        self.cgroup = cgroup
+        self.pipeline = pipeline
+        self.first_seen = datetime.datetime.now(datetime.timezone.utc)
+
+    def row(self) -> Tuple:
+        """Values in `COLUMNS` order."""
+        return (self.meta_id, self.pid, self.start_ticks, self.user, self.exe, self.command, self.cgroup,
+                self.pipeline, self.first_seen)
+
+
+class MetadataCache:
+    """
+    Bounded LRU/TTL cache of `ProcessMeta` by (pid, start ticks since the epoch), so a reused pid is
+    never mistaken for the process that had it before.
+
+    The execve collector registers processes as they start (`register_exec`); the metrics collectors
+    look their samples up (`annotate_ps`, `get`) and only read /proc for processes not seen yet.
+    New entries wait in `pending` until a writer stores them (`take_pending`). Evicted or expired
+    entries are simply resolved again: their id does not change and they are stored with
+    `INSERT OR IGNORE`.
+    """
+
+    def __init__(self, pipeline_filters: Iterable[str] = (), max_entries: int = 65536, ttl: float | None = 3600,
+                 proc_root: str = "/proc"):
+        self.pipeline_filters = list(pipeline_filters)
+        self.proc_root = proc_root
+        self.boot_ticks = read_boot_time(proc_root) * CLK_TCK
+
+        self.entries = BoundedCache(max_entries, ttl)  # (pid, start ticks) -> ProcessMeta
+        self.by_pid = BoundedCache(max_entries, ttl)  # pid -> latest ProcessMeta, for pipeline inheritance
+        # (pid, ps start, ps command) -> (ProcessMeta | None, shared flags): one lookup per `ps` row
+        self.signatures = BoundedCache(max_entries, ttl)
+        self.pending: Dict[int, ProcessMeta] = {}  # meta_id -> entry not stored yet
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def start_ticks(self, pid: int) -> int | None:
+        """Start time of a running process in clock ticks since the epoch."""
+        ticks = read_start_ticks(pid, self.proc_root)
+        return None if ticks is None else self.boot_ticks + ticks
+
+    def pipeline_of(self, executable: str, command: str, ppid: int | None) -> str | None:
+        """Pipeline of a process: the filter matched by a pipeline shell (as `crud.pipeline_parents_query`), else its parent's."""
+        if os.path.basename(executable) in PIPELINE_SHELLS:
+            for name in self.pipeline_filters:
+                if name in command:
+                    return name
+        parent = self.by_pid.get(ppid) if ppid is not None else None
+        return parent.pipeline if parent is not None else None
+
+    def get(self, pid: int, start_ticks: int) -> ProcessMeta | None:
+        return self.entries.get((pid, start_ticks))
+
+    def register(self, pid: int, start_ticks: int, user: str | None, command: str, executable: str,
+                 ppid: int | None = None) -> ProcessMeta:
+        """Cached entry of a process image, created (and queued for storage) if it was not known yet."""
+        key = (pid, start_ticks)
+        meta = self.entries.get(key)
+        if meta is not None and meta.command == command:
+            return meta
+
+        meta = ProcessMeta(pid, start_ticks, user, read_exe(pid, self.proc_root), command,
+                           read_cgroup(pid, self.proc_root), self.pipeline_of(executable, command, ppid))
+        self.entries.put(key, meta)
+        self.by_pid.put(pid, meta)
+        with self.lock:
+            self.pending[meta.meta_id] = meta
+        return meta
+
+    def register_exec(self, pid: int, ppid: int, user: str | None, argv: List[str]) -> ProcessMeta | None:
+        """Entry of a process that just called execve(), or None if it already exited."""
+        start_ticks = self.start_ticks(pid)
+        if start_ticks is None:
+            return None
+        return self.register(pid, start_ticks, user, " ".join(argv), argv[0] if argv else "", ppid)
+
+    def annotate_ps(self, batch: SnapshotBatch):
+        """
+        Fill `meta_id` and `shared` of a parsed `ps` snapshot. Rows are matched by (pid, start, command),
+        so /proc is only read for processes (or process images) not seen before.
+        """
+        misses = {}
+        for index in range(len(batch)):
+            entry = self.signatures.get((batch.pid[index], batch.start[index], batch.command[index]), MISSING)
+            if entry is MISSING:
+                misses[batch.pid[index]] = index
+            elif entry[0] is not None:
+                batch.meta_id[index], batch.shared[index] = entry[0].meta_id, entry[1]
+
+        # Parents first, so children inherit the pipeline of a parent seen in the same snapshot
+        resolved = set()
+        for index in misses.values():
+            chain = [index]
+            while batch.ppid[chain[-1]] in misses and misses[batch.ppid[chain[-1]]] not in resolved:
+                parent = misses[batch.ppid[chain[-1]]]
+                if parent in chain:
+                    break
+                chain.append(parent)
+            for position in reversed(chain):
+                if position not in resolved:
+                    resolved.add(position)
+                    self._resolve_ps(batch, position)
+
+    def _resolve_ps(self, batch: SnapshotBatch, index: int):
+        pid, user, command = batch.pid[index], batch.user[index], batch.command[index]
+        start_ticks = self.start_ticks(pid)
+        if start_ticks is None:
+            meta = None  # Exited since the snapshot
+        else:
+            ppid = batch.ppid[index]
+            meta = self.register(pid, start_ticks, user, command, command.split(None, 1)[0] if command else "",
+                                 ppid if ppid >= 0 else None)
+        flags = shared_flags(meta, user, command)
+        self.signatures.put((pid, batch.start[index], command), (meta, flags))
+        if meta is not None:
+            batch.meta_id[index], batch.shared[index] = meta.meta_id, flags
+
+    def take_pending(self) -> List[Tuple]:
+        """Rows (in `COLUMNS` order) of the entries not stored yet; the caller stores them."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return [meta.row() for meta in pending.values()]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.entries.hits + self.signatures.hits,
+            "misses": self.entries.misses + self.signatures.misses,
+            "pending": len(self.pending),
+        }
+
+
+def shared_flags(meta: ProcessMeta | None, user: str | None, command: str | None) -> int:
+    """`SnapshotBatch.shared` flags: the sample values that its metadata entry already stores."""
+    if meta is None:
+        return 0
+    return (SHARED_USER if user == meta.user else 0) | (SHARED_COMMAND if command == meta.command else 0)
+
+
+_shared = None
+
+
+def shared_metadata(configurations: dict) -> MetadataCache | None:
+    """The process-wide `MetadataCache` configured from `[metadata]`, or None when disabled."""
+    global _shared
+    settings = configurations.get("metadata", {})
+    if not settings.get("enabled", True):
+        return None
+    if _shared is None:
+        try:
+            _shared = MetadataCache(
+                configurations.get("filters", {}).get("executables", {}),
+                max_entries=settings.get("max_entries", 65536),
+                ttl=settings.get("ttl", 3600),
+            )
+        except OSError as e:
+            logger.warning(f"Process metadata cache disabled, /proc is not readable: {e}")
+            return None
+    return _shared
+
+
+def current_metadata() -> MetadataCache | None:
+    """The cache of the collectors of this process, if any."""
+    return _shared
@@ -0,0 +1,287 @@
+# profiling.py (built-in profiling mode: per-service CPU attribution, event loop lag, sampling profiler)
+import os
+import sys
+import time
+import asyncio
+import logging
+import linecache
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, List
+from tracer_bio_agent.sketches import DDSketch
+
+logger = logging.getLogger(__name__)
+
+
+class StepStats:
+    """Wall and CPU time spent running one service's coroutine, step by step."""
+    __slots__ = ("steps", "wall", "cpu", "max_step", "steps_over")
+
+    SLOW_STEP = 0.1  # Seconds: a step this long blocks every other service
+
+    def __init__(self):
+        self.steps = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.max_step = 0.0
+        self.steps_over = 0
+
+    def add(self, wall: float, cpu: float):
+        self.steps += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.max_step = max(self.max_step, wall)
+        if wall >= self.SLOW_STEP:
+            self.steps_over += 1
+
+
+class ProfiledCoroutine:
+    """
+    Wraps a coroutine and times every step it runs on the event loop.
+
+    A step is the code between two `await`s that actually suspend, so the sum over a service is
+    the event loop time it used, and `thread_time` gives its CPU share on the loop thread. Work
+    handed to other threads (e.g. aiosqlite) only shows up in the sampling profiler.
+    """
+
+    def __init__(self, coroutine, stats: StepStats):
+        self.coroutine = coroutine
+        self.stats = stats
+
+    def _step(self, method, *args):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return method(*args)
+        finally:
+            self.stats.add(time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def send(self, value):
+        return self._step(self.coroutine.send, value)
+
+    def throw(self, *args):
+        return self._step(self.coroutine.throw, *args)
+
+    def close(self):
+        return self.coroutine.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+
+def _thread_cpu(ident: int) -> float | None:
+    """CPU time of a thread, or None where per-thread clocks are unavailable."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+# Leaf frames of threads blocked in a wait, by (file, function): the current line must contain
+# the given call, or None if the whole function is the wait
+BLOCKING_WAITS = {
+    ("selectors.py", "select"): None,  # Event loop polling for I/O
+    ("threading.py", "wait"): None,  # Condition.wait / Event.wait, where queue.Queue.get blocks
+    ("core.py", "_connection_worker_thread"): "tx.get()",  # aiosqlite worker waiting for the next call
+    ("thread.py", "_worker"): "work_queue.get(",  # Executor worker waiting for the next call
+}
+
+
+class SamplingProfiler(threading.Thread):
+    """
+    Samples the Python stacks of all other threads at `hz` and counts them as folded stacks.
+
+    This is an on-CPU profile: threads whose CPU clock did not advance since the previous round
+    are skipped, and so are stacks whose leaf frame is a known blocking wait (`BLOCKING_WAITS`).
+    A thread that ran during the round is usually back in its wait by the time it is sampled,
+    so the clock alone would still count the idle database workers and the loop in `select`.
+    """
+
+    def __init__(self, hz: float = 100):
+        super().__init__(name="tracer-profiler", daemon=True)
+        self.interval = 1 / hz
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle = 0
+        self.stopped = threading.Event()
+        self.waits = {}  # (code, line) -> whether the frame is blocked in a wait
+
+    @staticmethod
+    def fold(frame) -> List[str]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def waiting(self, frame) -> bool:
+        """Whether a leaf frame is blocked in one of `BLOCKING_WAITS`."""
+        key = frame.f_code, frame.f_lineno
+        if key not in self.waits:
+            code = frame.f_code
+            call = BLOCKING_WAITS.get((os.path.basename(code.co_filename), code.co_name), False)
+            self.waits[key] = call is None or (bool(call) and call in linecache.getline(code.co_filename, frame.f_lineno))
+        return self.waits[key]
+
+    def run(self):
+        own = threading.get_ident()
+        last_cpu = {}
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                cpu = _thread_cpu(ident)
+                previous, last_cpu[ident] = last_cpu.get(ident), cpu
+                if (cpu is not None and (previous is None or cpu <= previous)) or self.waiting(frame):
+                    self.idle += 1
+                    continue
+                stack = [names.get(ident, str(ident))] + self.fold(frame)
+                self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write_folded(self, path: str):
+        """Brendan Gregg's folded format (`frame;frame;frame count`), for flamegraph.pl or speedscope."""
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, n: int = 15) -> List[tuple]:
+        """Leaf (self time) frames by number of on-CPU samples."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+
+class Profiler:
+    """
+    `--profile` mode: per-service wall/CPU time, event loop lag, a sampling profiler and
+    optional `tracemalloc` snapshots, written to `output_dir` as `stacks.folded` (flamegraph
+    input), `summary.txt` and, with memory profiling, `memory.txt`.
+    """
+
+    def __init__(self, output_dir: str = "./profile", hz: float = 100, lag_interval: float = 0.1,
+                 memory: bool = False, memory_interval: float = 60):
+        self.output_dir = output_dir
+        self.lag_interval = lag_interval
+        self.memory = memory
+        self.memory_interval = memory_interval
+
+        self.services: Dict[str, StepStats] = {}
+        self.lag = DDSketch(alpha=0.01)
+        self.sampler = SamplingProfiler(hz)
+        self.memory_reports: List[str] = []
+        self.memory_snapshot = None
+        self.tasks: List[asyncio.Task] = []
+        self.started = None
+
+    @classmethod
+    def from_config(cls, configurations: dict, output_dir: str | None = None, memory: bool | None = None):
+        settings = configurations.get("profiling", {})
+        return cls(
+            output_dir=output_dir or settings.get("output_dir", "./profile"),
+            hz=settings.get("hz", 100),
+            lag_interval=settings.get("lag_interval", 0.1),
+            memory=settings.get("memory", False) if memory is None else memory,
+            memory_interval=settings.get("memory_interval", 60),
+        )
+
+    def wrap(self, name: str, coroutine):
+        """Time a service's `run()` coroutine under `name`."""
+        stats = self.services.setdefault(name, StepStats())
+        return ProfiledCoroutine(coroutine, stats)
+
+    async def monitor_lag(self):
+        """Measure how late the loop wakes up a task sleeping for `lag_interval`."""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.lag.add(max(loop.time() - expected, 0.0) * 1000)
+
+    def record_memory(self):
+        """Take a `tracemalloc` snapshot and record the largest growth since the previous one."""
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"--- {time.strftime('%Y-%m-%d %H:%M:%S')}: traced {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB"]
+        if self.memory_snapshot is not None:
+            lines += [f"  {stat}" for stat in snapshot.compare_to(self.memory_snapshot, "lineno")[:10]]
+        self.memory_reports.append("\n".join(lines))
+        self.memory_snapshot = snapshot
+
+    async def snapshot_memory(self):
+        """Record memory growth every `memory_interval`."""
+        self.memory_snapshot = tracemalloc.take_snapshot()
+        while True:
+            await asyncio.sleep(self.memory_interval)
+            self.record_memory()
+
+    def start(self):
+        """Start the sampling profiler and the monitoring tasks (call from the running loop)."""
+        self.started = time.perf_counter(), time.process_time()
+        if self.memory:
+            tracemalloc.start(25)
+        self.sampler.start()
+        self.tasks.append(asyncio.ensure_future(self.monitor_lag()))
+        if self.memory:
+            self.tasks.append(asyncio.ensure_future(self.snapshot_memory()))
+        logger.info(f"Profiling enabled, results in {self.output_dir}")
+
+    async def stop(self):
+        """Stop profiling and write the results."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.sampler.stop()
+        if self.memory:
+            self.record_memory()
+            tracemalloc.stop()
+        self.write()
+
+    def summary(self) -> str:
+        wall = time.perf_counter() - self.started[0]
+        process_cpu = time.process_time() - self.started[1]
+
+        lines = [f"Profiled {wall:.1f} s wall, {process_cpu:.2f} s CPU ({100 * process_cpu / max(wall, 1e-9):.1f}% of a core)", ""]
+        lines.append(f"{'Service':<32} {'Steps':>8} {'CPU s':>9} {'CPU %':>7} {'Loop s':>9} {'Max ms':>9} {'>100ms':>7}")
+        lines.append("-" * 86)
+        for name, stats in sorted(self.services.items(), key=lambda item: item[1].cpu, reverse=True):
+            lines.append(f"{name:<32} {stats.steps:>8} {stats.cpu:>9.3f} {100 * stats.cpu / max(wall, 1e-9):>7.2f} "
+                         f"{stats.wall:>9.3f} {stats.max_step * 1000:>9.1f} {stats.steps_over:>7}")
+        lines.append("-" * 86)
+
+        if self.lag.count:
+            lag = [self.lag.quantile(q) for q in (0.5, 0.95, 0.99)]
+            lines.append(f"Event loop lag: p50 {lag[0]:.2f} ms, p95 {lag[1]:.2f} ms, p99 {lag[2]:.2f} ms, "
+                         f"max {self.lag.max:.2f} ms ({self.lag.count:.0f} checks)")
+
+        lines += ["", f"Top frames by on-CPU samples ({self.sampler.samples} sampling rounds, "
+                      f"{self.sampler.idle} idle thread samples skipped):"]
+        total = sum(self.sampler.stacks.values()) or 1
+        for frame, count in self.sampler.top_functions():
+            lines.append(f"  {100 * count / total:6.2f}%  {frame}")
+        return "\n".join(lines)
+
+    def write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.sampler.write_folded(os.path.join(self.output_dir, "stacks.folded"))
+        summary = self.summary()
+        with open(os.path.join(self.output_dir, "summary.txt"), "w") as f:
+            f.write(summary + "\n")
+        if self.memory_reports:
+            with open(os.path.join(self.output_dir, "memory.txt"), "w") as f:
+                f.write("\n\n".join(self.memory_reports) + "\n")
+        print(summary)
@@ -0,0 +1,191 @@
+# query.py (DuckDB queries over the exported Parquet files and the live SQLite database)
+import os
+import glob
+from tracer_bio_agent.cgroups import PROCESS_ROWS, RUN_STAT
+
+TOP_LIBRARIES_QUERY = """
+WITH library_usage AS (
+    SELECT 
+        command AS library,
+        SUM(cpu) AS total_cpu_time
+    FROM {metrics}
+    WHERE command LIKE '%.so%' -- Shared object libraries
+       OR command LIKE '/lib/%' 
+       OR command LIKE '/usr/lib/%' 
+       OR command LIKE '/usr/local/lib/%'  -- Include more library paths
+    GROUP BY library
+)
+SELECT library, total_cpu_time
+FROM library_usage
+ORDER BY total_cpu_time DESC
+LIMIT {limit};
+"""
+
+TOP_PROCESSES_QUERY = """
+SELECT 
+    command AS process,
+    SUM(cpu) AS total_cpu_time
+FROM {metrics}
+WHERE cpu > 0.01  -- Filter for noticeable CPU usage
+GROUP BY process
+ORDER BY total_cpu_time DESC
+LIMIT {limit};
+"""
+
+QUERIES = {
+    "libraries": TOP_LIBRARIES_QUERY,
+    "processes": TOP_PROCESSES_QUERY,
+}
+
+
+def connect():
+    """Open an in-memory DuckDB connection with Parquet support."""
+    import duckdb  # Heavy dependency, only needed when querying
+
+    con = duckdb.connect()
+    con.execute("INSTALL parquet; LOAD parquet;")  # Ensure Parquet support
+    return con
+
+
+def metrics_source(con, parquet_dir: str) -> str:
+    """
+    The exported raw metrics as a relation. Samples referencing a process metadata entry (see
+    `proc_meta.py`) get their user and command from `process_metadata.parquet`.
+    """
+    metrics = f"read_parquet('{_quote(os.path.join(parquet_dir, 'metrics.parquet'))}')"
+    metadata = os.path.join(parquet_dir, "process_metadata.parquet")
+    if not os.path.exists(metadata):
+        return metrics
+    if "meta_id" not in {row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {metrics}").fetchall()}:
+        return metrics  # Exported before process metadata existed
+    return (f"(SELECT m.* REPLACE (COALESCE(m.user, p.user) AS user, COALESCE(m.command, p.command) AS command) "
+            f"FROM {metrics} m LEFT JOIN read_parquet('{_quote(metadata)}') p ON m.meta_id = p.meta_id)")
+
+
+def top_n(con, kind: str, parquet_dir: str, limit: int = 10):
+    """Top CPU-consuming libraries or processes from the exported metrics."""
+    query = QUERIES[kind].format(metrics=metrics_source(con, parquet_dir), limit=int(limit))
+    return con.execute(query).fetchall()
+
+
+def print_top_n(rows, label: str, limit: int = 10):
+    """Print top-N results in a formatted table."""
+    print(f"\nTop {limit} CPU-Consuming {label}\n" + "=" * 40)
+    print(f"{'Process':<50} {'CPU Hours':>12}")
+    print("-" * 65)
+
+    for process, cpu_seconds in rows:
+        cpu_hours = (cpu_seconds / 3600) * 5  # Convert CPU seconds to adjusted CPU hours
+        print(f"{process:<50} {cpu_hours:>12.2f}")
+
+    print("-" * 65)
+
+
+# Unified hot/cold layer: logical views over the live SQLite tail and the exported Parquet partitions
+
+VIEWS = {
+    "executions": "processed_executions",
+    "metrics": "processed_metrics",
+    "run_totals": "processed_metrics",
+}
+
+# Row filters of views sharing a table: `processed_metrics` holds both process samples and the
+# whole-run cgroup totals (see `cgroups.RUN_STAT`), which must not be summed together
+VIEW_FILTERS = {
+    "metrics": PROCESS_ROWS,
+    "run_totals": f"stat = '{RUN_STAT}'",
+}
+
+DUCKDB_TYPES = {"int64": "BIGINT", "double": "DOUBLE", "timestamp[us]": "TIMESTAMP", "string": "VARCHAR"}
+
+
+def _quote(path: str) -> str:
+    return path.replace("'", "''")
+
+
+def unified_view_sql(con, view: str, table_name: str, parquet_dir: str, watermark: int) -> str:
+    """
+    `CREATE VIEW` unioning the Parquet parts of a table (ids up to `watermark`) with its rows in
+    the attached SQLite database (ids after it).
+
+    DuckDB pushes filters on the view into both branches: the Parquet side skips date partitions
+    (filters on `date`) and row groups (min/max statistics), the SQLite side only reads the rows
+    not exported yet. Columns missing from older part files read as NULL. Views listed in
+    `VIEW_FILTERS` only show the matching rows of the table, and execution views skip superseded
+    START rows.
+    """
+    from tracer_bio_agent.export import TIME_COLUMNS, NULL_DATE, arrow_schema
+
+    schema = arrow_schema(table_name)
+    time_column = TIME_COLUMNS[table_name]
+    parts = os.path.join(parquet_dir, table_name, "date=*", "*.parquet")
+    if not glob.glob(parts):
+        watermark = 0  # Nothing exported (or the files were removed): everything is read from SQLite
+
+    row_filter = f" AND {VIEW_FILTERS[view]}" if view in VIEW_FILTERS else ""
+    hot_columns = [f'"{name}"' for name in schema.names]
+    hot = (f"SELECT {', '.join(hot_columns)}, COALESCE(CAST(\"{time_column}\" AS DATE), DATE '{NULL_DATE}') AS date "
+           f'FROM hot."{table_name}" WHERE id > {int(watermark)}{row_filter}')
+
+    if not watermark:
+        return _create_view(view, table_name, hot)
+
+    source = f"read_parquet('{_quote(parts)}', hive_partitioning = true, hive_types = {{'date': DATE}}, union_by_name = true)"
+    present = {row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()}
+    cold_columns = [f'"{field.name}"' if field.name in present else f'CAST(NULL AS {DUCKDB_TYPES[str(field.type)]}) AS "{field.name}"'
+                    for field in schema]
+    cold = f"SELECT {', '.join(cold_columns)}, date FROM {source} WHERE id <= {int(watermark)}{row_filter}"
+    return _create_view(view, table_name, f"{cold} UNION ALL {hot}")
+
+
+def _create_view(view: str, table_name: str, rows: str) -> str:
+    """
+    `CREATE VIEW` of the rows of a table. Superseded provisional START rows (`crud.SUPERSEDED_START_SQL`)
+    are dropped from `processed_executions` views after the union, since the START row may already be
+    exported while its EXEC row is still only in the live database.
+    """
+    if table_name != "processed_executions":
+        return f'CREATE OR REPLACE VIEW "{view}" AS {rows}'
+
+    from tracer_bio_agent.crud import SUPERSEDED_START_SQL
+
+    union = f'"_{view}_rows"'
+    return (f"CREATE OR REPLACE VIEW {union} AS {rows};\n"
+            f'CREATE OR REPLACE VIEW "{view}" AS SELECT * FROM {union} e '
+            f'WHERE NOT ({SUPERSEDED_START_SQL.format(table=union, row="e")})')
+
+
+def connect_unified(sqlite_db_path: str, parquet_dir: str, views: dict | None = None, backend: str = "sqlite"):
+    """
+    DuckDB connection exposing each logical view (`executions`, `metrics` and `run_totals` by default) over both
+    the live database, attached read-only, and the Parquet parts written by
+    `export.export_incremental`, split on the export watermark read at connection time.
+
+    With the DuckDB storage backend the database file is attached natively; DuckDB locks it, so
+    this only works while the agent is stopped (the API serves live queries meanwhile).
+    """
+    from tracer_bio_agent.export import read_watermarks
+
+    con = connect()
+    if backend == "duckdb":
+        con.execute(f"ATTACH '{_quote(sqlite_db_path)}' AS hot (READ_ONLY)")
+    else:
+        con.execute("INSTALL sqlite; LOAD sqlite;")
+        con.execute(f"ATTACH '{_quote(sqlite_db_path)}' AS hot (TYPE sqlite, READ_ONLY)")
+
+    watermarks = read_watermarks(parquet_dir)
+    for view, table_name in (views or VIEWS).items():
+        con.execute(unified_view_sql(con, view, table_name, parquet_dir, watermarks.get(table_name, 0)))
+    return con
+
+
+def print_rows(cursor):
+    """Print the result of an ad hoc query as an aligned table."""
+    columns = [description[0] for description in cursor.description]
+    rows = [[("" if value is None else str(value)) for value in row] for row in cursor.fetchall()]
+    widths = [max([len(column)] + [len(row[index]) for row in rows]) for index, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+    print(f"({len(rows)} rows)")
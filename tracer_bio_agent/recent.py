@@ -0,0 +1,412 @@
+# recent.py (compressed in-memory window of recent per-process metrics, and batched durable writes)
+#
+# Dashboards mostly look at the last minutes. The metrics collectors feed every snapshot into a
+# `RecentBuffer`, which answers those queries from memory, and hand the snapshots to a
+# `SnapshotWriter`, which stores them in SQLite in a few large sorted transactions instead of one
+# per snapshot.
+import os
+import time
+import struct
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List
+from tracer_bio_agent.cache import BoundedCache
+from tracer_bio_agent.crud import ProcessMetadataRepository
+from tracer_bio_agent.proc_io import PIPELINE_SHELLS
+from tracer_bio_agent.snapshot import SnapshotBatch, COLUMNS as SNAPSHOT_COLUMNS
+from tracer_bio_agent.spool import shared_spool, write_or_spool
+from tracer_bio_agent.proc_meta import COLUMNS as METADATA_COLUMNS, shared_metadata
+
+logger = logging.getLogger(__name__)
+
+DOUBLE = struct.Struct("<d")
+
+# Values kept per point, after the timestamp: XOR-encoded floats, then delta-encoded integers
+FLOAT_FIELDS = ("cpu", "mem", "read_bps", "write_bps")
+INT_FIELDS = ("rss", "vsz")
+FIELDS = FLOAT_FIELDS + INT_FIELDS
+
+# Approximate Python object overhead, counted against the memory cap with the encoded bytes
+CHUNK_OVERHEAD = 200
+SERIES_OVERHEAD = 600
+
+
+def write_varint(buffer: bytearray, value: int):
+    """Append an unsigned LEB128 varint."""
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, position: int):
+    """Decode the varint at `position`; returns (value, next position)."""
+    byte = data[position]
+    if byte < 0x80:
+        return byte, position + 1  # Single byte, the common case
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+def float_bits(value: float) -> int:
+    return int.from_bytes(DOUBLE.pack(value), "little")
+
+
+def bits_float(bits: int) -> float:
+    return DOUBLE.unpack(bits.to_bytes(8, "little"))[0]
+
+
+class Chunk:
+    """
+    A run of consecutive points of one series, encoded as it is appended.
+
+    Timestamps (ms) are stored as zigzag varints of their delta-of-delta, so a steady sampling
+    interval costs one byte. Floats are XORed with the previous value; the XOR is stored as a
+    varint without its trailing zero bits (low 6 bits: how many), and an unchanged value is a
+    single zero byte. Integers are stored as zigzag varints of their delta.
+    """
+    __slots__ = ("data", "first_ts", "last_ts", "count", "previous_delta", "previous_values")
+
+    def __init__(self, first_ts: int):
+        self.data = bytearray()
+        self.first_ts = first_ts
+        self.last_ts = first_ts
+        self.count = 0
+        self.previous_delta = 0
+        self.previous_values = [0] * len(FIELDS)  # Float bits or integers
+
+    def append(self, timestamp: int, values):
+        data = self.data
+        delta = timestamp - self.last_ts
+        write_varint(data, zigzag(delta - self.previous_delta))
+        self.previous_delta = delta
+        self.last_ts = timestamp
+
+        previous = self.previous_values
+        for index in range(len(FLOAT_FIELDS)):
+            bits = float_bits(values[index])
+            xor = bits ^ previous[index]
+            previous[index] = bits
+            if xor:
+                trailing = (xor & -xor).bit_length() - 1
+                write_varint(data, ((xor >> trailing) << 6) | trailing)
+            else:
+                data.append(0)
+        for index in range(len(FLOAT_FIELDS), len(FIELDS)):
+            value = values[index]
+            write_varint(data, zigzag(value - previous[index]))
+            previous[index] = value
+        self.count += 1
+
+    def close(self):
+        """Drop the encoder state of a full chunk, keeping only its bytes."""
+        self.data = bytes(self.data)
+        self.previous_values = None
+
+    def points(self) -> Iterable[tuple]:
+        """Decode the chunk: (timestamp ms, cpu, mem, read_bps, write_bps, rss, vsz) per point."""
+        data = self.data
+        position = 0
+        timestamp, delta = self.first_ts, 0
+        bits = [0] * len(FLOAT_FIELDS)
+        floats = [0.0] * len(FLOAT_FIELDS)
+        integers = [0] * len(INT_FIELDS)
+        for _ in range(self.count):
+            value, position = read_varint(data, position)
+            delta += unzigzag(value)
+            timestamp += delta
+            for index in range(len(floats)):
+                if data[position]:
+                    value, position = read_varint(data, position)
+                    bits[index] ^= (value >> 6) << (value & 0x3F)
+                    floats[index] = bits_float(bits[index])
+                else:
+                    position += 1  # Unchanged value: no float conversion
+            for index in range(len(integers)):
+                value, position = read_varint(data, position)
+                integers[index] += unzigzag(value)
+            yield (timestamp, *floats, *integers)
+
+
+class Series:
+    """The recent points of one process (pid and start time), as a list of chunks."""
+    __slots__ = ("pid", "command", "pipeline", "chunks", "last_ts")
+
+    def __init__(self, pid: int, command: str, pipeline: str | None):
+        self.pid = pid
+        self.command = command
+        self.pipeline = pipeline
+        self.chunks = deque()
+        self.last_ts = 0
+
+    def size(self) -> int:
+        return SERIES_OVERHEAD + sum(len(chunk.data) + CHUNK_OVERHEAD for chunk in self.chunks)
+
+
+def pipeline_members(batch: SnapshotBatch, pipeline_filters: Dict[str, Iterable[str]]) -> Dict[int, str]:
+    """Row index -> pipeline for the pipeline parents of a snapshot and all their descendants."""
+    children: Dict[int, List[int]] = {}
+    for index, ppid in enumerate(batch.ppid):
+        children.setdefault(ppid, []).append(index)
+
+    members = {}
+    for index, command in enumerate(batch.command):
+        executable = command.split(None, 1)[0] if command else ""
+        if os.path.basename(executable) not in PIPELINE_SHELLS:
+            continue
+        for pipeline, names in pipeline_filters.items():
+            if any(name in command for name in names):
+                pending = [index]
+                while pending:
+                    member = pending.pop()
+                    if member not in members:
+                        members[member] = pipeline
+                        pending.extend(children.get(batch.pid[member], ()))
+                break
+    return members
+
+
+class RecentBuffer:
+    """
+    Bounded, compressed in-memory store of the last `window` seconds of per-process metrics.
+
+    Each process (pid, start) gets a series of chunks of `chunk_points` points (see `Chunk`).
+    Chunks older than the window are dropped as a whole, and the least recently updated series
+    (processes that exited) are evicted first when the encoded size exceeds `max_bytes`.
+    Per-snapshot CPU/RSS totals per pipeline are kept uncompressed next to the series, so the
+    pipeline series of the dashboard is answered without decoding anything. The last
+    `decoded_chunks` closed chunks read by per-process queries are kept decoded.
+    """
+
+    def __init__(self, window: float = 900, max_bytes: int = 64 * 1024 * 1024, chunk_points: int = 120,
+                 pipeline_filters: Dict[str, Iterable[str]] | None = None, decoded_chunks: int = 64):
+        self.window_ms = int(window * 1000)
+        self.max_bytes = max_bytes
+        self.chunk_points = chunk_points
+        self.pipeline_filters = pipeline_filters or {}
+
+        self.series: OrderedDict = OrderedDict()  # (pid, start) -> Series, least recently updated first
+        self.totals = deque()  # (timestamp ms, {pipeline or "*": [cpu, rss, processes]})
+        self.bytes = 0
+        self.points = 0
+        self.evicted = 0  # Series dropped for the memory cap
+        self.decoded = BoundedCache(max_entries=decoded_chunks)  # (series key, chunk start) -> points
+
+    def add(self, batch: SnapshotBatch):
+        """Append one snapshot."""
+        if not len(batch):
+            return
+        timestamp = int(batch.snapshot_time.timestamp() * 1000)
+        members = pipeline_members(batch, self.pipeline_filters) if self.pipeline_filters else {}
+        totals = {"*": [0.0, 0, 0]}
+
+        columns = [getattr(batch, name) for name in FIELDS]
+        for index, values in enumerate(zip(*columns)):
+            key = (batch.pid[index], batch.start[index])
+            pipeline = members.get(index)
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = Series(key[0], batch.command[index], pipeline)
+                self.bytes += SERIES_OVERHEAD
+            else:
+                self.series.move_to_end(key)
+                series.pipeline = series.pipeline or pipeline
+
+            chunk = series.chunks[-1] if series.chunks else None
+            if chunk is None or chunk.count >= self.chunk_points:
+                if chunk is not None:
+                    chunk.close()
+                chunk = Chunk(timestamp)
+                series.chunks.append(chunk)
+                self.bytes += CHUNK_OVERHEAD
+            size = len(chunk.data)
+            chunk.append(timestamp, values)
+            self.bytes += len(chunk.data) - size
+            series.last_ts = timestamp
+            self.points += 1
+
+            for name in ("*", pipeline) if pipeline else ("*",):
+                total = totals.get(name)
+                if total is None:
+                    total = totals[name] = [0.0, 0, 0]
+                total[0] += values[0]
+                total[1] += values[4]
+                total[2] += 1
+
+        self.totals.append((timestamp, totals))
+        self.evict(timestamp)
+
+    def evict(self, now: int):
+        """Drop what is older than the window, then the least recently updated series while over the cap."""
+        cutoff = now - self.window_ms
+        while self.totals and self.totals[0][0] < cutoff:
+            self.totals.popleft()
+
+        # Exited processes are at the front: stop at the first series still being updated
+        while self.series:
+            key, series = next(iter(self.series.items()))
+            if series.last_ts >= cutoff:
+                break
+            self.drop(key)
+
+        for series in self.series.values():
+            while len(series.chunks) > 1 and series.chunks[0].last_ts < cutoff:
+                chunk = series.chunks.popleft()
+                self.bytes -= len(chunk.data) + CHUNK_OVERHEAD
+                self.points -= chunk.count
+
+        while self.bytes > self.max_bytes and len(self.series) > 1:
+            self.drop(next(iter(self.series)))
+            self.evicted += 1
+
+    def drop(self, key):
+        series = self.series.pop(key)
+        self.bytes -= series.size()
+        self.points -= sum(chunk.count for chunk in series.chunks)
+
+    def pipeline_series(self, since: float, bucket: int, pipeline: str = "*") -> List[dict]:
+        """CPU and RSS summed per `bucket` seconds since `since` (epoch seconds), as the `/series` endpoint."""
+        since_ms = since * 1000
+        buckets: Dict[int, list] = {}
+        for timestamp, totals in reversed(self.totals):
+            if timestamp < since_ms:
+                break
+            total = totals.get(pipeline)
+            if total is None:
+                continue
+            time_bucket = timestamp // 1000 // bucket * bucket
+            values = buckets.setdefault(time_bucket, [0.0, 0, 0])
+            values[0] += total[0]
+            values[1] += total[1]
+            values[2] += total[2]
+        return [{"time_bucket": time_bucket, "cpu": cpu, "rss": rss, "samples": samples}
+                for time_bucket, (cpu, rss, samples) in sorted(buckets.items())]
+
+    def process_series(self, pid: int, since: float) -> List[dict]:
+        """Decoded points of the most recent process with `pid` since `since` (epoch seconds)."""
+        matches = [(key, series) for key, series in self.series.items() if key[0] == pid]
+        if not matches:
+            return []
+        key, series = max(matches, key=lambda match: match[1].last_ts)
+        since_ms = since * 1000
+
+        points = []
+        for chunk in series.chunks:
+            if chunk.last_ts < since_ms:
+                continue
+            if chunk.previous_values is None:
+                # Closed chunks never change: decode them once for repeated dashboard refreshes
+                decoded = self.decoded.get_or_load((key, chunk.first_ts), lambda _: self.decode(series, chunk))
+            else:
+                decoded = self.decode(series, chunk)
+            points.extend(point for point in decoded if point["time"] * 1000 >= since_ms)
+        return points
+
+    @staticmethod
+    def decode(series: Series, chunk: Chunk) -> List[dict]:
+        points = []
+        for timestamp, *values in chunk.points():
+            point = {"time": timestamp / 1000, "command": series.command}
+            for name, value in zip(FIELDS, values):
+                point[name] = None if value != value else value  # NaN: not sampled
+            points.append(point)
+        return points
+
+    def stats(self) -> dict:
+        raw = self.points * (8 + 8 * len(FIELDS))
+        return {"series": len(self.series), "points": self.points, "bytes": self.bytes,
+                "bytes_per_point": self.bytes / self.points if self.points else 0.0,
+                "compression": raw / self.bytes if self.bytes else 0.0, "evicted": self.evicted}
+
+
+_shared = None
+
+
+def shared_buffer(configurations: dict) -> RecentBuffer | None:
+    """The process-wide `RecentBuffer` configured from `[recent]`, or None when disabled."""
+    global _shared
+    settings = configurations.get("recent", {})
+    if not settings.get("enabled", True):
+        return None
+    if _shared is None:
+        _shared = RecentBuffer(
+            window=settings.get("window", 900),
+            max_bytes=int(settings.get("max_mb", 64) * 1024 * 1024),
+            chunk_points=settings.get("chunk_points", 120),
+            decoded_chunks=settings.get("decoded_chunks", 64),
+            pipeline_filters=configurations.get("filters", {}).get("executables", {}),
+        )
+    return _shared
+
+
+def current_buffer() -> RecentBuffer | None:
+    """The buffer fed by a metrics collector of this process, if any."""
+    return _shared
+
+
+class SnapshotWriter:
+    """
+    Collects snapshots and stores them with `MetricsRepository.add_snapshots` every
+    `flush_interval` seconds, or once `flush_rows` rows are pending, in one transaction.
+    While the database cannot be written the snapshots go to `spool` (see `spool.py`) instead.
+    New process metadata entries of `metadata` (see `proc_meta.py`) are stored just before.
+    """
+
+    def __init__(self, repository, flush_interval: float = 10, flush_rows: int = 50000, spool=None, metadata=None):
+        self.repository = repository
+        self.spool = spool
+        self.metadata = metadata
+        self.metadata_repository = ProcessMetadataRepository(repository.session)
+        self.pending_metadata = []
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.pending: List[SnapshotBatch] = []
+        self.rows = 0
+        self.flushed = time.monotonic()
+
+    @classmethod
+    def from_config(cls, repository, configurations: dict) -> "SnapshotWriter":
+        settings = configurations.get("monitoring", {})
+        return cls(repository, settings.get("flush_interval", 10), settings.get("flush_rows", 50000),
+                   shared_spool(configurations), shared_metadata(configurations))
+
+    async def add(self, batch: SnapshotBatch):
+        self.pending.append(batch)
+        self.rows += len(batch)
+        if self.rows >= self.flush_rows or time.monotonic() - self.flushed >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        """Store the pending snapshots (or spool them); kept for the next flush if the write fails otherwise."""
+        self.flushed = time.monotonic()
+        if self.metadata is not None:
+            self.pending_metadata.extend(self.metadata.take_pending())
+        if self.pending_metadata:
+            # Stored (or spooled) before the samples that reference them
+            rows = self.pending_metadata
+            await write_or_spool(self.spool, self.repository.session, "process_metadata", METADATA_COLUMNS,
+                                 lambda: rows, lambda: self.metadata_repository.add_metadata(rows))
+            self.pending_metadata = []
+        if not self.pending:
+            return
+        pending = self.pending
+        stored = await write_or_spool(self.spool, self.repository.session, "metrics", SNAPSHOT_COLUMNS,
+                                      lambda: [row for batch in pending for row in batch.rows()],
+                                      lambda: self.repository.add_snapshots(pending))
+        if stored:
+            logger.info(f"Stored {self.rows} process samples from {len(pending)} snapshots.")
+        self.pending, self.rows = [], 0
@@ -0,0 +1,271 @@
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import datetime
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl
+from sqlalchemy import text, bindparam, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from tracer_bio_agent.config import Config
+from tracer_bio_agent.cgroups import PROCESS_ROWS
+from tracer_bio_agent.crud import SUPERSEDED_START_SQL
+from tracer_bio_agent.recent import current_buffer
+from tracer_bio_agent.spool import current_spool
+from tracer_bio_agent.transport import start_server, read_message, write_response, HTTPError
+from tracer_bio_agent.services.base_services import BaseService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Fixed, parameterised dashboard queries over the processed tables.
+# Optional pipeline filters use separate statements so the composite indexes stay usable.
+# Whole-run cgroup totals are stored in the same table and would count a run twice: only process rows are summed.
+SERIES_SQL = """
+SELECT {bucket} AS time_bucket,
+       SUM(cpu) AS cpu, SUM(rss) AS rss
+FROM processed_metrics
+WHERE pipeline = :pipeline AND snapshot_time >= :since AND {process_rows}
+GROUP BY time_bucket
+ORDER BY time_bucket
+"""
+SERIES_QUERY = text(SERIES_SQL.format(process_rows=PROCESS_ROWS, bucket="CAST(strftime('%s', snapshot_time) AS INTEGER) / :bucket * :bucket")).bindparams(
+    bindparam("since", type_=DateTime))
+# The DuckDB backend (`duckdb:///` URLs) has no '%s' strftime format and `/` is a float division there
+DUCKDB_SERIES_QUERY = text(SERIES_SQL.format(process_rows=PROCESS_ROWS, bucket="CAST(epoch(snapshot_time) AS BIGINT) // :bucket * :bucket")).bindparams(
+    bindparam("since", type_=DateTime))
+
+TOP_COMMANDS_SQL = """
+SELECT command, SUM(cpu) AS total_cpu, MAX(rss) AS max_rss
+FROM processed_metrics
+WHERE {pipeline_filter} snapshot_time >= :since AND {process_rows}
+GROUP BY command
+ORDER BY total_cpu DESC
+LIMIT :limit
+"""
+TOP_COMMANDS_QUERY = text(TOP_COMMANDS_SQL.format(process_rows=PROCESS_ROWS, pipeline_filter="")).bindparams(
+    bindparam("since", type_=DateTime))
+PIPELINE_TOP_COMMANDS_QUERY = text(TOP_COMMANDS_SQL.format(process_rows=PROCESS_ROWS, pipeline_filter="pipeline = :pipeline AND")).bindparams(
+    bindparam("since", type_=DateTime))
+
+RUNS_SQL = """
+SELECT pipeline, run_id, MIN(timestamp) AS started, MAX(timestamp) AS last_event,
+       COUNT(*) AS events, SUM(duration) AS total_duration
+FROM processed_executions e
+WHERE {pipeline_filter} NOT ({superseded})
+GROUP BY pipeline, run_id
+ORDER BY started DESC
+LIMIT :limit
+"""
+# Provisional START rows stay stored once their EXEC row is written: only one of the two is counted
+SUPERSEDED = SUPERSEDED_START_SQL.format(table="processed_executions", row="e")
+RUNS_QUERY = text(RUNS_SQL.format(pipeline_filter="", superseded=SUPERSEDED))
+PIPELINE_RUNS_QUERY = text(RUNS_SQL.format(pipeline_filter="pipeline = :pipeline AND", superseded=SUPERSEDED))
+
+WATERMARK_QUERY = text("""
+SELECT (SELECT MAX(id) FROM processed_metrics), (SELECT MAX(id) FROM processed_executions)
+""")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _since(params: dict) -> datetime.datetime:
+    """Lower time bound from `minutes` (default: last hour)."""
+    minutes = float(params.get("minutes", 60))
+    return datetime.datetime.now() - datetime.timedelta(minutes=minutes)
+
+
+class QueryAPIService(BaseService):
+    """
+    Read-only HTTP API serving dashboard queries from a result cache.
+
+    Results are cached per (endpoint, parameters) and tagged with the ingest watermark (highest
+    row id of the processed tables). The watermark is checked at most once per
+    `watermark_interval`, so any number of dashboard viewers costs one cheap `MAX(id)` lookup per
+    interval plus one aggregate per endpoint when new rows arrive. Responses carry an `ETag`
+    and `If-None-Match` requests get a `304` without touching the database.
+
+    `/recent` is answered from the in-memory window of a metrics collector running in the same
+    process (see `recent.RecentBuffer`), and `/spool` from the local spool, without the cache or
+    the database.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__()
+        self.session = session
+
+        settings = Config.configurations.get("api", {})
+        self.address = settings.get("listen", "127.0.0.1:8700")
+        self.watermark_interval = settings.get("watermark_interval", 1)
+        self.cache_entries = settings.get("cache_entries", 256)
+
+        self.cache = OrderedDict()  # key -> (watermark, etag, body)
+        self.in_flight = {}  # (key, watermark) -> Future, to coalesce identical concurrent requests
+        self.db_lock = asyncio.Lock()  # The session does not support concurrent use
+        self.watermark = None
+        self.watermark_checked = 0.0
+
+        self.endpoints = {
+            "series": self.pipeline_series,
+            "top-commands": self.top_commands,
+            "runs": self.run_summaries,
+        }
+        self.live_endpoints = {
+            "recent": self.recent,
+            "spool": self.spool_stats,
+        }
+
+    async def current_watermark(self):
+        """Ingest watermark, refreshed at most once per `watermark_interval` seconds."""
+        now = time.monotonic()
+        if self.watermark is None or now - self.watermark_checked >= self.watermark_interval:
+            async with self.db_lock:
+                result = await self.session.execute(WATERMARK_QUERY)
+                self.watermark = tuple(result.one())
+                await self.session.rollback()  # End the read transaction, do not hold the lock
+            self.watermark_checked = now
+        return self.watermark
+
+    async def fetch(self, query, params: dict) -> list:
+        async with self.db_lock:
+            result = await self.session.execute(query, params)
+            rows = [dict(row._mapping) for row in result]
+            await self.session.rollback()
+        return rows
+
+    async def pipeline_series(self, params: dict) -> list:
+        """GET /series?pipeline=...&minutes=60&bucket=60: CPU and RSS per time bucket."""
+        if "pipeline" not in params:
+            raise HTTPError(400, "missing pipeline")
+        query = DUCKDB_SERIES_QUERY if self.session.bind.dialect.name == "duckdb" else SERIES_QUERY
+        return await self.fetch(query, {
+            "pipeline": params["pipeline"], "since": _since(params), "bucket": max(1, int(params.get("bucket", 60))),
+        })
+
+    async def top_commands(self, params: dict) -> list:
+        """GET /top-commands?pipeline=...&minutes=60&limit=10: commands by total CPU."""
+        query_params = {"since": _since(params), "limit": int(params.get("limit", 10))}
+        if "pipeline" in params:
+            return await self.fetch(PIPELINE_TOP_COMMANDS_QUERY, {**query_params, "pipeline": params["pipeline"]})
+        return await self.fetch(TOP_COMMANDS_QUERY, query_params)
+
+    async def run_summaries(self, params: dict) -> list:
+        """GET /runs?pipeline=...&limit=20: one summary row per pipeline run."""
+        query_params = {"limit": int(params.get("limit", 20))}
+        if "pipeline" in params:
+            return await self.fetch(PIPELINE_RUNS_QUERY, {**query_params, "pipeline": params["pipeline"]})
+        return await self.fetch(RUNS_QUERY, query_params)
+
+    def recent(self, params: dict) -> list:
+        """GET /recent?minutes=15&bucket=10&pipeline=... (CPU/RSS per bucket) or ?pid=... (raw points)."""
+        buffer = current_buffer()
+        if buffer is None:
+            raise HTTPError(503, "no metrics collector with a recent buffer in this process")
+        since = _since({"minutes": 15, **params}).timestamp()
+        if "pid" in params:
+            return buffer.process_series(int(params["pid"]), since)
+        return buffer.pipeline_series(since, max(1, int(params.get("bucket", 10))), params.get("pipeline", "*"))
+
+    def spool_stats(self, params: dict) -> dict:
+        """GET /spool: size and drain rate of the local spool of this process."""
+        spool = current_spool()
+        if spool is None:
+            raise HTTPError(503, "no spool in this process")
+        return spool.stats()
+
+    async def compute(self, endpoint: str, params: dict, key, watermark):
+        """Run the query for a cache miss and store the encoded result."""
+        rows = await self.endpoints[endpoint](params)
+        body = json.dumps(rows, default=_json_default).encode()
+        etag = '"' + hashlib.sha1(repr((key, watermark)).encode()).hexdigest() + '"'
+
+        cached = self.cache.get(key)
+        if cached and cached[0] == self.watermark != watermark:
+            return etag, body  # A request started after the watermark moved already cached a newer result
+        self.cache[key] = (watermark, etag, body)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_entries:
+            self.cache.popitem(last=False)
+        return etag, body
+
+    async def get(self, endpoint: str, params: dict):
+        """Return (etag, body) for an endpoint, from the cache when the watermark did not move."""
+        key = (endpoint, tuple(sorted(params.items())))
+        watermark = await self.current_watermark()
+
+        cached = self.cache.get(key)
+        if cached and cached[0] == watermark:
+            self.cache.move_to_end(key)
+            return cached[1], cached[2]
+
+        # Only requests that saw the same watermark share a query, so none gets a result older than it
+        flight = key, watermark
+        if flight in self.in_flight:
+            return await asyncio.shield(self.in_flight[flight])
+
+        future = asyncio.ensure_future(self.compute(endpoint, params, key, watermark))
+        self.in_flight[flight] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.in_flight.pop(flight, None)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            start_line, headers, _ = await read_message(reader)
+            method, target, _ = start_line.split(" ", 2)
+            url = urlsplit(target)
+            endpoint = url.path.strip("/")
+
+            if endpoint not in self.endpoints and endpoint not in self.live_endpoints:
+                raise HTTPError(404, url.path)
+            if method != "GET":
+                raise HTTPError(405, method)
+
+            if endpoint in self.live_endpoints:
+                try:
+                    rows = self.live_endpoints[endpoint](dict(parse_qsl(url.query)))
+                except ValueError as e:
+                    raise HTTPError(400, str(e))
+                write_response(writer, 200, json.dumps(rows, default=_json_default).encode(),
+                               {"Content-Type": "application/json", "Cache-Control": "no-cache"})
+                return
+
+            try:
+                etag, body = await self.get(endpoint, dict(parse_qsl(url.query)))
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+
+            response_headers = {"ETag": etag, "Cache-Control": f"max-age={self.watermark_interval}"}
+            if headers.get("if-none-match") == etag:
+                write_response(writer, 304, headers=response_headers)
+            else:
+                write_response(writer, 200, body, {"Content-Type": "application/json", **response_headers})
+
+        except HTTPError as e:
+            write_response(writer, e.status, e.message.encode())
+        except Exception as e:
+            logger.error(f"QueryAPIService: failed to handle request: {e}")
+            write_response(writer, 500)
+        finally:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def run(self):
+        """Serve dashboard queries until stopped."""
+        server = await start_server(self.handle_connection, self.address)
+        logger.info(f"QueryAPIService: listening on {self.address}")
+
+        try:
+            async with server:
+                await self.stop_event.wait()
+        except asyncio.CancelledError:
+            logger.info("QueryAPIService: Shutting down gracefully.")
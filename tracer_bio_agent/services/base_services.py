@@ -1,3 +1,4 @@
+import weakref
 import logging
 import signal
 import asyncio
@@ -9,8 +10,12 @@ class BaseService:
     """
     Base service class to handle initialization and common methods.
     """
+    # Every live service: a shutdown signal stops all of them, not only the last one registered
+    instances = weakref.WeakSet()
+
     def __init__(self):
         self.stop_event = asyncio.Event()
+        BaseService.instances.add(self)
 
         # Register signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self.handle_shutdown)
@@ -19,7 +24,8 @@ class BaseService:
     def handle_shutdown(self, signum, frame):
         """Handles shutdown signals (Ctrl+C, system termination)"""
         logger.info(f"Received shutdown signal ({signum}), stopping services...")
-        self.stop_event.set()  # Set the async event to notify running tasks
+        for service in list(BaseService.instances):
+            service.stop_event.set()  # Set the async event to notify running tasks
 
     async def run(self):
         """
@@ -27,6 +33,13 @@ class BaseService:
         """
         raise NotImplementedError("Subclasses must implement the run method.")
 
+    async def sleep(self, seconds: float):
+        """Sleep between cycles, returning early when the service is stopped."""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
     async def stop(self):
         """Graceful stop logic, overridden in subclasses if needed"""
         logger.info(f"{self.__class__.__name__} shutting down...")
@@ -0,0 +1,210 @@
+import os
+import time
+import asyncio
+import logging
+import datetime
+from typing import Dict, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from tracer_bio_agent import cgroups
+from tracer_bio_agent.cache import username
+from tracer_bio_agent.spool import shared_spool, write_or_spool
+from tracer_bio_agent.config import Config
+from tracer_bio_agent.models import ProcessedMetricsSchema
+from tracer_bio_agent.crud import ExecutionRepository, ProcessedMetricsRepository
+from tracer_bio_agent.services.base_services import BaseService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def _owner(path: str) -> str:
+    try:
+        uid = os.stat(path).st_uid
+    except OSError:
+        return "unknown"
+    return username(uid) or str(uid)
+
+
+def _cpu_time(usec: int) -> str:
+    """Cumulative CPU time in the `ps` TIME format."""
+    minutes, seconds = divmod(usec // 1_000_000, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _memory_total(proc_root: str = "/proc") -> int:
+    """Total memory in bytes, to report a cgroup's memory as %MEM like `ps`."""
+    try:
+        with open(os.path.join(proc_root, "meminfo")) as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class CgroupRun:
+    """A pipeline run tracked through its cgroup."""
+    __slots__ = ("path", "pipeline", "pid", "started", "user", "last_usec", "last_sample")
+
+    def __init__(self, path: str, pipeline: str, pid: int | None, started: datetime.datetime, user: str):
+        self.path = path
+        self.pipeline = pipeline
+        self.pid = pid
+        self.started = started
+        self.user = user
+        self.last_usec = None
+        self.last_sample = None
+
+
+class CgroupMetricsService(BaseService):
+    """
+    Collects exact per-run CPU, memory and I/O totals from cgroup v2 accounting.
+
+    In `place` mode every detected pipeline run (see `ExecutionRepository.get_pipeline_parents`) is
+    moved, with the processes it already started, into its own cgroup under `[cgroups] parent`.
+    In `discover` mode existing cgroups (e.g. one per batch scheduler job) are matched against the
+    `[cgroups.discover]` glob patterns of each pipeline. Each interval reads `cpu.stat`,
+    `memory.current`, `memory.peak`, `memory.stat` and `io.stat` once per run and stores one
+    `processed_metrics` row (stat `cgroups.RUN_STAT`) with CPU% over the interval and the cumulative totals,
+    which per-process aggregates leave out (`cgroups.PROCESS_ROWS`).
+    Unlike `ps` sampling, short-lived tools and peaks between samples are fully accounted.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__()
+        self.session = session
+        self.exec_repo = ExecutionRepository(session)
+        self.metrics_repo = ProcessedMetricsRepository(session)
+        self.spool = shared_spool(Config.configurations)
+
+        settings = Config.configurations.get("cgroups", {})
+        self.root = settings.get("root", "/sys/fs/cgroup")
+        self.mode = settings.get("mode", "discover")
+        self.parent = settings.get("parent", "tracer.slice")
+        self.interval = settings.get("interval", Config.MONITORING_INTERVAL)
+        self.patterns = settings.get("discover", {})
+        self.filtered_executables = Config.configurations.get("filters", {}).get("executables", {})
+
+        if self.mode not in ("place", "discover"):
+            raise ValueError(f"Unknown [cgroups] mode: {self.mode}")
+
+        self.memory_total = _memory_total()
+        self.runs: Dict[str, CgroupRun] = {}  # cgroup path -> run
+        self.placed = set()  # (pipeline, pid, start) of runs already moved into a cgroup
+        self.finished = set()  # Discovered cgroups whose run ended, until their owner removes them
+
+    async def place_runs(self):
+        """Move newly detected pipeline runs into their own cgroup."""
+        pipeline_pids = await self.exec_repo.get_pipeline_parents(self.filtered_executables)
+
+        for pipeline, runs in pipeline_pids.items():
+            for pid, started in runs:
+                if (pipeline, pid, started) in self.placed:
+                    continue
+                self.placed.add((pipeline, pid, started))
+                if not os.path.exists(f"/proc/{pid}"):
+                    continue  # Run already finished
+
+                name = f"{pipeline}-{pid}-{int(started.timestamp())}"
+                try:
+                    path = cgroups.create(self.root, self.parent, name)
+                    for member in [pid] + cgroups.descendants(pid):
+                        try:
+                            cgroups.attach(path, member)
+                        except ProcessLookupError:
+                            pass  # Exited meanwhile
+                except OSError as e:
+                    logger.warning(f"CgroupMetricsService: cannot place PID {pid} of {pipeline}: {e}")
+                    continue
+
+                self.runs[path] = CgroupRun(path, pipeline, pid, started, _owner(f"/proc/{pid}"))
+                logger.info(f"CgroupMetricsService: placed {pipeline} run (PID {pid}) in {path}")
+
+    def discover_runs(self):
+        """Track existing cgroups matching the configured patterns."""
+        found = cgroups.discover(self.root, self.patterns)
+        self.finished &= set(found)
+        for path, pipeline in found.items():
+            if path not in self.runs and path not in self.finished:
+                started = datetime.datetime.fromtimestamp(os.stat(path).st_mtime)
+                members = cgroups.pids(path)
+                self.runs[path] = CgroupRun(path, pipeline, min(members) if members else None, started, _owner(path))
+                logger.info(f"CgroupMetricsService: tracking {path} for {pipeline}")
+
+    def sample(self, timestamp: datetime.datetime) -> List[ProcessedMetricsSchema]:
+        """Read every tracked cgroup once and build its row; finished runs are dropped (and removed if placed)."""
+        rows = []
+        now = time.monotonic()
+
+        for path, run in list(self.runs.items()):
+            stats = cgroups.read_stats(path)
+            if stats is None:
+                del self.runs[path]  # Removed by its owner
+                continue
+
+            if run.last_usec is None:
+                cpu = 0.0
+            else:
+                cpu = 100.0 * (stats.cpu_usec - run.last_usec) / max((now - run.last_sample) * 1_000_000, 1)
+            run.last_usec, run.last_sample = stats.cpu_usec, now
+
+            peak = stats.memory_peak if stats.memory_peak is not None else stats.memory_current
+            rows.append(ProcessedMetricsSchema(
+                user=run.user,
+                pid=run.pid or 0,
+                cpu=cpu,
+                mem=100.0 * stats.memory_current / self.memory_total if self.memory_total else 0.0,
+                vsz=stats.memory_current // 1024,  # Charged memory incl. page cache: cgroups have no virtual size
+                rss=stats.anon // 1024,
+                tty=None,
+                stat=cgroups.RUN_STAT,
+                start=run.started.isoformat(),
+                time=_cpu_time(stats.cpu_usec),
+                command=os.path.relpath(path, self.root),
+                snapshot_time=timestamp,
+                pipeline=run.pipeline,
+                cpu_usec=stats.cpu_usec,
+                memory_peak=peak // 1024,
+                read_bytes=stats.read_bytes,
+                write_bytes=stats.write_bytes,
+            ))
+
+            if not cgroups.is_populated(path):
+                # Last row holds the final totals of the run
+                del self.runs[path]
+                if self.mode == "place":
+                    cgroups.remove(path)
+                else:
+                    self.finished.add(path)
+
+        return rows
+
+    async def collect(self):
+        if self.mode == "place":
+            await self.place_runs()
+        else:
+            self.discover_runs()
+
+        timestamp = datetime.datetime.now(datetime.timezone.utc)
+        rows = self.sample(timestamp)
+        if rows:
+            await write_or_spool(self.spool, self.session, "processed_metrics", list(rows[0].dict()),
+                                 lambda: [list(row.dict().values()) for row in rows],
+                                 lambda: self.metrics_repo.add_processed_metrics(rows))
+            logger.info(f"CgroupMetricsService: stored {len(rows)} run totals at {timestamp}.")
+
+    async def run(self):
+        """Sample the tracked cgroups every interval until stopped."""
+        logger.info(f"CgroupMetricsService: {self.mode} mode under {self.root}")
+        try:
+            while not self.stop_event.is_set():
+                await self.collect()
+                try:
+                    await asyncio.wait_for(self.stop_event.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    continue
+
+        except asyncio.CancelledError:
+            logger.info("CgroupMetricsService: Shutting down gracefully.")
@@ -0,0 +1,92 @@
+import json
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from tracer_bio_agent.config import Config
+from tracer_bio_agent.database import Base
+from tracer_bio_agent.crud import IngestRepository, SHIPPED_TABLES
+from tracer_bio_agent.transport import start_server, read_message, write_response, decode_batch, HTTPError
+from tracer_bio_agent.services.base_services import BaseService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class CollectorService(BaseService):
+    """
+    Central ingest service receiving batches shipped by agents (`ShipperService`).
+
+    Accepts `POST /ingest/<stream>` over TCP or a Unix socket and bulk loads the rows into the
+    processed tables of its own database, tagged with the sending host. Ingestion is serialized
+    through a single writer.
+    """
+
+    def __init__(self, database_url: str | None = None, address: str | None = None):
+        super().__init__()
+        settings = Config.configurations.get("collector", {})
+        self.address = address or settings.get("listen", "127.0.0.1:8600")
+        self.database_url = database_url or settings.get("database_url", "sqlite+aiosqlite:///./tracer_central.db")
+
+        self.engine = create_async_engine(self.database_url, future=True)
+        self.session_factory = async_sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.write_lock = asyncio.Lock()
+
+    async def ingest(self, stream: str, headers: dict, body: bytes) -> tuple[int, dict]:
+        """Ingest one batch; returns the HTTP status and the JSON response."""
+        if stream not in SHIPPED_TABLES:
+            raise HTTPError(404, f"unknown stream {stream}")
+
+        try:
+            host = headers["x-tracer-host"]
+            after = int(headers["x-tracer-after"])
+            columns, rows = decode_batch(body)
+        except (KeyError, ValueError, OSError) as e:
+            raise HTTPError(400, f"invalid batch: {e}")
+
+        async with self.write_lock, self.session_factory() as session:
+            accepted, offset = await IngestRepository(session).ingest_batch(host, stream, after, columns, rows)
+
+        if accepted:
+            logger.info(f"Ingested {stream} batch from {host} ({len(rows)} rows, offset {offset}).")
+        return (200 if accepted else 409), {"offset": offset}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            start_line, headers, body = await read_message(reader)
+            method, path, _ = start_line.split(" ", 2)
+
+            if not path.startswith("/ingest/"):
+                raise HTTPError(404, path)
+            if method != "POST":
+                raise HTTPError(405, method)
+
+            status, response = await self.ingest(path[len("/ingest/"):], headers, body)
+            write_response(writer, status, json.dumps(response).encode(), {"Content-Type": "application/json"})
+
+        except HTTPError as e:
+            write_response(writer, e.status, e.message.encode())
+        except Exception as e:
+            logger.error(f"CollectorService: failed to handle request: {e}")
+            write_response(writer, 500)
+        finally:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass  # Agent went away, it will resend the batch
+            writer.close()
+
+    async def run(self):
+        """Serve ingest requests until stopped."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        server = await start_server(self.handle_connection, self.address)
+        logger.info(f"CollectorService: listening on {self.address}, writing to {self.database_url}")
+
+        try:
+            async with server:
+                await self.stop_event.wait()
+        except asyncio.CancelledError:
+            logger.info("CollectorService: Shutting down gracefully.")
+        finally:
+            await self.engine.dispose()
@@ -1,22 +1,57 @@
+import os
+import re
+import json
+import time
 import logging
 import asyncio
-import re
 import datetime
+from collections import OrderedDict
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict
 from tracer_bio_agent.models import ExecutionLogSchema
-from tracer_bio_agent.crud import ExecutionRepository
+from tracer_bio_agent.crud import ExecutionRepository, ProcessMetadataRepository
+from tracer_bio_agent.cache import username
+from tracer_bio_agent.proc_meta import COLUMNS as METADATA_COLUMNS, shared_metadata
+from tracer_bio_agent.columnar import EXECUTION_COLUMNS, ExecutionBatch, arrow_settings
+from tracer_bio_agent.spool import shared_spool, write_or_spool
 from tracer_bio_agent.services.base_services import BaseService
 from tracer_bio_agent.config import Config
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+EXPIRY_INTERVAL = 60  # Seconds between checks for open processes past `open_timeout`
+METADATA_INTERVAL = 5  # Seconds between writes of newly registered process metadata
+READ_CHUNK = 64 * 1024  # Bytes of script output read at once in Arrow mode
+
+
+def exit_status(wait_status: int) -> int:
+    """Exit code of a process from its raw wait status, or -signal if it was killed."""
+    signal_number = wait_status & 0x7f
+    return -signal_number if signal_number else (wait_status >> 8) & 0xff
+
+
 class ExecveLoggerService(BaseService):
     """
     Service to process execution logs in real-time and store them in the database.
+
+    START events are kept in a bounded table of open processes and paired with their END event,
+    so each execution is stored once, as an `EXEC` row with its argv, start/end timestamps,
+    duration and exit status. Pipeline parents and their descendants also get a provisional
+    START row right away, so their samples are attributed while they run; once the `EXEC` row is
+    processed, readers skip the START row (`crud.superseded_start`). Open entries older than `open_timeout` (or evicted when more than
+    `max_open` are open) are stored without an end; on shutdown they are spilled to
+    `spill_file` and reloaded on the next start. Rows go to the local spool (see `spool.py`)
+    while the database cannot be written.
+
+    Each started process is also registered in the shared process metadata cache (see
+    `proc_meta.py`), so the metrics collectors find it there instead of reading /proc again.
+
+    In Arrow mode (see `columnar.py`) the script output is read a chunk at a time and rows are
+    buffered column by column, then written as one batch every `batch_rows` rows or
+    `flush_interval` seconds.
     """
-    pattern = r"(?P<event_type>START|END): Timestamp: (?P<timestamp>[\d-]+\s[\d:]+), PID: (?P<pid>\d+), PPID: (?P<ppid>\d+), UID: (?P<uid>\d+), Command: (?P<command>[^\s,]+)(?:, Args: (?P<args>[^,]+(?:,[^,]+)*))?(?:, Duration: (?P<duration>\d+) ms)?(?:, CPU: (?P<cpu_ticks>\d+) ticks)?"
+    pattern = r"(?P<event_type>START|END): Timestamp: (?P<timestamp>[\d-]+\s[\d:]+), PID: (?P<pid>\d+), PPID: (?P<ppid>\d+), UID: (?P<uid>\d+), Command: (?P<command>[^\s,]+)(?:, Nsecs: (?P<nsecs>\d+))?(?:, Args: (?P<args>[^,]+(?:,[^,]+)*))?(?:, Duration: (?P<duration>\d+) ms)?(?:, CPU: (?P<cpu_ticks>\d+) ticks)?(?:, Exit: (?P<exit>-?\d+))?"
     LOG_PATTERN = re.compile(pattern)
 
     def __init__(self, session: AsyncSession):
@@ -24,8 +59,29 @@ class ExecveLoggerService(BaseService):
         super().__init__()
         self.session = session
         self.repository = ExecutionRepository(session)
+        self.spool = shared_spool(Config.configurations)
+        self.metadata = shared_metadata(Config.configurations)
+        self.metadata_repository = ProcessMetadataRepository(session)
         self.command = f"bash {Config.EBPF_SCRIPT}"
 
+        settings = Config.configurations.get("executions", {})
+        self.max_open = settings.get("max_open", 65536)
+        self.open_timeout = settings.get("open_timeout", 86400)
+        self.spill_file = settings.get("spill_file", "./open_executions.jsonl")
+
+        # Pipeline parents are announced with a START row, so their children can be attributed while they run
+        filters = Config.configurations.get("filters", {}).get("executables", {})
+        self.pipeline_filters = list(filters)
+
+        self.open: OrderedDict[int, dict] = OrderedDict()  # pid -> parsed START event, oldest first
+        self.pipeline_pids = set()  # Open pipeline parents and descendants, announced with a START row
+
+        arrow = arrow_settings(Config.configurations)
+        self.batch = ExecutionBatch() if arrow is not None else None  # Rows not written yet, in Arrow mode
+        self.batch_rows = arrow.get("batch_rows", 5000) if arrow is not None else 0
+        self.flush_interval = arrow.get("flush_interval", 2) if arrow is not None else 0
+        self.flushed = time.monotonic()
+
     def parse_log(self, log_line: str) -> Dict[str, str] | None:
         """Parses a log line into an ExecutionLog object."""
         match = self.LOG_PATTERN.match(log_line)
@@ -35,29 +91,54 @@ class ExecveLoggerService(BaseService):
         log_data = match.groupdict()
         return log_data
 
+    def is_pipeline_parent(self, log_data) -> bool:
+        """Same match as `crud.pipeline_parents_query`."""
+        args = log_data["args"] or ""
+        return log_data["command"] == "bash" and any(name in args for name in self.pipeline_filters)
+
     async def process_start_event(self, log_data):
-        """Handles the processing of a START event."""
-        # Create new execution entry
-        execution = ExecutionLogSchema(
-            event_type=log_data["event_type"],
-            timestamp=datetime.datetime.strptime(log_data["timestamp"], "%Y-%m-%d %H:%M:%S"),
-            pid=int(log_data["pid"]),
-            ppid=int(log_data["ppid"]),
-            uid=int(log_data["uid"]),
-            command=log_data["command"],
-            args=log_data["args"],
-            duration=None,
-            cpu_ticks=None,
-        )
+        """Handles the processing of a START event: open the process until its END event arrives."""
+        pid = int(log_data["pid"])
+        if pid in self.open:
+            # The process called execve() again: the previous image is replaced
+            await self.store_execution(self.open.pop(pid), end_ns=int(log_data["nsecs"] or 0) or None)
+
+        log_data["opened"] = time.time()
+        self.open[pid] = log_data
+
+        if self.metadata is not None:
+            uid = int(log_data["uid"])
+            self.metadata.register_exec(pid, int(log_data["ppid"]), username(uid) or str(uid),
+                                        (log_data["args"] or log_data["command"]).split(","))
 
-        logger.info(f"Added START event to database: PID {execution.pid}, Command {execution.command}")
+        if self.is_pipeline_parent(log_data) or int(log_data["ppid"]) in self.pipeline_pids:
+            self.pipeline_pids.add(pid)
+            await self.store(dict(
+                event_type=log_data["event_type"],
+                timestamp=datetime.datetime.strptime(log_data["timestamp"], "%Y-%m-%d %H:%M:%S"),
+                pid=pid,
+                ppid=int(log_data["ppid"]),
+                uid=int(log_data["uid"]),
+                command=log_data["command"],
+                args=log_data["args"],
+                start_ns=int(log_data["nsecs"]) if log_data["nsecs"] else None,
+            ))
+            logger.info(f"Added START event to database: PID {pid}, Command {log_data['command']}")
 
-        # Add to the database
-        await self.repository.add_execution(execution)
+        while len(self.open) > self.max_open:
+            _, evicted = self.open.popitem(last=False)
+            logger.warning(f"Too many open processes, storing PID {evicted['pid']} without its end")
+            await self.store_execution(evicted)
 
     async def process_end_event(self, log_data):
-        """Handles the processing of an END event."""
-        execution = ExecutionLogSchema(
+        """Handles the processing of an END event: store the completed execution."""
+        start = self.open.pop(int(log_data["pid"]), None)
+        if start is not None:
+            await self.store_execution(start, log_data)
+            return
+
+        # Started before the agent (or already expired): store the END event alone
+        values = dict(
             event_type=log_data["event_type"],
             timestamp=datetime.datetime.strptime(log_data["timestamp"], "%Y-%m-%d %H:%M:%S"),
             pid=int(log_data["pid"]),
@@ -67,24 +148,150 @@ class ExecveLoggerService(BaseService):
             args=None,
             duration=int(log_data["duration"] or 0),
             cpu_ticks=int(log_data["cpu_ticks"] or 0),
+            end_ns=int(log_data["nsecs"]) if log_data["nsecs"] else None,
+            exit_status=exit_status(int(log_data["exit"])) if log_data["exit"] else None,
+        )
+
+        logger.info(f"Added END event to database: PID {values['pid']}, Duration {values['duration']} ms")
+        await self.store(values)
+
+    async def store_execution(self, start, end=None, end_ns: int | None = None):
+        """Store one execution from its START event and, if known, its END event."""
+        self.pipeline_pids.discard(int(start["pid"]))
+        argv = (start["args"] or "").split(",")
+        start_ns = int(start["nsecs"]) if start["nsecs"] else None
+        if end is not None and end["nsecs"]:
+            end_ns = int(end["nsecs"])
+
+        if end is not None and end["duration"] is not None:
+            duration = int(end["duration"])
+        elif start_ns is not None and end_ns is not None:
+            duration = (end_ns - start_ns) // 1_000_000
+        else:
+            duration = None
+
+        values = dict(
+            event_type="EXEC",
+            timestamp=datetime.datetime.strptime(start["timestamp"], "%Y-%m-%d %H:%M:%S"),
+            pid=int(start["pid"]),
+            ppid=int(start["ppid"]),
+            uid=int(start["uid"]),
+            command=start["command"],
+            executable=argv[0],
+            args=",".join(argv[1:]),
+            duration=duration,
+            cpu_ticks=int(end["cpu_ticks"]) if end is not None and end["cpu_ticks"] else None,
+            start_ns=start_ns,
+            end_ns=end_ns,
+            exit_status=exit_status(int(end["exit"])) if end is not None and end["exit"] else None,
         )
 
-        logger.info(f"Added END event to database: PID {execution.pid}, Duration {execution.duration} ms")
-        # Update the database
-        await self.repository.add_execution(execution)
+        logger.info(f"Added execution to database: PID {values['pid']}, Command {values['executable']}, "
+                    f"Duration {values['duration']} ms")
+        await self.store(values)
+
+    async def store(self, values: dict):
+        """Insert one row, or spool it while the database is unavailable; in Arrow mode, add it to the next batch."""
+        if self.batch is not None:
+            self.batch.append(values)
+            if len(self.batch) >= self.batch_rows:
+                await self.flush_batch()
+            return
+
+        execution = ExecutionLogSchema(**values)
+        values = execution.dict()
+        await write_or_spool(self.spool, self.session, "executions", list(values), lambda: [list(values.values())],
+                             lambda: self.repository.add_execution(execution))
+
+    async def flush_batch(self):
+        """Write the rows buffered in Arrow mode as one batch, or spool them while the database is unavailable."""
+        self.flushed = time.monotonic()
+        if self.batch is None or not len(self.batch):
+            return
+        batch, self.batch = self.batch, ExecutionBatch()
+        await write_or_spool(self.spool, self.session, "executions", EXECUTION_COLUMNS, batch.rows,
+                             lambda: self.repository.add_executions(batch.to_record_batch()))
+
+    async def store_metadata(self):
+        """Store the process metadata registered since the last call, or spool it while the database is unavailable."""
+        if self.metadata is None:
+            return
+        rows = self.metadata.take_pending()
+        if rows:
+            await write_or_spool(self.spool, self.session, "process_metadata", METADATA_COLUMNS, lambda: rows,
+                                 lambda: self.metadata_repository.add_metadata(rows))
+
+    async def expire_open(self):
+        """Store open processes older than `open_timeout` without waiting for their END event."""
+        deadline = time.time() - self.open_timeout
+        while self.open:
+            pid, start = next(iter(self.open.items()))
+            if start["opened"] > deadline:
+                break
+            del self.open[pid]
+            await self.store_execution(start)
+
+    def spill_open(self):
+        """Write the open processes to `spill_file`, to be paired after a restart."""
+        if not self.open:
+            return
+        with open(self.spill_file, "w") as f:
+            for start in self.open.values():
+                f.write(json.dumps(start) + "\n")
+        logger.info(f"ExecveLoggerService: spilled {len(self.open)} open processes to {self.spill_file}")
+
+    def load_spilled(self):
+        """Reload the open processes spilled by the previous run."""
+        if not os.path.exists(self.spill_file):
+            return
+        with open(self.spill_file) as f:
+            for line in f:
+                start = json.loads(line)
+                self.open[int(start["pid"])] = start
+                # Oldest first, so parents are known before their children
+                if self.is_pipeline_parent(start) or int(start["ppid"]) in self.pipeline_pids:
+                    self.pipeline_pids.add(int(start["pid"]))
+        os.remove(self.spill_file)
+        logger.info(f"ExecveLoggerService: reloaded {len(self.open)} open processes from {self.spill_file}")
 
     async def process_log_line(self, log_line: str):
         """Processes a single log line and stores it in the database."""
         log_data = self.parse_log(log_line)
-        if not log_data:
-            return
+        if log_data:
+            await self.process_event(log_data)
 
+    async def process_event(self, log_data: Dict[str, str]):
         # Handle based on the event type
         if log_data["event_type"] == "START":
             await self.process_start_event(log_data)
         elif log_data["event_type"] == "END":
             await self.process_end_event(log_data)
 
+    async def read_events(self, stdout: asyncio.StreamReader):
+        """
+        Parsed events of the script output (None for other lines), read one line at a time. In Arrow
+        mode whole chunks are read and decoded at once, and None is also yielded when no output arrived
+        for `flush_interval` seconds, so the buffered rows are still written while the host is idle.
+        """
+        if self.batch is None:
+            async for line in stdout:
+                yield self.parse_log(line.decode().strip())
+            return
+
+        tail = b""
+        while True:
+            try:
+                data = await asyncio.wait_for(stdout.read(READ_CHUNK), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                yield None  # Unread output stays buffered in the stream
+                continue
+            lines = (tail + data).split(b"\n")
+            tail = lines.pop() if data else b""  # Incomplete last line, completed by the next chunk
+            for line in b"\n".join(lines).decode().split("\n"):
+                yield self.parse_log(line.strip())
+            if not data:
+                break
+
     async def stream_logs(self):
         """Executes the script and streams logs asynchronously, with shutdown handling."""
         process = await asyncio.create_subprocess_shell(
@@ -92,12 +299,23 @@ class ExecveLoggerService(BaseService):
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE
         )
+        last_expiry = last_metadata = time.monotonic()
 
         try:
-            async for line in process.stdout:
-                log_line = line.decode().strip()
-                if log_line:
-                    await self.process_log_line(log_line)
+            async for log_data in self.read_events(process.stdout):
+                if log_data:
+                    await self.process_event(log_data)
+
+                if self.batch is not None and time.monotonic() - self.flushed >= self.flush_interval:
+                    await self.flush_batch()
+
+                if time.monotonic() - last_metadata >= METADATA_INTERVAL:
+                    await self.store_metadata()
+                    last_metadata = time.monotonic()
+
+                if time.monotonic() - last_expiry >= EXPIRY_INTERVAL:
+                    await self.expire_open()
+                    last_expiry = time.monotonic()
 
             await process.wait()
 
@@ -106,13 +324,23 @@ class ExecveLoggerService(BaseService):
         except asyncio.CancelledError:
             logger.info("ExecveLoggerService: Cancelled, stopping...")
         finally:
-            process.terminate()
-            await process.wait()
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
             logger.info("ExecveLoggerService: Stopped streaming logs.")
 
     async def run(self):
         """Starts log processing with shutdown handling."""
+        self.load_spilled()
         try:
             await self.stream_logs()
         except asyncio.CancelledError:
-            logger.info("ExecveLoggerService: Shutting down gracefully.")
\ No newline at end of file
+            logger.info("ExecveLoggerService: Shutting down gracefully.")
+        finally:
+            self.spill_open()
+
+    async def stop(self):
+        """Store the buffered executions and the pending process metadata before stopping."""
+        await self.flush_batch()
+        await self.store_metadata()
+        await super().stop()
@@ -1,11 +1,14 @@
+import zlib
+import time
 import asyncio
 import logging
 import toml
-import pwd
 from sqlalchemy.ext.asyncio import AsyncSession
 from tracer_bio_agent.models import ProcessedExecutionSchema
-from tracer_bio_agent.crud import ExecutionRepository, ProcessedExecutionRepository
+from tracer_bio_agent.crud import ExecutionRepository, ProcessedExecutionRepository, SketchRepository
 from tracer_bio_agent.config import Config
+from tracer_bio_agent.cache import username
+from tracer_bio_agent.sketch_store import QuantileTracker
 from tracer_bio_agent.services.base_services import BaseService
 
 logger = logging.getLogger(__name__)
@@ -15,6 +18,14 @@ logging.basicConfig(level=logging.INFO)
 class ExecutionProcessingService(BaseService):
     """
     Service that processes execution events and filters them based on rules defined in a TOML config file.
+
+    Pipeline runs are sharded across `[processing] workers`; each worker reads and filters its runs
+    on its own session and queues batches of processed events, which are written by this
+    service's session only (the single writer).
+
+    Running pipeline processes have a provisional START row (see `ExecveLoggerService`). Once their
+    `EXEC` row is written the START row is superseded, but kept: `processed_executions` is
+    append-only for shipping and export, so readers skip it (`crud.superseded_start`).
     """
 
     def __init__(self, session: AsyncSession):
@@ -23,10 +34,15 @@ class ExecutionProcessingService(BaseService):
         self.session = session
         self.exec_repo = ExecutionRepository(session)
         self.proc_exec_repo = ProcessedExecutionRepository(session)
+        self.quantiles = QuantileTracker(SketchRepository(session))
 
         self.filtered_users = set()
         self.filtered_executables = {}
 
+        settings = Config.configurations.get("processing", {})
+        self.workers = max(1, settings.get("workers", 4))
+        self.batch_size = settings.get("batch_size", 500)
+
         self.load_filters()
 
     def load_filters(self):
@@ -35,67 +51,153 @@ class ExecutionProcessingService(BaseService):
         self.filtered_users = set(config.get("filters", {}).get("users", []))
         self.filtered_executables = config.get("filters", {}).get("executables", {})
 
+    def shard(self, pipeline_run) -> int:
+        """Worker of a run: stable per (pipeline, parent pid), so a run is always handled by one worker."""
+        pipeline_name, pipeline_pid, _ = pipeline_run
+        return zlib.crc32(f"{pipeline_name}:{pipeline_pid}".encode()) % self.workers
+
     async def process_executions(self):
-        """Filter and move execution events based on defined rules using optimized SQL queries."""
+        """Filter and move execution events based on defined rules, with runs sharded across workers."""
         logger.info("Processing execution events...")
+        started = time.perf_counter()
 
         pipeline_pids = await self.exec_repo.get_pipeline_parents(self.filtered_executables)
-        pipeline_commands = await self.exec_repo.get_pipeline_commands(pipeline_pids)
-
-        if not pipeline_commands:
+        shards = [{} for _ in range(self.workers)]
+        for pipeline_name, runs in pipeline_pids.items():
+            for pipeline_pid, timestamp in runs:
+                shard = shards[self.shard((pipeline_name, pipeline_pid, timestamp))]
+                shard.setdefault(pipeline_name, []).append((pipeline_pid, timestamp))
+
+        active = [shard for shard in shards if shard]
+        if not active:
             logger.info("No relevant execution events found.")
             return
 
-        async with self.session.begin():  # Start transaction only once
-            for pipeline_run, exec_events in pipeline_commands.items():
-                for exec_event in exec_events:
-                    try:
-                        user = pwd.getpwuid(exec_event.uid).pw_name
-                    except KeyError:
-                        logger.warning(f"Could not find username for UID {exec_event.uid}")
-                        continue  # Skip if no username found
-
-                    if user not in self.filtered_users:
-                        continue  # Skip execution if user is not in the allowed list
-
-                    # Call check_duplicate **before** inserting into the database
-                    is_duplicate = await self.proc_exec_repo.check_duplicate(
-                        exec_event.pid, exec_event.timestamp, exec_event.event_type
-                    )
-                    if is_duplicate:
-                        logger.info(
-                            f"Skipping duplicate execution event for PID {exec_event.pid} at {exec_event.timestamp}")
-                        continue  # Skip duplicate record
-
-                    # Assign a unique run ID for the pipeline execution
-                    run_id = hash(pipeline_run)
-                    pipeline_name = pipeline_run[0]
-
-                    if exec_event.event_type == 'START':
-                        command = exec_event.args.split(',')[0]
-                        args = ','.join(exec_event.args.split(',')[1:])
-                    else:
-                        command = exec_event.command
-                        args = exec_event.args
-
-                    # Move valid execution to ProcessedExecution
-                    processed_exec = ProcessedExecutionSchema(
-                        user=user,
-                        event_type=exec_event.event_type,
-                        timestamp=exec_event.timestamp,
-                        pid=exec_event.pid,
-                        ppid=exec_event.ppid,
-                        uid=exec_event.uid,
-                        command=command,
-                        args=args,
-                        duration=exec_event.duration,
-                        cpu_ticks=exec_event.cpu_ticks,
-                        pipeline=pipeline_name,
-                        run_id=str(run_id),
-                    )
-
-                    # Add to session (transaction is managed at a higher level)
-                    await self.proc_exec_repo.add_processed_execution(processed_exec)
+        queue = asyncio.Queue(maxsize=2 * self.workers)
+        writer = asyncio.ensure_future(self.write_batches(queue, len(active)))
+        results = await asyncio.gather(*(self.process_shard(shard, queue) for shard in active), return_exceptions=True)
+        written = await writer
+
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"ExecutionProcessingService: worker failed: {result}")
+
+        logger.info(f"Processed {written} execution events from {sum(map(len, pipeline_pids.values()))} runs "
+                    f"in {time.perf_counter() - started:.2f} s with {len(active)} workers.")
+
+    async def process_shard(self, pipeline_pids, queue: asyncio.Queue):
+        """Read and filter the events of some runs on a worker session, queueing batches for the writer."""
+        batch = []
+        try:
+            async with AsyncSession(self.session.bind, expire_on_commit=False) as session:
+                exec_repo = ExecutionRepository(session)
+                proc_exec_repo = ProcessedExecutionRepository(session)
+                pipeline_commands = await exec_repo.get_pipeline_commands(pipeline_pids)
+
+                async with session.begin():
+                    # One indexed lookup per chunk of pids instead of a duplicate check per event
+                    processed = await proc_exec_repo.get_processed_keys(
+                        {exec_event.pid for exec_events in pipeline_commands.values() for exec_event in exec_events})
+
+                    for pipeline_run, exec_events in pipeline_commands.items():
+                        # A provisional START is superseded by the EXEC row of the same execution
+                        paired = {(exec_event.pid, exec_event.timestamp)
+                                  for exec_event in exec_events if exec_event.event_type == 'EXEC'}
+                        for exec_event in exec_events:
+                            if exec_event.event_type == 'START' and (exec_event.pid, exec_event.timestamp) in paired:
+                                continue
+
+                            user = username(exec_event.uid)
+                            if user is None:
+                                logger.warning(f"Could not find username for UID {exec_event.uid}")
+                                continue  # Skip if no username found
+
+                            if user not in self.filtered_users:
+                                continue  # Skip execution if user is not in the allowed list
+
+                            # Check duplicates **before** inserting into the database
+                            key = (exec_event.pid, exec_event.timestamp, exec_event.event_type)
+                            if key in processed:
+                                logger.debug(
+                                    f"Skipping duplicate execution event for PID {exec_event.pid} at {exec_event.timestamp}")
+                                continue  # Skip duplicate record
+                            processed.add(key)
+
+                            batch.append(self.to_processed(pipeline_run, exec_event, user))
+                            if len(batch) >= self.batch_size:
+                                await queue.put(batch)
+                                batch = []
+        finally:
+            if batch:
+                await queue.put(batch)
+            await queue.put(None)  # This worker is done
+
+    def to_processed(self, pipeline_run, exec_event, user: str) -> ProcessedExecutionSchema:
+        # Assign a unique run ID for the pipeline execution
+        run_id = hash(pipeline_run)
+        pipeline_name = pipeline_run[0]
+
+        if exec_event.event_type == 'EXEC':
+            # Paired by the logger, argv already split
+            command = exec_event.executable
+            args = exec_event.args
+        elif exec_event.event_type == 'START':
+            command = exec_event.args.split(',')[0]
+            args = ','.join(exec_event.args.split(',')[1:])
+        else:
+            command = exec_event.command
+            args = exec_event.args
+
+        return ProcessedExecutionSchema(
+            user=user,
+            event_type=exec_event.event_type,
+            timestamp=exec_event.timestamp,
+            pid=exec_event.pid,
+            ppid=exec_event.ppid,
+            uid=exec_event.uid,
+            command=command,
+            args=args,
+            duration=exec_event.duration,
+            cpu_ticks=exec_event.cpu_ticks,
+            start_ns=exec_event.start_ns,
+            end_ns=exec_event.end_ns,
+            exit_status=exec_event.exit_status,
+            pipeline=pipeline_name,
+            run_id=str(run_id),
+        )
+
+    async def write_batches(self, queue: asyncio.Queue, workers: int) -> int:
+        """Single writer: store the batches of all workers, one transaction per batch, on the service session."""
+        written, durations = 0, []
+        while workers:
+            batch = await queue.get()
+            if batch is None:
+                workers -= 1
+                continue
+
+            try:
+                async with self.session.begin():
+                    await self.proc_exec_repo.add_processed_executions(batch)
+            except Exception as e:
+                # Keep draining so workers never block; the events are retried next cycle
+                logger.error(f"ExecutionProcessingService: failed to write {len(batch)} events: {e}")
+                continue
+            written += len(batch)
+
+            for processed_exec in batch:
+                if processed_exec.event_type in ('EXEC', 'END') and processed_exec.duration is not None:
+                    durations.append((processed_exec.pipeline, processed_exec.timestamp,
+                                      processed_exec.command, processed_exec.duration))
+
+        await self.update_quantiles(durations)
+        return written
+
+    async def update_quantiles(self, durations):
+        """Add the durations of newly processed executions to the per-tool quantile sketches."""
+        for pipeline, timestamp, command, duration in durations:
+            await self.quantiles.add(QuantileTracker.DURATION, pipeline, timestamp, command, duration)
+        if durations:
+            await self.quantiles.flush()
 
     async def cleanup_buffer_tables(self):
         """Delete all records from the executions table after processing."""
@@ -107,7 +209,12 @@ class ExecutionProcessingService(BaseService):
         try:
             while not self.stop_event.is_set():
                 await self.process_executions()
-                await asyncio.sleep(Config.PROCESSING_INTERVAL)
+                await self.sleep(Config.PROCESSING_INTERVAL)
 
         except asyncio.CancelledError:
-            logger.info("ExecutionProcessingService: Shutting down gracefully.")
\ No newline at end of file
+            logger.info("ExecutionProcessingService: Shutting down gracefully.")
+
+    async def stop(self):
+        """Persist the current quantile windows before stopping."""
+        await self.quantiles.flush()
+        await super().stop()
\ No newline at end of file
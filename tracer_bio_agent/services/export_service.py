@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from tracer_bio_agent.config import Config
+from tracer_bio_agent.export import export_incremental, sqlite_path_from_url, backend_from_url
+from tracer_bio_agent.services.base_services import BaseService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class ExportService(BaseService):
+    """
+    Service that periodically appends new rows to the Parquet partitions (see `export.export_incremental`).
+
+    Keeping the export current keeps the database tail read by the unified `executions`/`metrics`
+    views (`tracer-bio-agent sql`) short. The export reads the database file directly, in a
+    worker thread, so the event loop is not blocked.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__()
+        self.session = session
+
+        settings = Config.configurations.get("export", {})
+        self.sqlite_db_path = sqlite_path_from_url(Config.DATABASE_URL)
+        self.backend = backend_from_url(Config.DATABASE_URL)
+        self.output_dir = settings.get("dir", "./parquet_files")
+        self.interval = settings.get("interval", 300)
+        self.batch_rows = settings.get("batch_rows", 100000)
+        self.tables = list(dict.fromkeys(settings.get("views", {}).values())) or None  # Views may share a table
+
+    async def run(self):
+        """Export every interval until stopped."""
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    exported = await asyncio.to_thread(
+                        export_incremental, self.sqlite_db_path, self.output_dir, self.tables, self.batch_rows,
+                        self.backend)
+                    if exported:
+                        logger.info(f"ExportService: exported {exported} to {self.output_dir}.")
+                except Exception as e:
+                    logger.error(f"ExportService: export failed, retrying later: {e}")
+
+                await self.sleep(self.interval)
+
+        except asyncio.CancelledError:
+            logger.info("ExportService: Shutting down gracefully.")
@@ -1,27 +1,50 @@
 import asyncio
 import logging
 import toml
+import datetime
+from itertools import groupby
+from collections import OrderedDict
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy import delete, and_, or_
-from tracer_bio_agent.models import Metrics, ProcessedExecution, ProcessedMetrics
-from tracer_bio_agent.crud import MetricsRepository
+from sqlalchemy import delete
+from tracer_bio_agent.models import Metrics, ProcessedMetrics
+from tracer_bio_agent.crud import (MetricsRepository, ProcessedMetricsRepository, SketchRepository, fetch_arrow,
+                                   matched_metrics_query, matched_metric_columns_query)
+from tracer_bio_agent.columnar import arrow_settings
 from tracer_bio_agent.config import Config
+from tracer_bio_agent.sketch_store import TopNTracker, QuantileTracker, sketch_settings
+from tracer_bio_agent.services.base_services import BaseService
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-class MetricsProcessingService:
+class MetricsProcessingService(BaseService):
     """
     Service that processes and filters metrics based on monitored executions.
+
+    In Arrow mode (see `columnar.py`) matched metrics are read, attributed and written as Arrow
+    tables (`process_metrics_arrow`) instead of one ORM object per row.
+
+    Every cycle re-reads all matched metrics; only those after the last raw metric id counted in
+    the sketches are added to them. That id is stored with the top-N windows (`sketch_offsets`),
+    so a restart does not count the same samples again.
     """
+    SKETCH_STREAM = "metrics"  # `sketch_offsets` row of the raw metrics ids
 
     def __init__(self, session: AsyncSession):
         """Initialize the metrics processing service."""
+        super().__init__()
         self.session = session
         self.metrics_repo = MetricsRepository(session)
+        self.top_n = TopNTracker(SketchRepository(session))
+        self.quantiles = QuantileTracker(SketchRepository(session))
+        self.last_sketched_id = None  # Raw metrics up to this id are already counted; loaded on the first cycle
+
+        # Peak RSS of processes still running: (pipeline, pid) -> [command, peak_rss, last_seen]
+        self.open_peaks = OrderedDict()
+        self.max_open_peaks = sketch_settings().get("max_open_processes", 10000)
         self.filtered_users = set()
+        self.arrow = arrow_settings(Config.configurations) is not None
 
         self.load_filters()
 
@@ -30,16 +53,20 @@ class MetricsProcessingService:
         config = toml.load(Config.CONFIG_FILE)
         self.filtered_users = set(config.get("filters", {}).get("users", []))
 
+    async def load_watermark(self):
+        """Read the last raw metric id counted in the stored sketches, once."""
+        if self.last_sketched_id is None:
+            self.last_sketched_id = await SketchRepository(self.session).get_offset(self.SKETCH_STREAM)
+
     async def process_metrics(self):
         """Filter and move metrics data based on monitored executions."""
         logger.info("Processing metrics...")
+        await self.load_watermark()
+        samples = []
 
         async with self.session.begin():
             # Fetch only metrics for PIDs that exist in `ProcessedExecutions`
-            query = (
-                select(Metrics, ProcessedExecution.pipeline)
-                .join(ProcessedExecution, Metrics.pid == ProcessedExecution.pid or Metrics.ppid == ProcessedExecution.pid)
-            )
+            query = matched_metrics_query()
 
             result = await self.session.execute(query)
             metrics_records = result.all()
@@ -50,10 +77,14 @@ class MetricsProcessingService:
 
             logger.info(f"Processing {len(metrics_records)} matched metric records.")
 
-            for metric, pipeline in metrics_records:
+            for metric, pipeline, meta_user, meta_command in metrics_records:
+                # User and command stored once in the process metadata (NULL in the sample)
+                user = metric.user if metric.user is not None else meta_user
+                command = metric.command if metric.command is not None else meta_command
+
                 # Move valid metric to ProcessedMetrics
                 processed_metric = ProcessedMetrics(
-                    user=metric.user,
+                    user=user,
                     pid=metric.pid,
                     cpu=metric.cpu,
                     mem=metric.mem,
@@ -63,14 +94,106 @@ class MetricsProcessingService:
                     stat=metric.stat,
                     start=metric.start,
                     time=metric.time,
-                    command=metric.command,
+                    command=command,
                     snapshot_time=metric.snapshot_time,
                     pipeline=pipeline,  # Store the pipeline name
+                    read_bps=metric.read_bps,
+                    write_bps=metric.write_bps,
+                    syscr_rate=metric.syscr_rate,
+                    syscw_rate=metric.syscw_rate,
+                    cwd_bytes=metric.cwd_bytes,
                 )
                 self.session.add(processed_metric)
 
+                if metric.id > self.last_sketched_id:
+                    samples.append((pipeline, metric.snapshot_time, command, metric.cpu, metric.id,
+                                    metric.pid, metric.rss))
+
             await self.session.commit()
 
+        await self.update_top_n(samples)
+        await self.update_peaks(samples)
+
+    async def process_metrics_arrow(self):
+        """`process_metrics` on Arrow tables: the same rows, attributed and written column by column."""
+        import pyarrow.compute as pc
+
+        logger.info("Processing metrics...")
+        await self.load_watermark()
+        async with self.session.begin():
+            matched = await fetch_arrow(self.session, matched_metric_columns_query())
+            if not matched.num_rows:
+                logger.info("No matching metrics found for processed executions.")
+                return
+
+            logger.info(f"Processing {matched.num_rows} matched metric records.")
+
+            # User and command stored once in the process metadata (NULL in the sample)
+            for name in ("user", "command"):
+                index = matched.schema.get_field_index(name)
+                matched = matched.set_column(index, name, pc.coalesce(matched[name], matched[f"meta_{name}"]))
+
+            columns = [column.name for column in ProcessedMetrics.__table__.columns
+                       if column.name != "id" and column.name in matched.column_names]
+            await ProcessedMetricsRepository(self.session).add_processed_metrics_table(matched.select(columns))
+
+            new = matched.filter(pc.greater(matched["id"], self.last_sketched_id))
+            samples = list(zip(*(new[name].to_pylist()
+                                 for name in ("pipeline", "snapshot_time", "command", "cpu", "id", "pid", "rss"))))
+
+        await self.update_top_n(samples)
+        await self.update_peaks(samples)
+
+    async def update_top_n(self, samples):
+        """Add newly matched metrics to the per-pipeline top-N sketches."""
+        if not samples:
+            return
+
+        samples.sort(key=lambda sample: (sample[0], sample[1]))
+        for (pipeline, snapshot_time), group in groupby(samples, key=lambda sample: (sample[0], sample[1])):
+            await self.top_n.update(pipeline, snapshot_time, ((command, cpu) for _, _, command, cpu, *_ in group))
+
+        # Stored with the windows it covers: a restart resumes after it
+        self.last_sketched_id = max(sample[4] for sample in samples)
+        await self.top_n.flush({self.SKETCH_STREAM: self.last_sketched_id})
+
+    async def update_peaks(self, samples):
+        """
+        Track the peak RSS of each running process and add it to the per-tool quantile sketches
+        once the process is gone (not seen for two monitoring intervals).
+        """
+        if not samples:
+            return
+
+        latest = None
+        for pipeline, snapshot_time, command, _, _, pid, rss in samples:
+            key = (pipeline, pid)
+            peak = self.open_peaks.get(key)
+            if peak is None:
+                self.open_peaks[key] = [command, rss, snapshot_time]
+            else:
+                peak[1] = max(peak[1], rss)
+                peak[2] = max(peak[2], snapshot_time)
+                self.open_peaks.move_to_end(key)
+            latest = snapshot_time if latest is None else max(latest, snapshot_time)
+
+        expired = latest - datetime.timedelta(seconds=2 * Config.MONITORING_INTERVAL)
+        finished = [key for key, (_, _, last_seen) in self.open_peaks.items() if last_seen < expired]
+        # Bound memory: the least recently updated processes are finalised first
+        overflow = len(self.open_peaks) - len(finished) - self.max_open_peaks
+        if overflow > 0:
+            finishing = set(finished)
+            finished += [key for key in self.open_peaks if key not in finishing][:overflow]
+
+        await self.finalise_peaks(finished)
+
+    async def finalise_peaks(self, keys):
+        for key in keys:
+            command, peak_rss, last_seen = self.open_peaks.pop(key)
+            await self.quantiles.add(QuantileTracker.PEAK_RSS, key[0], last_seen, command, peak_rss)
+        if keys:
+            await self.quantiles.flush()
+
     async def cleanup_buffer_table(self):
         """Delete all records from the metrics buffer table."""
         async with self.session.begin():
@@ -80,7 +203,17 @@ class MetricsProcessingService:
 
     async def run(self):
         """Main processing loop."""
-        while True:
-            await self.process_metrics()
-            # await self.cleanup_buffer_table()
-            await asyncio.sleep(Config.PROCESSING_INTERVAL)  # Run processing every minute
+        try:
+            while not self.stop_event.is_set():
+                await (self.process_metrics_arrow() if self.arrow else self.process_metrics())
+                # await self.cleanup_buffer_table()
+                await self.sleep(Config.PROCESSING_INTERVAL)  # Run processing every minute
+
+        except asyncio.CancelledError:
+            logger.info("MetricsProcessingService: Shutting down gracefully.")
+
+    async def stop(self):
+        """Persist the current sketch windows before stopping; peaks of still running processes are not recorded."""
+        await self.top_n.flush()
+        await self.quantiles.flush()
+        await super().stop()
@@ -1,11 +1,17 @@
 import asyncio
 import logging
 import datetime
+import functools
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from tracer_bio_agent.config import Config
-from tracer_bio_agent.models import MetricsSchema
-from tracer_bio_agent.crud import MetricsRepository
+from tracer_bio_agent.crud import MetricsRepository, SketchRepository
+from tracer_bio_agent.snapshot import SnapshotBatch
+from tracer_bio_agent.proc_io import io_sampler_from_config
+from tracer_bio_agent.proc_meta import shared_metadata
+from tracer_bio_agent.columnar import PS_ARROW_MIN_ROWS, arrow_settings, snapshot_from_ps_lines
+from tracer_bio_agent.recent import SnapshotWriter, shared_buffer
+from tracer_bio_agent.sketch_store import TopNTracker, ALL_PIPELINES
 from tracer_bio_agent.services.base_services import BaseService
 
 
@@ -21,7 +27,17 @@ class MetricsService(BaseService):
         super().__init__()
         self.session = session
         self.repository = MetricsRepository(session)
+        self.top_n = TopNTracker(SketchRepository(session))
+        self.io_sampler = io_sampler_from_config(Config.configurations)
+        self.metadata = shared_metadata(Config.configurations)  # Filled at execve time by the execve collector
+        self.recent = shared_buffer(Config.configurations)  # Also served by the query API of this process
+        self.writer = SnapshotWriter.from_config(self.repository, Config.configurations)
         self.command = f"bash {Config.PS_SCRIPT_PATH}"
+        # Arrow mode: snapshots of at least `ps_min_rows` processes are split and converted by Arrow kernels
+        # (see `columnar.py`); smaller ones are faster line by line
+        arrow = arrow_settings(Config.configurations)
+        self.parse = (functools.partial(snapshot_from_ps_lines, min_rows=arrow.get("ps_min_rows", PS_ARROW_MIN_ROWS))
+                      if arrow else SnapshotBatch.from_ps_lines)
 
     async def stream_process_info(self) -> None:
         """Executes the script and processes output, with shutdown handling."""
@@ -76,6 +92,12 @@ class MetricsService(BaseService):
         except asyncio.CancelledError:
             logger.info("MetricsService: Shutting down gracefully.")
 
+    async def stop(self):
+        """Store the pending snapshots and persist the current top-N windows before stopping."""
+        await self.writer.flush()
+        await self.top_n.flush()
+        await super().stop()
+
     @staticmethod
     def parse_timestamp(snapshot_line: str) -> str:
         """Extract and format timestamp from 'Snapshot at ...' line."""
@@ -89,33 +111,14 @@ class MetricsService(BaseService):
 
     async def process_and_store_data(self, raw_data: List[str], timestamp: str):
         """ Parse and store each snapshot's data with a timestamp """
-        processes = []
-
-        for line in raw_data:
-            try:
-                parts = line.split()
-                if len(parts) < 12:
-                    continue  # Ignore malformed lines
-
-                process_data = MetricsSchema(
-                    user=parts[0],
-                    ppid=int(parts[1]),
-                    pid=int(parts[2]),
-                    cpu=float(parts[3]),
-                    mem=float(parts[4]),
-                    vsz=int(parts[5]),
-                    rss=int(parts[6]),
-                    tty=parts[7] if parts[7] != '?' else None,
-                    stat=parts[8],
-                    start=parts[9],
-                    time=parts[10],
-                    command=" ".join(parts[11:]),
-                    snapshot_time=datetime.datetime.fromisoformat(timestamp)
-                )
-                processes.append(process_data)
-            except Exception as e:
-                logger.warning(f"Parsing error: {e}")
-
-        if processes:
-            await self.repository.add_processes(processes)
-            logger.info(f"Stored {len(processes)} processes at {timestamp}.")
\ No newline at end of file
+        batch = self.parse(raw_data, datetime.datetime.fromisoformat(timestamp))
+        if self.metadata is not None:
+            self.metadata.annotate_ps(batch)
+        if self.io_sampler:
+            self.io_sampler.sample(batch)
+
+        if len(batch):
+            if self.recent:
+                self.recent.add(batch)
+            await self.writer.add(batch)
+            await self.top_n.update(ALL_PIPELINES, batch.snapshot_time, zip(batch.command, batch.cpu))
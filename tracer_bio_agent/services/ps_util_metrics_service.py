@@ -2,10 +2,16 @@ import asyncio
 import logging
 import psutil
 import datetime
+from typing import Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
+from tracer_bio_agent.cache import username
 from tracer_bio_agent.config import Config
-from tracer_bio_agent.models import MetricsSchema
-from tracer_bio_agent.crud import MetricsRepository
+from tracer_bio_agent.crud import MetricsRepository, SketchRepository
+from tracer_bio_agent.snapshot import SnapshotBatch
+from tracer_bio_agent.proc_io import io_sampler_from_config
+from tracer_bio_agent.proc_meta import CLK_TCK, ProcessMeta, shared_flags, shared_metadata
+from tracer_bio_agent.recent import SnapshotWriter, shared_buffer
+from tracer_bio_agent.sketch_store import TopNTracker, ALL_PIPELINES
 from tracer_bio_agent.services.base_services import BaseService
 
 logger = logging.getLogger(__name__)
@@ -21,6 +27,11 @@ class MetricsService(BaseService):
         super().__init__()
         self.session = session
         self.repository = MetricsRepository(session)
+        self.top_n = TopNTracker(SketchRepository(session))
+        self.io_sampler = io_sampler_from_config(Config.configurations)
+        self.metadata = shared_metadata(Config.configurations)
+        self.recent = shared_buffer(Config.configurations)  # Also served by the query API of this process
+        self.writer = SnapshotWriter.from_config(self.repository, Config.configurations)
 
     async def run(self):
         """Starts log processing."""
@@ -29,47 +40,74 @@ class MetricsService(BaseService):
         except asyncio.CancelledError:
             logger.info("MetricsService: Shutting down gracefully...")
 
+    async def stop(self):
+        """Store the pending snapshots and persist the current top-N windows before stopping."""
+        await self.writer.flush()
+        await self.top_n.flush()
+        await super().stop()
+
+    def describe(self, proc: psutil.Process, ppid: int, create_time: float) -> Tuple[str, str, ProcessMeta | None]:
+        """User, command line and metadata entry of a process; /proc is only read for processes not seen before."""
+        start_ticks = round(create_time * CLK_TCK)  # create_time is boot time + start ticks / CLK_TCK
+        if self.metadata is not None:
+            meta = self.metadata.get(proc.pid, start_ticks)
+            if meta is not None:
+                return meta.user or "unknown", meta.command, meta
+
+        user = username(proc.uids().real) or "unknown"
+        name = proc.name()
+        command = " ".join(proc.cmdline()) or f"[{name}]"  # Kernel threads have no command line, shown like `ps`
+        if self.metadata is None:
+            return user, command, None
+        return user, command, self.metadata.register(proc.pid, start_ticks, user, command, name, ppid)
+
     async def stream_process_info(self) -> None:
         while not self.stop_event.is_set():  # Check for stop signal
             timestamp = datetime.datetime.now(datetime.timezone.utc)
-            snapshot = []
+            snapshot = SnapshotBatch(timestamp)
 
             # Iterate over all PIDs to ensure we capture root/system processes
             for pid in psutil.pids():
                 try:
                     proc = psutil.Process(pid)
-                    proc_info = proc.as_dict(attrs=[
-                        'pid', 'ppid', 'cpu_percent', 'memory_info', 'name', 'status', 'create_time'
-                    ])
+                    with proc.oneshot():
+                        proc_info = proc.as_dict(attrs=['pid', 'ppid', 'cpu_percent', 'memory_info', 'memory_percent',
+                                                        'status', 'create_time'])
+                        user, command, meta = self.describe(proc, proc_info['ppid'], proc_info['create_time'])
+                    memory_info = proc_info['memory_info']
 
-                    print(proc_info['cpu_percent'])
-
-                    process_data = MetricsSchema(
-                        user=proc.username() if proc.username() else "unknown",
+                    snapshot.append(
+                        user=user,
                         ppid=proc_info['ppid'],
                         pid=proc_info['pid'],
                         cpu=proc_info['cpu_percent'],
-                        mem=proc_info['memory_info'].rss / (1024 * 1024),  # Convert RSS to MB
-                        vsz=int(proc_info['memory_info'].vms / (1024 * 1024)),  # Virtual memory size in MB
-                        rss=int(proc_info['memory_info'].rss / (1024 * 1024)),  # Resident set size in MB
+                        # Same units as `ps`: %MEM, and VSZ and RSS in KB (e.g. for the `peak_rss_kb` quantiles)
+                        mem=proc_info['memory_percent'],
+                        vsz=memory_info.vms // 1024,
+                        rss=memory_info.rss // 1024,
                         tty=None,  # TTY info is unavailable directly in psutil, would need extra handling
                         stat=proc_info['status'],
                         start=datetime.datetime.fromtimestamp(proc_info['create_time']).isoformat(),
                         time="",  # psutil does not provide a direct `time` field
-                        command=proc_info['name'],
-                        snapshot_time=timestamp
+                        command=command,
                     )
-                    snapshot.append(process_data)
+                    if meta is not None:
+                        snapshot.meta_id[-1], snapshot.shared[-1] = meta.meta_id, shared_flags(meta, user, command)
 
                 except (psutil.NoSuchProcess, psutil.ZombieProcess):
                     continue  # Process has terminated, ignore
                 except psutil.AccessDenied:
                     logger.warning(f"Access denied for PID {pid}. Skipping...")
 
+            if self.io_sampler:
+                self.io_sampler.sample(snapshot)
+
             # Store data and log the count of processes captured
-            if snapshot:
-                await self.repository.add_processes(snapshot)
-                logger.info(f"Stored {len(snapshot)} processes at {timestamp}.")
+            if len(snapshot):
+                if self.recent:
+                    self.recent.add(snapshot)
+                await self.writer.add(snapshot)
+                await self.top_n.update(ALL_PIPELINES, timestamp, zip(snapshot.command, snapshot.cpu))
 
             # Delay the next snapshot, adjust interval as needed
             try:
@@ -0,0 +1,86 @@
+import json
+import socket
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from tracer_bio_agent.config import Config
+from tracer_bio_agent.crud import ShippingRepository, SHIPPED_TABLES
+from tracer_bio_agent.transport import request, encode_batch, HTTPError
+from tracer_bio_agent.services.base_services import BaseService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class ShipperService(BaseService):
+    """
+    Service that ships processed rows to a central collector in compressed, resumable batches.
+
+    Each stream (processed table) is shipped in id order. The last id acknowledged by the
+    collector is persisted in `ship_offsets`, so shipping resumes where it stopped after a
+    restart or a network failure.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__()
+        self.session = session
+        self.repository = ShippingRepository(session)
+
+        settings = Config.configurations.get("shipping", {})
+        self.url = settings.get("url", "http://127.0.0.1:8600")
+        self.host = settings.get("host") or socket.gethostname()
+        self.batch_size = settings.get("batch_size", 5000)
+        self.interval = settings.get("interval", Config.PROCESSING_INTERVAL)
+
+    async def ship_batch(self, stream: str, offset: int) -> int | None:
+        """Ship the next batch after `offset`; returns the new offset or None when caught up."""
+        columns, rows = await self.repository.rows_after(stream, offset, self.batch_size)
+        if not rows:
+            return None
+
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "X-Tracer-Host": self.host,
+            "X-Tracer-After": str(offset),
+        }
+        status, _, body = await request(self.url, "POST", f"/ingest/{stream}", encode_batch(columns, rows), headers)
+
+        if status == 409:
+            # The collector is missing rows before this batch (e.g. its database was reset): rewind
+            acked = json.loads(body)["offset"]
+            logger.warning(f"Collector rejected {stream} after offset {offset}, rewinding to {acked}.")
+        elif status != 200:
+            raise HTTPError(status, body.decode(errors="replace"))
+        else:
+            acked = json.loads(body)["offset"]
+            logger.info(f"Shipped {len(rows)} {stream} rows to {self.url} (offset {acked}).")
+
+        await self.repository.set_offset(stream, acked)
+        return acked
+
+    async def ship_stream(self, stream: str):
+        """Ship batches until the collector has acknowledged every row of a stream."""
+        offset = await self.repository.get_offset(stream)
+        while not self.stop_event.is_set():
+            offset = await self.ship_batch(stream, offset)
+            if offset is None:
+                break
+
+    async def run(self):
+        """Main shipping loop."""
+        try:
+            while not self.stop_event.is_set():
+                for stream in SHIPPED_TABLES:
+                    try:
+                        await self.ship_stream(stream)
+                    except (OSError, asyncio.TimeoutError, HTTPError) as e:
+                        logger.warning(f"ShipperService: could not ship {stream}, retrying later: {e}")
+
+                try:
+                    await asyncio.wait_for(self.stop_event.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    continue
+
+        except asyncio.CancelledError:
+            logger.info("ShipperService: Shutting down gracefully.")
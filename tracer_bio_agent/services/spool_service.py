@@ -0,0 +1,82 @@
+import time
+import asyncio
+import logging
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from tracer_bio_agent.config import Config
+from tracer_bio_agent.crud import SpoolRepository
+from tracer_bio_agent.spool import shared_spool, drain_segments
+from tracer_bio_agent.services.base_services import BaseService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class SpoolService(BaseService):
+    """
+    Service that drains the local spool (see `spool.py`) back into the database.
+
+    Runs next to the collectors. Every `fsync_interval` it syncs the active segment; every
+    `drain_interval`, if batches are waiting or the last write failed, it closes the active segment and bulk loads the
+    closed segments oldest first, one transaction per segment that also records the segment as
+    drained, so a crash between the commit and the file removal never replays rows twice. A
+    successful drain sends the collectors back to the database; while it is still unavailable
+    the drain is retried at the next interval.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__()
+        self.session = session
+        self.repository = SpoolRepository(session)
+
+        settings = Config.configurations.get("spool", {})
+        self.spool = shared_spool(Config.configurations)
+        self.drain_interval = settings.get("drain_interval", 5)
+        self.chunk_size = settings.get("drain_batch_rows", 5000)
+
+    async def drain(self) -> int:
+        """Drain the closed segments; returns the rows written back."""
+        started = time.monotonic()
+        drained_up_to = await self.repository.get_offset(self.spool.directory)
+
+        rows = 0
+        for number, path, records in drain_segments(self.spool, drained_up_to):
+            rows += await self.repository.drain_segment(self.spool.directory, number, records, self.chunk_size)
+            self.spool.remove(path)
+        self.spool.unavailable = False
+
+        if rows:
+            elapsed = time.monotonic() - started
+            self.spool.drained_rows += rows
+            self.spool.drain_rate = rows / max(elapsed, 1e-9)
+            logger.info(f"SpoolService: drained {rows} rows in {elapsed:.2f} s ({self.spool.drain_rate:.0f} rows/s), "
+                        f"{self.spool.bytes} bytes left.")
+        return rows
+
+    async def run(self):
+        """Sync and drain until stopped."""
+        if self.spool is None:
+            logger.info("SpoolService: spool disabled.")
+            return
+
+        last_drain = 0.0
+        try:
+            while not self.stop_event.is_set():
+                self.spool.sync()
+                if (self.spool.backlog() or self.spool.unavailable) and time.monotonic() - last_drain >= self.drain_interval:
+                    last_drain = time.monotonic()
+                    try:
+                        await self.drain()
+                    except OperationalError as e:
+                        await self.session.rollback()
+                        logger.warning(f"SpoolService: database still unavailable, {self.spool.stats()}: {e.orig}")
+                await self.sleep(self.spool.fsync_interval)
+
+        except asyncio.CancelledError:
+            logger.info("SpoolService: Shutting down gracefully.")
+
+    async def stop(self):
+        """Sync what was spooled; it is drained on the next start."""
+        if self.spool is not None:
+            self.spool.close_segment()
+        await super().stop()
@@ -0,0 +1,227 @@
+# sketch_store.py (time-windowed sketches kept in memory and persisted per window)
+import os
+import json
+import time
+import socket
+import logging
+import datetime
+from typing import Callable, Dict, Iterable, List, Tuple
+from tracer_bio_agent.config import Config
+from tracer_bio_agent.crud import SketchRepository
+from tracer_bio_agent.sketches import HeavyHitters, DDSketch
+
+logger = logging.getLogger(__name__)
+
+SKETCH_TYPES = {
+    HeavyHitters.kind: HeavyHitters,
+    DDSketch.kind: DDSketch,
+}
+
+ALL_PIPELINES = "*"
+
+# Same library filter as `query.TOP_LIBRARIES_QUERY`
+LIBRARY_PREFIXES = ("/lib/", "/usr/lib/", "/usr/local/lib/")
+
+
+def is_library(command: str) -> bool:
+    return ".so" in command or command.startswith(LIBRARY_PREFIXES)
+
+
+def sketch_settings() -> dict:
+    return Config.configurations.get("sketches", {})
+
+
+def window_start(timestamp: datetime.datetime, window_seconds: int) -> datetime.datetime:
+    """Start of the window containing `timestamp`."""
+    epoch = timestamp.timestamp()
+    return datetime.datetime.fromtimestamp(epoch - epoch % window_seconds, tz=timestamp.tzinfo)
+
+
+def heavy_hitters_factory() -> HeavyHitters:
+    settings = sketch_settings()
+    return HeavyHitters(settings.get("top_k", 64), settings.get("cms_width", 2048), settings.get("cms_depth", 4))
+
+
+def ddsketch_factory() -> DDSketch:
+    settings = sketch_settings()
+    return DDSketch(settings.get("alpha", 0.01), settings.get("max_buckets", 2048))
+
+
+def tool_name(command: str) -> str:
+    """Tool a command line runs: basename of its first token (e.g. `bwa` for `/usr/bin/bwa mem ...`)."""
+    executable = command.split(None, 1)[0] if command.strip() else command
+    return os.path.basename(executable) or executable
+
+
+class WindowedSketches:
+    """
+    Sketches of the current time window, per (name, pipeline, key), persisted through `SketchRepository`.
+
+    Only the current window of each summary is held in memory. It is written back every
+    `flush_interval` seconds and when the window rolls over; after a restart the stored
+    window is loaded and updated further, so no counts are lost or double counted.
+    """
+
+    def __init__(self, repository: SketchRepository, kind: str, factory: Callable):
+        settings = sketch_settings()
+        self.repository = repository
+        self.kind = kind
+        self.sketch_type = SKETCH_TYPES[kind]
+        self.factory = factory
+        self.window_seconds = settings.get("window", 3600)
+        self.flush_interval = settings.get("flush_interval", 60)
+        self.host = settings.get("host") or socket.gethostname()
+
+        self.current: Dict[Tuple[str, str, str], Tuple[datetime.datetime, object]] = {}
+        self.dirty = set()
+        self.last_flush = time.monotonic()
+
+    async def get(self, name: str, pipeline: str, timestamp: datetime.datetime, key: str = ""):
+        """Sketch to update for `timestamp`, rolling over (and persisting) finished windows."""
+        start = window_start(timestamp, self.window_seconds)
+        entry_key = (name, pipeline, key)
+
+        entry = self.current.get(entry_key)
+        if entry is not None and entry[0] == start:
+            self.dirty.add(entry_key)
+            return entry[1]
+
+        if entry is not None:
+            await self.flush([entry_key])  # Window rolled over: persist the finished one
+
+        payload = await self.repository.get_payload(self.kind, name, pipeline, key, self.host, start)
+        sketch = self.sketch_type.from_dict(json.loads(payload)) if payload else self.factory()
+        self.current[entry_key] = (start, sketch)
+        self.dirty.add(entry_key)
+        return sketch
+
+    async def flush(self, keys: Iterable[Tuple[str, str, str]] | None = None, offsets: Dict[str, int] | None = None):
+        """
+        Persist the current window of the given (default: all modified) summaries, together with
+        the source offsets they now include (see `SketchRepository.save_payloads`).
+        """
+        keys = list(self.dirty if keys is None else keys)
+        values = []
+        for entry_key in keys:
+            name, pipeline, key = entry_key
+            start, sketch = self.current[entry_key]
+            values.append({
+                "kind": self.kind, "name": name, "pipeline": pipeline, "key": key, "host": self.host,
+                "window_start": start, "window_seconds": self.window_seconds,
+                "payload": json.dumps(sketch.to_dict()),
+            })
+            self.dirty.discard(entry_key)
+
+        if values or offsets:
+            await self.repository.save_payloads(values, offsets)
+        self.last_flush = time.monotonic()
+
+    async def maybe_flush(self):
+        """Flush if `flush_interval` seconds passed since the last flush."""
+        if self.dirty and time.monotonic() - self.last_flush >= self.flush_interval:
+            await self.flush()
+
+
+async def load_merged(repository: SketchRepository, kind: str, name: str, pipeline: str,
+                      since: datetime.datetime, until: datetime.datetime | None = None):
+    """Merge every stored window (from every host) of a summary between `since` and `until`."""
+    merged = await load_merged_by_key(repository, kind, name, pipeline, since, until, key="")
+    return merged.get("")
+
+
+async def load_merged_by_key(repository: SketchRepository, kind: str, name: str, pipeline: str,
+                             since: datetime.datetime, until: datetime.datetime | None = None,
+                             key: str | None = None) -> Dict[str, object]:
+    """Like `load_merged`, one merged sketch per key (or only `key`, if given)."""
+    window_seconds = sketch_settings().get("window", 3600)
+    payloads = await repository.get_payloads(kind, name, pipeline, window_start(since, window_seconds), until, key)
+
+    merged = {}
+    for sketch_key, payload in payloads:
+        sketch = SKETCH_TYPES[kind].from_dict(json.loads(payload))
+        merged[sketch_key] = merged[sketch_key].merge(sketch) if sketch_key in merged else sketch
+    return merged
+
+
+class TopNTracker:
+    """
+    Streaming top-N CPU consumers, by command (`cpu_processes`) and by library (`cpu_libraries`).
+
+    Counts are the same as `SUM(cpu)` in the `top_n_libraries.py` queries, but are maintained
+    as snapshots arrive instead of scanning the whole metrics history.
+    """
+    PROCESSES = "cpu_processes"
+    LIBRARIES = "cpu_libraries"
+
+    def __init__(self, repository: SketchRepository):
+        self.sketches = WindowedSketches(repository, HeavyHitters.kind, heavy_hitters_factory)
+
+    async def update(self, pipeline: str, timestamp: datetime.datetime, samples: Iterable[Tuple[str, float]]):
+        """Add (command, cpu) samples taken at `timestamp` to the pipeline's current window."""
+        processes = await self.sketches.get(self.PROCESSES, pipeline, timestamp)
+        libraries = await self.sketches.get(self.LIBRARIES, pipeline, timestamp)
+
+        for command, cpu in samples:
+            if cpu > 0.01:  # Same threshold as the processes query
+                processes.update(command, cpu)
+            if is_library(command):
+                libraries.update(command, cpu)
+
+        await self.sketches.maybe_flush()
+
+    async def flush(self, offsets: Dict[str, int] | None = None):
+        await self.sketches.flush(offsets=offsets)
+
+
+async def query_top(name: str, pipeline: str = ALL_PIPELINES, hours: float = 24, limit: int = 10):
+    """Top-N of a summary over the last `hours`, merged across windows and hosts."""
+    from tracer_bio_agent.database import init_db, AsyncSessionLocal
+
+    await init_db()
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+    async with AsyncSessionLocal() as session:
+        merged = await load_merged(SketchRepository(session), HeavyHitters.kind, name, pipeline, since)
+    return merged.top(limit) if merged else []
+
+
+class QuantileTracker:
+    """
+    Streaming per-tool distributions (`duration_ms`, `peak_rss_kb`) as windowed DDSketches.
+
+    Every value is added twice: to the sketch of its pipeline and to the all-pipelines sketch,
+    so p50/p95/p99 are available per tool either way without keeping raw values.
+    """
+    DURATION = "duration_ms"
+    PEAK_RSS = "peak_rss_kb"
+
+    def __init__(self, repository: SketchRepository):
+        self.sketches = WindowedSketches(repository, DDSketch.kind, ddsketch_factory)
+
+    async def add(self, name: str, pipeline: str, timestamp: datetime.datetime, command: str, value: float):
+        tool = tool_name(command)
+        for target in {pipeline, ALL_PIPELINES}:
+            sketch = await self.sketches.get(name, target, timestamp, tool)
+            sketch.add(value)
+        await self.sketches.maybe_flush()
+
+    async def flush(self):
+        await self.sketches.flush()
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+async def query_quantiles(name: str, pipeline: str = ALL_PIPELINES, command: str | None = None,
+                          hours: float = 24) -> List[Tuple[str, float, List[float]]]:
+    """(tool, count, [p50, p95, p99]) per tool over the last `hours`, merged across windows and hosts."""
+    from tracer_bio_agent.database import init_db, AsyncSessionLocal
+
+    await init_db()
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+    key = tool_name(command) if command else None
+    async with AsyncSessionLocal() as session:
+        merged = await load_merged_by_key(SketchRepository(session), DDSketch.kind, name, pipeline, since, key=key)
+
+    results = [(tool, sketch.count, [sketch.quantile(q) for q in QUANTILES]) for tool, sketch in merged.items()]
+    results.sort(key=lambda result: result[1], reverse=True)
+    return results
@@ -0,0 +1,278 @@
+# sketches.py (bounded-memory, mergeable streaming summaries)
+import math
+import base64
+import hashlib
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k summary (Metwally et al.) over weighted items.
+
+    Keeps at most `k` counters. A reported count overestimates the true weight of an item by at
+    most its `error`, itself bounded by `total / k`. Any item with a true weight above
+    `total / k` is guaranteed to be monitored.
+    """
+
+    def __init__(self, k: int = 64):
+        self.k = k
+        self.total = 0.0
+        self.counters: Dict[str, List[float]] = {}  # item -> [count, error]
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+    def min_count(self) -> float:
+        """Smallest monitored count, or 0 while the summary is not full."""
+        if len(self.counters) < self.k:
+            return 0.0
+        return min(counter[0] for counter in self.counters.values())
+
+    def update(self, item: str, weight: float = 1.0):
+        self.total += weight
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.k:
+            self.counters[item] = [weight, 0.0]
+        else:
+            # Replace the smallest counter: the new item inherits its count as error
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def top(self, n: int = 10) -> List[Tuple[str, float, float]]:
+        """The `n` heaviest items as (item, count, error), count descending."""
+        ranked = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [(item, count, error) for item, (count, error) in ranked[:n]]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Merge two summaries (Agarwal et al.); the error bound becomes `(total_a + total_b) / k`."""
+        merged = SpaceSaving(max(self.k, other.k))
+        merged.total = self.total + other.total
+        floor_self, floor_other = self.min_count(), other.min_count()
+
+        for item in set(self.counters) | set(other.counters):
+            count_a, error_a = self.counters.get(item, (floor_self, floor_self))
+            count_b, error_b = other.counters.get(item, (floor_other, floor_other))
+            merged.counters[item] = [count_a + count_b, error_a + error_b]
+
+        if len(merged.counters) > merged.k:
+            kept = sorted(merged.counters.items(), key=lambda entry: entry[1][0], reverse=True)[:merged.k]
+            merged.counters = dict(kept)
+        return merged
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "total": self.total, "counters": self.counters}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpaceSaving":
+        summary = cls(data["k"])
+        summary.total = data["total"]
+        summary.counters = {item: list(counter) for item, counter in data["counters"].items()}
+        return summary
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch (Cormode & Muthukrishnan) for weighted point queries.
+
+    Estimates never undercount; with probability `1 - exp(-depth)` they overcount by at most
+    `e / width * total`. Hashing is stable across processes so sketches can be persisted and merged.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.total = 0.0
+        self.table = array("d", bytes(8 * width * depth))
+
+    def _cells(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=8 * self.depth).digest()
+        for row in range(self.depth):
+            index = int.from_bytes(digest[8 * row:8 * row + 8], "little") % self.width
+            yield row * self.width + index
+
+    def update(self, item: str, weight: float = 1.0):
+        self.total += weight
+        for cell in self._cells(item):
+            self.table[cell] += weight
+
+    def estimate(self, item: str) -> float:
+        return min(self.table[cell] for cell in self._cells(item))
+
+    def error_bound(self) -> float:
+        """Additive overestimate bound, holding with probability `1 - exp(-depth)`."""
+        return math.e / self.width * self.total
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Cannot merge Count-Min sketches of different dimensions")
+        merged = CountMinSketch(self.width, self.depth)
+        merged.total = self.total + other.total
+        merged.table = array("d", (a + b for a, b in zip(self.table, other.table)))
+        return merged
+
+    def to_dict(self) -> dict:
+        return {"width": self.width, "depth": self.depth, "total": self.total,
+                "table": base64.b64encode(self.table.tobytes()).decode()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CountMinSketch":
+        sketch = cls(data["width"], data["depth"])
+        sketch.total = data["total"]
+        sketch.table = array("d", base64.b64decode(data["table"]))
+        return sketch
+
+
+class HeavyHitters:
+    """
+    Top-k heavy hitters: Space-Saving for the candidates, Count-Min to tighten their counts.
+
+    Each reported count is an upper bound on the true weight of the item, within `error` of it.
+    """
+    kind = "heavy_hitters"
+
+    def __init__(self, k: int = 64, width: int = 2048, depth: int = 4):
+        self.summary = SpaceSaving(k)
+        self.sketch = CountMinSketch(width, depth)
+
+    @property
+    def total(self) -> float:
+        return self.summary.total
+
+    def update(self, item: str, weight: float = 1.0):
+        if weight <= 0:
+            return
+        self.summary.update(item, weight)
+        self.sketch.update(item, weight)
+
+    def top(self, n: int = 10) -> List[Tuple[str, float, float]]:
+        """The `n` heaviest items as (item, count, error): true weight is within [count - error, count]."""
+        results = []
+        for item, count, error in self.summary.top(len(self.summary)):
+            estimate = self.sketch.estimate(item)
+            if estimate < count:
+                # Count-Min bound is probabilistic but usually much tighter than the Space-Saving one
+                results.append((item, estimate, min(error, self.sketch.error_bound())))
+            else:
+                results.append((item, count, error))
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:n]
+
+    def merge(self, other: "HeavyHitters") -> "HeavyHitters":
+        merged = HeavyHitters.__new__(HeavyHitters)
+        merged.summary = self.summary.merge(other.summary)
+        merged.sketch = self.sketch.merge(other.sketch)
+        return merged
+
+    def to_dict(self) -> dict:
+        return {"summary": self.summary.to_dict(), "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HeavyHitters":
+        hitters = cls.__new__(cls)
+        hitters.summary = SpaceSaving.from_dict(data["summary"])
+        hitters.sketch = CountMinSketch.from_dict(data["sketch"])
+        return hitters
+
+
+class DDSketch:
+    """
+    DDSketch quantile summary (Masson et al.) with relative accuracy `alpha`.
+
+    Positive values are counted in logarithmic buckets of ratio `gamma = (1 + alpha) / (1 - alpha)`,
+    so any quantile is returned within a relative error `alpha` of the true value. Merging two
+    sketches adds their buckets and is exact. When more than `max_buckets` are used, the lowest
+    buckets are collapsed, which only affects the accuracy of the lowest quantiles.
+    """
+    kind = "ddsketch"
+
+    def __init__(self, alpha: float = 0.01, max_buckets: int = 2048):
+        self.alpha = alpha
+        self.max_buckets = max_buckets
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, float] = {}
+        self.zero_count = 0.0  # Values <= 0
+        self.count = 0.0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: float = 1.0):
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        if value <= 0:
+            self.zero_count += weight
+            return
+
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0.0) + weight
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """Fold the lowest buckets into one so at most `max_buckets` remain."""
+        indexes = sorted(self.buckets)
+        excess = indexes[:len(indexes) - self.max_buckets + 1]
+        folded = sum(self.buckets.pop(index) for index in excess)
+        target = excess[-1]
+        self.buckets[target] = self.buckets.get(target, 0.0) + folded
+
+    def quantile(self, q: float) -> float | None:
+        """Value at quantile `q` (0..1), or None for an empty sketch."""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if self.alpha != other.alpha:
+            raise ValueError("Cannot merge DDSketches with different relative accuracy")
+        merged = DDSketch(self.alpha, max(self.max_buckets, other.max_buckets))
+        merged.buckets = dict(self.buckets)
+        for index, weight in other.buckets.items():
+            merged.buckets[index] = merged.buckets.get(index, 0.0) + weight
+        merged.zero_count = self.zero_count + other.zero_count
+        merged.count = self.count + other.count
+        merged.sum = self.sum + other.sum
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+        while len(merged.buckets) > merged.max_buckets:
+            merged._collapse()
+        return merged
+
+    def to_dict(self) -> dict:
+        return {"alpha": self.alpha, "max_buckets": self.max_buckets,
+                "buckets": {str(index): weight for index, weight in self.buckets.items()},
+                "zero_count": self.zero_count, "count": self.count, "sum": self.sum,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        sketch = cls(data["alpha"], data["max_buckets"])
+        sketch.buckets = {int(index): weight for index, weight in data["buckets"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"] if data["min"] is not None else math.inf
+        sketch.max = data["max"] if data["max"] is not None else -math.inf
+        return sketch
@@ -0,0 +1,190 @@
+# snapshot.py (compact columnar representation of a metrics snapshot)
+import sys
+import logging
+import datetime
+from array import array
+from itertools import repeat
+from typing import Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Column order of the `metrics` table, as produced by `SnapshotBatch.rows()`
+COLUMNS = ("user", "pid", "ppid", "cpu", "mem", "vsz", "rss", "tty",
+           "stat", "start", "time", "command", "snapshot_time",
+           "read_bps", "write_bps", "syscr_rate", "syscw_rate", "cwd_bytes", "meta_id")
+
+# Optional columns filled after parsing (see `proc_io.IOSampler`); NaN / -1 mean "not sampled"
+IO_COLUMNS = ("read_bps", "write_bps", "syscr_rate", "syscw_rate")
+
+NAN = float("nan")
+
+# `SnapshotBatch.shared` flags: values stored once in `process_metadata` (see `proc_meta.py`), not per sample
+SHARED_USER = 1
+SHARED_COMMAND = 2
+
+
+class SnapshotBatch:
+    """
+    One metrics snapshot stored column by column.
+
+    Numeric columns are `array`-backed, repeated strings (user, tty, stat, ...) are interned and
+    the snapshot timestamp is stored once, so a snapshot costs a handful of containers instead of
+    one pydantic model and one ORM object per process.
+
+    `meta_id` references the process metadata entry of a row (-1 if unknown); the user and command
+    flagged in `shared` are then stored as NULL, as they are already in the entry.
+    """
+    __slots__ = ("snapshot_time", "pid", "ppid", "cpu", "mem", "vsz", "rss",
+                 "user", "tty", "stat", "start", "time", "command",
+                 "read_bps", "write_bps", "syscr_rate", "syscw_rate", "cwd_bytes", "meta_id", "shared")
+
+    def __init__(self, snapshot_time: datetime.datetime):
+        self.snapshot_time = snapshot_time
+        self.pid = array("l")
+        self.ppid = array("l")
+        self.cpu = array("d")
+        self.mem = array("d")
+        self.vsz = array("q")
+        self.rss = array("q")
+        self.user = []
+        self.tty = []
+        self.stat = []
+        self.start = []
+        self.time = []
+        self.command = []
+        self.read_bps = array("d")
+        self.write_bps = array("d")
+        self.syscr_rate = array("d")
+        self.syscw_rate = array("d")
+        self.cwd_bytes = array("q")
+        self.meta_id = array("q")
+        self.shared = array("B")
+
+    def __len__(self) -> int:
+        return len(self.pid)
+
+    def append(self, user: str, pid: int, ppid: Optional[int], cpu: float, mem: float, vsz: int, rss: int,
+               tty: Optional[str], stat: str, start: str, time: str, command: str):
+        """Append one process to the batch."""
+        self.pid.append(pid)
+        self.ppid.append(ppid if ppid is not None else -1)
+        self.cpu.append(cpu)
+        self.mem.append(mem)
+        self.vsz.append(vsz)
+        self.rss.append(rss)
+        self.user.append(sys.intern(user))
+        self.tty.append(sys.intern(tty) if tty is not None else None)
+        self.stat.append(sys.intern(stat))
+        self.start.append(sys.intern(start))
+        self.time.append(sys.intern(time))
+        self.command.append(sys.intern(command))
+        self.read_bps.append(NAN)
+        self.write_bps.append(NAN)
+        self.syscr_rate.append(NAN)
+        self.syscw_rate.append(NAN)
+        self.cwd_bytes.append(-1)
+        self.meta_id.append(-1)
+        self.shared.append(0)
+
+    @classmethod
+    def from_ps_lines(cls, lines: Iterable[str], snapshot_time: datetime.datetime) -> "SnapshotBatch":
+        """Parse the data lines of a `ps -eo user,pid,ppid,...,command` snapshot."""
+        batch = cls(snapshot_time)
+
+        for line in lines:
+            # The command is the last column and may contain spaces: keep it in one piece
+            parts = line.split(None, 11)
+            if len(parts) < 12:
+                continue  # Ignore malformed lines
+
+            try:
+                batch.append(
+                    user=parts[0],
+                    pid=int(parts[1]),
+                    ppid=int(parts[2]),
+                    cpu=float(parts[3]),
+                    mem=float(parts[4]),
+                    vsz=int(parts[5]),
+                    rss=int(parts[6]),
+                    tty=parts[7] if parts[7] != '?' else None,
+                    stat=parts[8],
+                    start=parts[9],
+                    time=parts[10],
+                    command=parts[11],
+                )
+            except (ValueError, OverflowError) as e:
+                logger.warning(f"Parsing error: {e}")
+
+        return batch
+
+    @classmethod
+    def from_record_batch(cls, record_batch, snapshot_time: datetime.datetime) -> "SnapshotBatch":
+        """A batch from the parsed `ps` columns of a `pyarrow.RecordBatch` (see `columnar.parse_ps_lines`)."""
+        import numpy as np
+
+        batch = cls(snapshot_time)
+        count = record_batch.num_rows
+        for name in ("pid", "ppid", "cpu", "mem", "vsz", "rss"):
+            values = record_batch.column(name).to_numpy(zero_copy_only=False)
+            getattr(batch, name).frombytes(np.ascontiguousarray(values, dtype=getattr(batch, name).typecode).tobytes())
+        for name in ("user", "tty", "stat", "start", "time", "command"):
+            # Each distinct string is converted (and interned) once
+            encoded = record_batch.column(name).dictionary_encode()
+            strings = [sys.intern(value) for value in encoded.dictionary.to_pylist()] + [None]
+            indices = encoded.indices.fill_null(len(strings) - 1).to_numpy().tolist()
+            setattr(batch, name, list(map(strings.__getitem__, indices)))
+        for name in IO_COLUMNS:
+            setattr(batch, name, array("d", [NAN]) * count)
+        batch.cwd_bytes = array("q", [-1]) * count
+        batch.meta_id = array("q", [-1]) * count
+        batch.shared = array("B", bytes(count))
+        return batch
+
+    def rows(self, snapshot_time=None) -> Iterator[Tuple]:
+        """Yield one tuple per process in `COLUMNS` order.
+
+        `snapshot_time` overrides the stored timestamp, e.g. with its database representation.
+        """
+        ppids = (ppid if ppid >= 0 else None for ppid in self.ppid)
+        timestamp = self.snapshot_time if snapshot_time is None else snapshot_time
+        rates = [(value if value == value else None for value in getattr(self, name)) for name in IO_COLUMNS]
+        cwd_bytes = (size if size >= 0 else None for size in self.cwd_bytes)
+        meta_ids = (meta_id if meta_id >= 0 else None for meta_id in self.meta_id)
+        users, commands = self.user, self.command
+        if any(self.shared):
+            users = (None if shared & SHARED_USER else user for user, shared in zip(self.user, self.shared))
+            commands = (None if shared & SHARED_COMMAND else command for command, shared in zip(self.command, self.shared))
+        return zip(users, self.pid, ppids, self.cpu, self.mem, self.vsz, self.rss, self.tty,
+                   self.stat, self.start, self.time, commands, repeat(timestamp), *rates, cwd_bytes, meta_ids)
+
+    def to_record_batch(self, snapshot_time=None):
+        """The batch as a `pyarrow.RecordBatch` in `COLUMNS` order; numeric columns are converted without a Python loop."""
+        import numpy as np
+        import pyarrow as pa
+
+        def numbers(name: str, arrow_type, missing=None):
+            values = np.asarray(getattr(self, name))  # Buffer protocol: no per-element conversion
+            return pa.array(values, type=arrow_type, mask=missing(values) if missing else None)
+
+        negative = lambda values: values < 0  # ppid, cwd_bytes and meta_id placeholders
+        timestamp = self.snapshot_time if snapshot_time is None else snapshot_time
+        shared = np.asarray(self.shared)
+        columns = {
+            "user": pa.array(self.user, pa.string(), mask=(shared & SHARED_USER) > 0),
+            "pid": numbers("pid", pa.int64()),
+            "ppid": numbers("ppid", pa.int64(), negative),
+            "cpu": numbers("cpu", pa.float64()),
+            "mem": numbers("mem", pa.float64()),
+            "vsz": numbers("vsz", pa.int64()),
+            "rss": numbers("rss", pa.int64()),
+            "tty": pa.array(self.tty, pa.string()),
+            "stat": pa.array(self.stat, pa.string()),
+            "start": pa.array(self.start, pa.string()),
+            "time": pa.array(self.time, pa.string()),
+            "command": pa.array(self.command, pa.string(), mask=(shared & SHARED_COMMAND) > 0),
+            "snapshot_time": pa.repeat(pa.scalar(timestamp, pa.timestamp("us")), len(self)),
+            **{name: numbers(name, pa.float64(), np.isnan) for name in IO_COLUMNS},
+            "cwd_bytes": numbers("cwd_bytes", pa.int64(), negative),
+            "meta_id": numbers("meta_id", pa.int64(), negative),
+        }
+        return pa.RecordBatch.from_pydict(columns)
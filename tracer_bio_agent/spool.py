@@ -0,0 +1,235 @@
+# spool.py (local disk spool: collector batches that could not be written to the database)
+#
+# A spool directory holds numbered segment files. Each record is a length-prefixed, crc32-checked,
+# zlib-compressed JSON batch ({"table", "columns", "rows"}), so a torn write at the end of a
+# segment is detected and ignored on replay. Records are fsync'ed in batches (every
+# `fsync_interval` seconds), not one by one.
+import os
+import json
+import glob
+import time
+import zlib
+import struct
+import logging
+import datetime
+from typing import Callable, Iterator, List, Sequence, Tuple
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TRSPOOL1"
+HEADER = struct.Struct("<II")  # Payload length, crc32 of the payload
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_record(table_name: str, columns: Sequence[str], rows: Sequence[Sequence]) -> bytes:
+    payload = zlib.compress(json.dumps({"table": table_name, "columns": list(columns), "rows": [list(row) for row in rows]},
+                                       default=_default, separators=(",", ":")).encode(), 1)
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_segment(path: str) -> Tuple[List[Tuple[str, List[str], List[list]]], bool]:
+    """Records of a segment as (table, columns, rows), and whether it ended cleanly (no torn or corrupt record)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        return [], not data  # An empty file is a segment created just before a crash
+
+    records, position = [], len(MAGIC)
+    while position < len(data):
+        if position + HEADER.size > len(data):
+            return records, False
+        length, crc = HEADER.unpack_from(data, position)
+        payload = data[position + HEADER.size:position + HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return records, False  # Everything after a bad record is untrusted
+        position += HEADER.size + length
+        record = json.loads(zlib.decompress(payload))
+        records.append((record["table"], record["columns"], record["rows"]))
+    return records, True
+
+
+class Spool:
+    """
+    Append-only spool of batches, drained back into the database by `SpoolService`.
+
+    Appends never touch the database, so collectors keep ingesting while SQLite is locked, being
+    vacuumed or out of disk space. Segments are closed at `segment_bytes` or when a drain starts,
+    and only closed segments are drained. Once the spool holds more than `max_bytes`, new batches
+    are dropped and counted in `dropped_rows`.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024, fsync_interval: float = 1.0,
+                 max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.file = None  # Active segment
+        self.bytes = sum(max(os.path.getsize(path) - len(MAGIC), 0) for _, path in self.segments())  # Records on disk
+        self.active_size = 0
+        self.unsynced = False
+        self.synced = time.monotonic()
+
+        self.spooled_rows = 0
+        self.dropped_rows = 0
+        self.drained_rows = 0
+        self.drain_rate = 0.0  # Rows/s of the last drain
+        self.corrupt_segments = 0
+        # Set by a failed write, cleared by the next successful drain: meanwhile batches go straight
+        # to the spool, so collectors do not wait on a locked database for every batch
+        self.unavailable = False
+
+    @staticmethod
+    def segment_number(path: str) -> int:
+        return int(os.path.basename(path)[len("segment-"):-len(".log")])
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """(number, path) of the closed segments, oldest first."""
+        active = self.file.name if self.file else None
+        paths = glob.glob(os.path.join(self.directory, "segment-*.log"))
+        return sorted((self.segment_number(path), path) for path in paths if path != active)
+
+    def backlog(self) -> bool:
+        """Whether batches are waiting to be drained."""
+        return self.bytes > 0
+
+    def remove(self, path: str):
+        """Delete a drained segment."""
+        size = os.path.getsize(path)
+        os.remove(path)
+        self.bytes = max(self.bytes - max(size - len(MAGIC), 0), 0)
+        if self.file is None and not self.segments():
+            self.bytes = 0  # Resynchronise after a segment truncated by a crash
+
+    def open_segment(self):
+        # Numbers only grow, also across restarts and after drained segments are deleted
+        existing = [number for number, _ in self.segments()]
+        number = max([time.time_ns() // 1000] + [last + 1 for last in existing[-1:]])
+        self.file = open(os.path.join(self.directory, f"segment-{number:020d}.log"), "ab")
+        self.file.write(MAGIC)
+        self.active_size = 0
+
+    def append(self, table_name: str, columns: Sequence[str], rows: Sequence[Sequence]):
+        """Append one batch; fsync'ed within `fsync_interval`."""
+        if not rows:
+            return
+        record = encode_record(table_name, columns, rows)
+        if self.max_bytes and self.bytes + len(record) > self.max_bytes:
+            self.dropped_rows += len(rows)
+            logger.error(f"Spool {self.directory} is full, dropped {len(rows)} {table_name} rows")
+            return
+
+        if self.file is None:
+            self.open_segment()
+        self.file.write(record)
+        self.active_size += len(record)
+        self.bytes += len(record)
+        self.spooled_rows += len(rows)
+        self.unsynced = True
+
+        if self.active_size >= self.segment_bytes:
+            self.close_segment()
+        elif time.monotonic() - self.synced >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.file is not None and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unsynced = False
+        self.synced = time.monotonic()
+
+    def close_segment(self):
+        """Close the active segment so it can be drained."""
+        if self.file is None:
+            return
+        self.sync()
+        self.file.close()
+        if not self.active_size:
+            os.remove(self.file.name)
+        self.file = None
+        self.active_size = 0
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        oldest = min((os.path.getmtime(path) for _, path in segments), default=None)
+        return {
+            "directory": self.directory,
+            "segments": len(segments) + (1 if self.active_size else 0),
+            "bytes": self.bytes,
+            "oldest_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+            "spooled_rows": self.spooled_rows,
+            "drained_rows": self.drained_rows,
+            "drain_rate": round(self.drain_rate, 1),
+            "dropped_rows": self.dropped_rows,
+            "corrupt_segments": self.corrupt_segments,
+            "database_unavailable": self.unavailable,
+        }
+
+
+_shared = None
+
+
+def shared_spool(configurations: dict) -> Spool | None:
+    """The process-wide spool configured from `[spool]`, or None when disabled."""
+    global _shared
+    settings = configurations.get("spool", {})
+    if not settings.get("enabled", True):
+        return None
+    if _shared is None:
+        _shared = Spool(
+            settings.get("dir", "./spool"),
+            segment_bytes=int(settings.get("segment_mb", 16) * 1024 * 1024),
+            fsync_interval=settings.get("fsync_interval", 1.0),
+            max_bytes=int(settings.get("max_mb", 1024) * 1024 * 1024),
+        )
+    return _shared
+
+
+def current_spool() -> Spool | None:
+    return _shared
+
+
+async def write_or_spool(spool: Spool | None, session, table_name: str, columns: Sequence[str],
+                         rows: Callable[[], Sequence[Sequence]], write: Callable) -> bool:
+    """
+    Store a batch with `write()`, or append it to the spool when the database is unavailable
+    (`OperationalError`: locked, disk full, I/O error), then until the spool was drained once.
+    `rows()` is only called when spooling. Returns whether the batch reached the database.
+    """
+    if spool is not None and spool.unavailable:
+        spool.append(table_name, columns, rows())
+        return False
+    try:
+        await write()
+        return True
+    except OperationalError as e:
+        if spool is None:
+            raise
+        await session.rollback()
+        spool.unavailable = True
+        logger.warning(f"Database unavailable, spooling {table_name} to {spool.directory}: {e.orig}")
+        spool.append(table_name, columns, rows())
+        return False
+
+
+def drain_segments(spool: Spool, drained_up_to: int) -> Iterator[Tuple[int, str, list]]:
+    """(number, path, records) of the closed segments not drained yet; already drained ones are removed."""
+    spool.close_segment()
+    for number, path in spool.segments():
+        if number <= drained_up_to:
+            spool.remove(path)  # Committed before a crash, not removed yet
+            continue
+        records, clean = read_segment(path)
+        if not clean:
+            spool.corrupt_segments += 1
+            logger.warning(f"Spool segment {path} ends with a torn or corrupt record, replaying {len(records)} records")
+        yield number, path, records
@@ -0,0 +1,115 @@
+# transport.py (minimal HTTP/1.1 over TCP or Unix sockets, and the batch wire format)
+import json
+import gzip
+import asyncio
+import datetime
+from typing import Dict, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+STATUS_REASONS = {
+    200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """Raised for malformed requests and non-2xx responses."""
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(f"{status} {message}".strip())
+        self.status = status
+        self.message = message
+
+
+def parse_address(address: str) -> Tuple[str, object]:
+    """Parse `http://host:port`, `host:port` or `unix:///path.sock` into ("tcp", (host, port)) or ("unix", path)."""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    if "://" not in address:
+        address = f"http://{address}"
+    parts = urlsplit(address)
+    return "tcp", (parts.hostname or "127.0.0.1", parts.port or 80)
+
+
+async def open_connection(address: str):
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(target)
+    return await asyncio.open_connection(*target)
+
+
+async def start_server(handler, address: str):
+    """Start an asyncio server on a TCP or Unix socket address."""
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.start_unix_server(handler, path=target)
+    return await asyncio.start_server(handler, *target)
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[str, Dict[str, str], bytes]:
+    """Read a start line, headers (lower-cased) and a Content-Length delimited body."""
+    start_line = (await reader.readline()).decode("latin-1").strip()
+    if not start_line:
+        raise HTTPError(400, "empty request")
+
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "body too large")
+    body = await reader.readexactly(length) if length else b""
+    return start_line, headers, body
+
+
+def write_message(writer: asyncio.StreamWriter, start_line: str, headers: Dict[str, str], body: bytes = b""):
+    lines = [start_line] + [f"{name}: {value}" for name, value in headers.items()]
+    lines.append(f"Content-Length: {len(body)}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, body: bytes = b"", headers: Dict[str, str] | None = None):
+    """Write a complete HTTP/1.1 response; the connection is closed afterwards."""
+    headers = {"Connection": "close", **(headers or {})}
+    write_message(writer, f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}", headers, body)
+
+
+async def request(address: str, method: str, path: str, body: bytes = b"",
+                  headers: Dict[str, str] | None = None, timeout: float = 30) -> Tuple[int, Dict[str, str], bytes]:
+    """Send one request and return (status, headers, body)."""
+    kind, target = parse_address(address)
+    host = "localhost" if kind == "unix" else f"{target[0]}:{target[1]}"
+
+    reader, writer = await asyncio.wait_for(open_connection(address), timeout)
+    try:
+        write_message(writer, f"{method} {path} HTTP/1.1",
+                      {"Host": host, "Connection": "close", **(headers or {})}, body)
+        await writer.drain()
+        status_line, response_headers, response_body = await asyncio.wait_for(read_message(reader), timeout)
+        return int(status_line.split()[1]), response_headers, response_body
+    finally:
+        writer.close()
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_batch(columns: Sequence[str], rows: Sequence[Sequence]) -> bytes:
+    """Encode rows column-named once as gzip-compressed JSON."""
+    payload = {"columns": list(columns), "rows": [list(row) for row in rows]}
+    return gzip.compress(json.dumps(payload, default=_default, separators=(",", ":")).encode(), compresslevel=6)
+
+
+def decode_batch(body: bytes) -> Tuple[List[str], List[list]]:
+    payload = json.loads(gzip.decompress(body))
+    return payload["columns"], payload["rows"]